@@ -12,54 +12,72 @@ Funcionalidades:
 """
 
 from flask import Flask
-from web.models import db, Usuario
-from werkzeug.security import generate_password_hash
+from web.models import db
 from web.routes import register_routes
+from web.commands import register_commands
+from web import migrations, cache, desempenho, metricas, vencimentos, snapshot
+from web import config as app_config
 
 
-def create_app():
+def create_app(perfil=None, config=None):
     """
     Factory function para criar e configurar a aplicação Flask
     
+    Args:
+        perfil: perfil de configuração ('desenvolvimento' ou 'producao');
+            padrão: variável de ambiente SGM_PERFIL
+        config: dict com valores que sobrescrevem o perfil
+
     Returns:
         Flask app configurada e pronta para uso
+
+    Não acessa o banco: tabelas, migrações e o usuário admin padrão são
+    criados por `flask --app app preparar-banco` (ver migrations.preparar).
+    O que usa os engines (pragmas, medição de SQL) é instalado no primeiro
+    contexto do app. Assim cada worker do servidor de produção (wsgi.py)
+    sobe sem custo.
     """
     app = Flask(__name__)
     
-    # Configurações do banco de dados
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///sgm.db'  # Banco SQLite local
-    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False  # Desativa warnings desnecessários
-    app.config['SECRET_KEY'] = 'troque-esta-chave-por-uma-segura'  # Para sessões
+    # Configurações do banco de dados, cache e paginação (ver web/config.py)
+    app_config.carregar(app, perfil, config)
+    # Bind somente leitura da cópia dos relatórios (se SNAPSHOT_RELATORIOS)
+    snapshot.configurar(app)
 
-    # Inicializa o banco de dados
+    # Inicializa o banco de dados, o cache de respostas, a medição de desempenho e as métricas
     db.init_app(app)
+    cache.init_app(app)
+    desempenho.init_app(app)
+    metricas.init_app(app)
+
+    # Atualiza o status de dívidas/parcelas vencidas uma vez por dia
+    vencimentos.init_app(app)
+
+    # Atualiza a cópia dos relatórios em segundo plano quando ela fica antiga
+    snapshot.init_app(app)
 
     # Registra todas as rotas da aplicação
     register_routes(app)
 
-    # Cria as tabelas e usuário admin padrão
-    with app.app_context():
-        db.create_all()
-        
-        # Cria usuário administrador padrão se não existir
-        if not Usuario.query.filter_by(nome='adm').first():
-            admin = Usuario(
-                nome='adm',
-                cpf=None,
-                email='adm@sgm.com',
-                senha_hash=generate_password_hash('adm'),
-                tipo='Administrador'
-            )
-            db.session.add(admin)
-            db.session.commit()
-            print("✓ Usuário administrador criado: adm/adm")
+    # Registra os comandos de manutenção (flask --app app <comando>)
+    register_commands(app)
+
+    # Pragmas do SQLite do perfil (WAL, cache...) em cada nova conexão,
+    # instalados no primeiro contexto do app (antes da primeira consulta)
+    app_config.ao_primeiro_contexto(app, lambda: app_config.configurar_sqlite(app, db.engine))
 
     return app
 
 
 if __name__ == '__main__':
-    # Cria e executa a aplicação
+    # Cria a aplicação, prepara o banco (tabelas, migrações, admin) e executa
     app = create_app()
+    with app.app_context():
+        aplicadas, admin_criado = migrations.preparar()
+    for versao, descricao in aplicadas:
+        print(f"✓ Migração v{versao} aplicada: {descricao}")
+    if admin_criado:
+        print("✓ Usuário administrador criado: adm/adm")
     print("\n" + "="*50)
     print("SGM - Sistema de Gerenciamento de Mercearia")
     print("="*50)
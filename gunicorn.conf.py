@@ -0,0 +1,22 @@
+"""
+Configuração do gunicorn para o SGM (gunicorn wsgi:app)
+
+Valores padrão ajustáveis pelo ambiente:
+- SGM_BIND: endereço (padrão 0.0.0.0:8000)
+- SGM_WORKERS: processos (padrão: um por núcleo)
+- SGM_THREADS: threads por processo (padrão 4)
+
+Com vários processos e SQLite, use o perfil de produção (WAL e busy
+timeout): os caixas de workers diferentes gravam no mesmo arquivo.
+"""
+
+import multiprocessing
+import os
+
+bind = os.environ.get('SGM_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('SGM_WORKERS', multiprocessing.cpu_count()))
+threads = int(os.environ.get('SGM_THREADS', 4))
+worker_class = 'gthread'
+preload_app = True  # Importa e cria o app uma vez; os workers nascem prontos por fork
+timeout = 60
+accesslog = '-'
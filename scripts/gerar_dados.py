@@ -0,0 +1,326 @@
+"""
+Gerador de massa de dados do SGM para testes de desempenho
+
+Cria um banco separado (nunca o sgm.db em uso) com clientes, dívidas,
+pagamentos, renegociações e parcelas nas mesmas proporções do seed.py,
+mas em escala e de forma reproduzível: a mesma semente gera sempre os
+mesmos dados.
+
+As linhas são inseridas em lotes com executemany (sem criar objetos do
+ORM), então 1 milhão de dívidas leva poucos minutos.
+
+Uso (a partir da raiz do projeto):
+    PYTHONPATH=. python scripts/gerar_dados.py --clientes 100000 --dividas-por-cliente 10
+    PYTHONPATH=. python scripts/gerar_dados.py --saida instance/carga.db --semente 7
+
+Para usar o banco gerado na aplicação:
+    SGM_SQLALCHEMY_DATABASE_URI=sqlite:////caminho/absoluto/instance/sgm_carga.db python app.py
+"""
+
+from flask import Flask
+from app import create_app
+from web.models import db, Usuario, Cliente, Divida, Pagamento, Renegociacao, Parcela
+from web import resumo, migrations
+from werkzeug.security import generate_password_hash
+from datetime import date, timedelta
+from dateutil.relativedelta import relativedelta
+import argparse
+import os
+import random
+import sys
+import time
+
+SAIDA_PADRAO = os.path.join('instance', 'sgm_carga.db')
+
+NOMES = ['Aline', 'Bruno', 'Carla', 'Daniela', 'Eduardo', 'Fernanda', 'Gustavo', 'Helena',
+         'Igor', 'Juliana', 'Lucas', 'Marina', 'Nicolas', 'Olivia', 'Paulo', 'Quitéria',
+         'Rafael', 'Sabrina', 'Thiago', 'Vanessa', 'Ana', 'José', 'Maria', 'João']
+SOBRENOMES = ['Souza', 'Lima', 'Dias', 'Alves', 'Silva', 'Costa', 'Rocha', 'Martins',
+              'Mendes', 'Prado', 'Oliveira', 'Santos', 'Ferreira', 'Rodrigues', 'Gonçalves',
+              'Barbosa', 'Cardoso', 'Araújo', 'Pereira', 'Ribeiro']
+RUAS = ['Rua das Flores', 'Av. Central', 'Rua do Comércio', 'Travessa São João', 'Rua Verde',
+        'Av. Paulista', 'Rua Azul', 'Av. Brasil', 'Rua da Paz', 'Rua do Sol']
+DESCRICOES = ['Compras do mês', 'Produtos alimentícios', 'Bebidas', 'Limpeza', 'Higiene pessoal',
+              'Hortifruti', 'Congelados', 'Padaria', 'Açougue', 'Diversos']
+MEIOS_PAGAMENTO = ['Dinheiro', 'Pix', 'Cartão Débito', 'Cartão Crédito']
+CAIXAS = ['adm', 'caixa', 'gerente']
+
+# Proporção de cada tipo entre as dívidas não parceladas
+TIPOS = ['vencida', 'em_dia', 'paga', 'renegociada']
+PESOS_TIPOS = [0.20, 0.25, 0.35, 0.20]
+
+
+def argumentos(argv=None):
+    parser = argparse.ArgumentParser(description='Gera um banco de dados sintético do SGM')
+    parser.add_argument('--saida', default=SAIDA_PADRAO,
+                        help=f'arquivo SQLite de saída (padrão: {SAIDA_PADRAO})')
+    parser.add_argument('--clientes', type=int, default=1000, help='quantidade de clientes')
+    parser.add_argument('--dividas-por-cliente', type=float, default=5,
+                        help='média de dívidas por cliente')
+    parser.add_argument('--pagamentos-por-divida', type=float, default=1.5,
+                        help='média de pagamentos de uma dívida paga')
+    parser.add_argument('--parceladas', type=float, default=0.2,
+                        help='fração das dívidas que são parceladas (0 a 1)')
+    parser.add_argument('--dias-historico', type=int, default=365,
+                        help='quantos dias para trás as vendas podem ter sido feitas')
+    parser.add_argument('--semente', type=int, default=42, help='semente do gerador aleatório')
+    parser.add_argument('--lote', type=int, default=10000, help='dívidas por lote de inserção')
+    parser.add_argument('--substituir', action='store_true',
+                        help='apaga o arquivo de saída se ele já existir')
+    return parser.parse_args(argv)
+
+
+def dividir_valor(rng, valor, partes):
+    """Divide um valor em `partes` pagamentos que somam exatamente o total"""
+    if partes <= 1:
+        return [valor]
+    cortes = sorted(rng.uniform(0, valor) for _ in range(partes - 1))
+    limites = [0.0] + cortes + [valor]
+    valores = [round(limites[i + 1] - limites[i], 2) for i in range(partes)]
+    valores[-1] = round(valor - sum(valores[:-1]), 2)
+    return valores
+
+
+class Gerador:
+    """Produz as linhas de cada tabela e as insere em lotes"""
+
+    def __init__(self, opcoes, hoje):
+        self.op = opcoes
+        self.hoje = hoje
+        self.rng = random.Random(opcoes.semente)
+        self.proxima_divida = 1
+        self.dividas, self.pagamentos, self.renegociacoes, self.parcelas = [], [], [], []
+        self.totais = {'clientes': 0, 'dividas': 0, 'pagamentos': 0, 'renegociacoes': 0,
+                       'parcelas': 0}
+
+    # ---------- inserção ----------
+
+    def _inserir(self, modelo, linhas, chave):
+        if linhas:
+            db.session.execute(modelo.__table__.insert(), linhas)
+            self.totais[chave] += len(linhas)
+            linhas.clear()
+
+    def descarregar(self):
+        """Insere os lotes pendentes e faz commit"""
+        self._inserir(Divida, self.dividas, 'dividas')
+        self._inserir(Pagamento, self.pagamentos, 'pagamentos')
+        self._inserir(Renegociacao, self.renegociacoes, 'renegociacoes')
+        self._inserir(Parcela, self.parcelas, 'parcelas')
+        db.session.commit()
+
+    # ---------- dados ----------
+
+    def usuarios(self):
+        existentes = {u.nome for u in Usuario.query.all()}
+        linhas = [
+            {'nome': nome, 'senha_hash': generate_password_hash(nome), 'ativo': True,
+             'tipo': 'Caixa' if nome == 'caixa' else 'Administrador'}
+            for nome in CAIXAS if nome not in existentes
+        ]
+        if linhas:
+            db.session.execute(Usuario.__table__.insert(), linhas)
+            db.session.commit()
+
+    def clientes(self):
+        """Insere os clientes em lotes e retorna os ids"""
+        rng = self.rng
+        linhas = []
+        for i in range(1, self.op.clientes + 1):
+            linhas.append({
+                'id': i,
+                'nome': f'{rng.choice(NOMES)} {rng.choice(SOBRENOMES)} {i:06d}',
+                'cpf': f'{i:011d}',
+                'celular': f'119{rng.randint(0, 99999999):08d}',
+                'endereco': f'{rng.choice(RUAS)}, {rng.randint(1, 2000)}',
+                'nivel_confianca': rng.choice(['Novo', 'Bronze', 'Prata', 'Ouro']),
+                'limite_credito': rng.choice([200.0, 500.0, 1000.0, 2000.0]),
+                'notificacoes_ativas': True,
+            })
+            if len(linhas) >= self.op.lote:
+                self._inserir(Cliente, linhas, 'clientes')
+        self._inserir(Cliente, linhas, 'clientes')
+        db.session.commit()
+        return range(1, self.op.clientes + 1)
+
+    def _pagamento(self, divida_id, valor, inicio, fim):
+        rng = self.rng
+        dias = max(0, (fim - inicio).days)
+        self.pagamentos.append({
+            'divida_id': divida_id,
+            'valor': valor,
+            'data_pagamento': inicio + timedelta(days=rng.randint(0, dias)),
+            'meio_pagamento': rng.choice(MEIOS_PAGAMENTO),
+            'usuario_responsavel': rng.choice(CAIXAS),
+        })
+
+    def _qtd_pagamentos(self):
+        media = max(1.0, self.op.pagamentos_por_divida)
+        return self.rng.randint(1, max(1, round(2 * media - 1)))
+
+    def divida(self, cliente_id):
+        """Gera uma dívida (e filhos) com o mesmo perfil de status do seed.py"""
+        rng, hoje = self.rng, self.hoje
+        divida_id = self.proxima_divida
+        self.proxima_divida += 1
+
+        valor = float(rng.randint(50, 500))
+        descricao = rng.choice(DESCRICOES)
+        historico = max(60, self.op.dias_historico)
+        linha = {
+            'id': divida_id, 'cliente_id': cliente_id, 'valor_original': valor,
+            'parcelado': False, 'num_parcelas': 1, 'juros_parcelamento': 0.0,
+        }
+
+        if rng.random() < self.op.parceladas:
+            num_parcelas = rng.choice([2, 3, 4, 6, 10, 12])
+            juros = rng.choice([0.0, 0.0, 2.0, 3.5, 5.0, 8.0, 10.0])
+            valor_total = round(valor * (1 + juros / 100), 2)
+            valor_parcela = round(valor_total / num_parcelas, 2)
+            data_venda = hoje - timedelta(days=rng.randint(1, historico))
+            saldo = valor_total
+            for numero in range(1, num_parcelas + 1):
+                vencimento = data_venda + relativedelta(months=numero)
+                status, pago = 'Pendente', 0.0
+                if vencimento < hoje:
+                    status = 'Vencida'
+                    if rng.random() < 0.6:
+                        status, pago = 'Paga', valor_parcela
+                        saldo = round(saldo - valor_parcela, 2)
+                        self._pagamento(divida_id, valor_parcela, vencimento - timedelta(days=10),
+                                        min(vencimento, hoje))
+                self.parcelas.append({
+                    'divida_id': divida_id, 'numero_parcela': numero,
+                    'valor_parcela': valor_parcela, 'data_vencimento': vencimento,
+                    'status': status, 'valor_pago': pago,
+                })
+            saldo = max(0.0, saldo)
+            linha.update({
+                'data_venda': data_venda,
+                'data_vencimento': data_venda + relativedelta(months=num_parcelas),
+                'descricao': f'{descricao} ({num_parcelas}x)',
+                'status': 'Paga' if saldo <= 0.01 else 'Pendente',
+                'saldo_devedor': 0.0 if saldo <= 0.01 else saldo,
+                'parcelado': True, 'num_parcelas': num_parcelas, 'juros_parcelamento': juros,
+            })
+            self.dividas.append(linha)
+            return
+
+        tipo = rng.choices(TIPOS, PESOS_TIPOS)[0]
+        if tipo == 'vencida':
+            venda = hoje - timedelta(days=rng.randint(40, historico))
+            vencimento = min(venda + timedelta(days=rng.randint(15, 45)), hoje - timedelta(days=1))
+            linha.update({'data_venda': venda, 'data_vencimento': vencimento,
+                          'descricao': f'{descricao} (vencida)', 'status': 'Pendente',
+                          'saldo_devedor': valor})
+
+        elif tipo == 'em_dia':
+            venda = hoje - timedelta(days=rng.randint(1, 15))
+            saldo = valor
+            if rng.random() < 0.5:
+                pago = float(rng.randint(20, int(valor // 2)))
+                saldo -= pago
+                self._pagamento(divida_id, pago, venda, hoje)
+            linha.update({'data_venda': venda,
+                          'data_vencimento': hoje + timedelta(days=rng.randint(10, 40)),
+                          'descricao': f'{descricao} (em dia)', 'status': 'Pendente',
+                          'saldo_devedor': saldo})
+
+        elif tipo == 'paga':
+            venda = hoje - timedelta(days=rng.randint(20, historico))
+            vencimento = venda + timedelta(days=rng.randint(15, 45))
+            for v in dividir_valor(rng, valor, self._qtd_pagamentos()):
+                self._pagamento(divida_id, v, venda, min(vencimento, hoje))
+            linha.update({'data_venda': venda, 'data_vencimento': vencimento,
+                          'descricao': f'{descricao} (paga)', 'status': 'Paga',
+                          'saldo_devedor': 0.0})
+
+        else:  # renegociada
+            venda = hoje - timedelta(days=rng.randint(50, historico))
+            vencimento = hoje + timedelta(days=rng.randint(20, 50))
+            saldo = round(valor * 1.10, 2)
+            self.renegociacoes.append({
+                'divida_id': divida_id, 'nova_data_venc': vencimento, 'juros_percent': 10.0,
+                'data_reneg': hoje - timedelta(days=rng.randint(0, 30)),
+                'usuario_responsavel': 'gerente', 'saldo_renegociado': saldo,
+            })
+            if rng.random() < 0.7:
+                pago = float(rng.randint(30, max(30, int(saldo // 2))))
+                saldo = round(saldo - pago, 2)
+                self._pagamento(divida_id, pago, venda, hoje)
+            linha.update({'data_venda': venda, 'data_vencimento': vencimento,
+                          'descricao': f'{descricao} (renegociada)', 'status': 'Renegociada',
+                          'saldo_devedor': saldo})
+
+        self.dividas.append(linha)
+
+    def gerar(self):
+        inicio = time.monotonic()
+        print('👥 Criando usuários...')
+        self.usuarios()
+
+        print(f'🧑 Criando {self.op.clientes} clientes...')
+        clientes = self.clientes()
+
+        print('💰 Criando dívidas, pagamentos, renegociações e parcelas...')
+        media = max(1.0, self.op.dividas_por_cliente)
+        minimo, maximo = max(1, round(media / 2)), max(1, round(media * 1.5))
+        for cliente_id in clientes:
+            for _ in range(self.rng.randint(minimo, maximo)):
+                self.divida(cliente_id)
+            if len(self.dividas) >= self.op.lote:
+                self.descarregar()
+                print(f'   {self.totais["dividas"]} dívidas '
+                      f'({time.monotonic() - inicio:.0f}s)', end='\r', flush=True)
+        self.descarregar()
+        print()
+        return time.monotonic() - inicio
+
+
+def main(argv=None):
+    op = argumentos(argv)
+    saida = os.path.abspath(op.saida)
+
+    # Nunca escreve no banco em uso pela aplicação
+    banco_vivo = os.path.abspath(os.path.join(Flask('app').instance_path, 'sgm.db'))
+    if saida == banco_vivo:
+        sys.exit(f'❌ A saída não pode ser o banco da aplicação ({banco_vivo})')
+    if os.path.exists(saida):
+        if not op.substituir:
+            sys.exit(f'❌ {saida} já existe (use --substituir para apagar)')
+        os.remove(saida)
+    os.makedirs(os.path.dirname(saida), exist_ok=True)
+
+    app = create_app(config={
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{saida}',
+        # Carga única: sem journal em disco nem fsync a cada lote
+        'SQLITE_PRAGMAS': {'journal_mode': 'MEMORY', 'synchronous': 'OFF'},
+    })
+
+    with app.app_context():
+        db.create_all(bind_key=None)
+        migrations.aplicar()
+
+        hoje = date.today()
+        gerador = Gerador(op, hoje)
+        duracao = gerador.gerar()
+
+        # Recalcula o resumo dos dashboards a partir dos dados gerados
+        resumo.reconstruir(hoje)
+        db.session.commit()
+
+        print('\n✅ Banco gerado com sucesso!')
+        print('=' * 50)
+        print(f'📁 Arquivo: {saida}')
+        print(f'🎲 Semente: {op.semente}')
+        print(f'🧑 Clientes: {gerador.totais["clientes"]}')
+        print(f'💰 Dívidas: {gerador.totais["dividas"]}')
+        print(f'💵 Pagamentos: {gerador.totais["pagamentos"]}')
+        print(f'🔄 Renegociações: {gerador.totais["renegociacoes"]}')
+        print(f'📋 Parcelas: {gerador.totais["parcelas"]}')
+        print(f'⏱️ Tempo: {duracao:.1f}s')
+        print('=' * 50)
+
+
+if __name__ == '__main__':
+    main()
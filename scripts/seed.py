@@ -1,5 +1,6 @@
 from app import create_app
 from web.models import db, Usuario, Cliente, Divida, Pagamento, Renegociacao, Parcela
+from web import resumo, migrations
 from werkzeug.security import generate_password_hash
 from datetime import date, timedelta
 from dateutil.relativedelta import relativedelta
@@ -10,8 +11,9 @@ app = create_app()
 with app.app_context():
     # Limpar dados existentes
     print('🗑️ Limpando banco de dados...')
-    db.drop_all()
-    db.create_all()
+    db.drop_all(bind_key=None)
+    db.create_all(bind_key=None)
+    migrations.aplicar()
     
     # Usuários
     print('👥 Criando usuários...')
@@ -172,7 +174,8 @@ with app.app_context():
                     divida_id=divida.id,
                     nova_data_venc=divida.data_vencimento,
                     juros_percent=10.0,
-                    usuario_responsavel='gerente'
+                    usuario_responsavel='gerente',
+                    saldo_renegociado=divida.saldo_devedor
                 )
                 db.session.add(renegociacao)
                 
@@ -251,6 +254,8 @@ with app.app_context():
             
             dividas_criadas.append(divida)
     
+    # Recalcula o resumo dos dashboards a partir dos dados gerados
+    resumo.reconstruir()
     db.session.commit()
     
     # Estatísticas
@@ -0,0 +1,138 @@
+"""
+Fixtures dos testes
+
+Cada teste recebe um app com um banco SQLite temporário já preparado
+(tabelas, migrações, usuário adm/adm e resumo), como depois de
+`flask --app app preparar-banco`.
+
+Uso: python -m pytest
+"""
+
+from app import create_app
+from web import migrations, resumo
+from web.models import db, Cliente, Divida, Pagamento, Parcela
+from datetime import date, timedelta
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import event
+import pytest
+
+
+CONFIG_TESTE = {
+    'TESTING': True,
+    'SECRET_KEY': 'teste',
+    'SNAPSHOT_RELATORIOS': False,
+    'VENCIMENTOS_AUTOMATICO': False,
+    'DESEMPENHO_LOG_ARQUIVO': None,
+}
+
+
+@pytest.fixture
+def criar_app(tmp_path):
+    """Cria apps de teste sobre o banco temporário, com configuração extra (ex.: métricas)"""
+    apps = []
+
+    def criar(**config):
+        app = create_app('desenvolvimento', config={
+            **CONFIG_TESTE,
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'sgm.db'}",
+            **config,
+        })
+        with app.app_context():
+            migrations.preparar()
+        apps.append(app)
+        return app
+
+    yield criar
+    for app in apps:
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose()
+
+
+@pytest.fixture
+def app(criar_app):
+    """App de teste com o contexto aberto durante o teste"""
+    app = criar_app()
+    with app.app_context():
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def http(app):
+    """Cliente HTTP logado como o administrador padrão"""
+    cliente = app.test_client()
+    resposta = cliente.post('/', data={'usuario': 'adm', 'senha': 'adm'})
+    assert resposta.status_code == 302
+    return cliente
+
+
+@pytest.fixture
+def comandos(app):
+    """Comandos SQL executados durante o teste (SELECT, INSERT, UPDATE...)"""
+    executados = []
+
+    def _registrar(conn, cursor, sql, *args):
+        executados.append(sql.lstrip().split(None, 1)[0].upper())
+
+    event.listen(db.engine, 'before_cursor_execute', _registrar)
+    yield executados
+    event.remove(db.engine, 'before_cursor_execute', _registrar)
+
+
+class Fabrica:
+    """Cria clientes, dívidas e pagamentos pelo ORM, como as rotas (com o resumo)"""
+
+    def __init__(self):
+        self.hoje = date.today()
+        self._nomes = 0
+
+    def cliente(self, nome=None, **campos):
+        self._nomes += 1
+        campos.setdefault('limite_credito', None)
+        cliente = Cliente(nome=nome or f'Cliente {self._nomes:03d}', **campos)
+        db.session.add(cliente)
+        db.session.commit()
+        return cliente
+
+    def divida(self, cliente, valor, vencimento=0, parcelas=1, venda=None):
+        """
+        Dívida de `valor` com vencimento em `vencimento` dias (negativo = vencida)
+
+        Com `parcelas` > 1, cria as parcelas mensais como novo_divida.
+        """
+        divida = Divida(
+            cliente_id=cliente.id,
+            valor_original=valor,
+            saldo_devedor=valor,
+            data_venda=venda or self.hoje,
+            data_vencimento=self.hoje + timedelta(days=vencimento),
+            parcelado=parcelas > 1,
+            num_parcelas=parcelas,
+            juros_parcelamento=0.0,
+        )
+        db.session.add(divida)
+        db.session.flush()
+        if parcelas > 1:
+            for i in range(1, parcelas + 1):
+                db.session.add(Parcela(
+                    divida_id=divida.id, numero_parcela=i, valor_parcela=valor / parcelas,
+                    data_vencimento=self.hoje + relativedelta(months=i), status='Pendente',
+                ))
+            divida.data_vencimento = self.hoje + relativedelta(months=parcelas)
+        resumo.divida_alterada(None, resumo.estado_divida(divida))
+        db.session.commit()
+        return divida
+
+    def pagamento(self, divida, valor, data=None, meio='Dinheiro'):
+        pagamento = Pagamento(divida_id=divida.id, valor=valor, data_pagamento=data or self.hoje,
+                              meio_pagamento=meio, usuario_responsavel='adm')
+        divida.registrar_pagamento(pagamento)
+        db.session.commit()
+        return pagamento
+
+
+@pytest.fixture
+def novo(app):
+    """Fábrica de dados de teste"""
+    return Fabrica()
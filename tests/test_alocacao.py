@@ -0,0 +1,79 @@
+"""
+Distribuição do pagamento do cliente entre as dívidas
+(POST /api/clientes/<id>/pagamento)
+"""
+
+from web import saldos, carteira, resumo
+from web.models import db, Divida, Pagamento, Parcela
+
+
+def _saldo(divida):
+    db.session.expire_all()
+    return db.session.get(Divida, divida.id).saldo_devedor
+
+
+def test_quita_a_mais_antiga_primeiro(http, novo):
+    cliente = novo.cliente()
+    recente = novo.divida(cliente, 100.0, vencimento=20)
+    antiga = novo.divida(cliente, 50.0, vencimento=-5)
+
+    resposta = http.post(f'/api/clientes/{cliente.id}/pagamento', json={'valor': 70.0, 'meio': 'Pix'})
+
+    assert resposta.status_code == 200
+    dados = resposta.get_json()
+    assert [p['divida_id'] for p in dados['partes']] == [antiga.id, recente.id]
+    assert dados['partes'][0]['status_divida'] == 'Paga'
+    assert (dados['alocado'], dados['nao_alocado']) == (70.0, 0)
+    assert _saldo(antiga) == 0.0
+    assert _saldo(recente) == 80.0
+    assert saldos.divergentes() == []
+    assert carteira.reconstruir() == []
+
+
+def test_juros_da_renegociacao_de_divida_parcelada(http, novo):
+    cliente = novo.cliente()
+    divida = novo.divida(cliente, 300.0, parcelas=3)
+    http.post(f'/dividas/{divida.id}/renegociar', data={'prazo_dias': '90', 'juros': '10'})
+    assert _saldo(divida) == 330.0
+
+    resposta = http.post(f'/api/clientes/{cliente.id}/pagamento', json={'valor': 330.0})
+
+    assert resposta.status_code == 200
+    dados = resposta.get_json()
+    assert (dados['alocado'], dados['nao_alocado']) == (330.0, 0)
+    assert [p['valor'] for p in dados['partes']] == [100.0, 100.0, 100.0, 30.0]
+    assert dados['partes'][-1]['parcela_id'] is None
+    assert _saldo(divida) == 0.0
+    assert db.session.get(Divida, divida.id).status == 'Paga'
+    assert {p.status for p in Parcela.query} == {'Paga'}
+    assert resumo.reconstruir() == []
+    assert carteira.reconstruir() == []
+
+
+def test_simulacao_nao_escreve_no_banco(http, novo, comandos):
+    cliente = novo.cliente()
+    divida = novo.divida(cliente, 40.0, parcelas=2)
+    comandos.clear()
+
+    resposta = http.post(f'/api/clientes/{cliente.id}/pagamento', json={'valor': 30.0, 'simular': True})
+
+    assert resposta.status_code == 200
+    dados = resposta.get_json()
+    assert dados['simulado'] is True
+    assert [p['status_parcela'] for p in dados['partes']] == ['Paga', 'Pendente']
+    assert all('pagamento_id' not in p for p in dados['partes'])
+    assert not {'INSERT', 'UPDATE', 'DELETE'} & set(comandos)
+    assert _saldo(divida) == 40.0
+    assert Pagamento.query.count() == 0
+
+
+def test_valor_acima_do_aberto(http, novo):
+    cliente = novo.cliente()
+    divida = novo.divida(cliente, 30.0)
+
+    resposta = http.post(f'/api/clientes/{cliente.id}/pagamento', json={'valor': 31.0})
+
+    assert resposta.status_code == 400
+    assert 'excede' in resposta.get_json()['erro']
+    assert _saldo(divida) == 30.0
+    assert Pagamento.query.count() == 0
@@ -0,0 +1,77 @@
+"""
+Exclusão de clientes e dívidas com todos os filhos (Divida.apagar_todas),
+inclusive o histórico arquivado
+"""
+
+from web import arquivo, saldos, movimento, carteira, resumo
+from web.models import (
+    db, Cliente, Divida, Pagamento, Parcela, Renegociacao,
+    DividaArquivo, PagamentoArquivo,
+)
+from datetime import timedelta
+
+
+def _com_filhos(http, novo, cliente):
+    divida = novo.divida(cliente, 60.0, parcelas=3)
+    novo.pagamento(divida, 10.0)
+    http.post(f'/dividas/{divida.id}/renegociar', data={'prazo_dias': '10', 'juros': '5'})
+    return divida
+
+
+def _conferir():
+    assert saldos.divergentes() == []
+    assert movimento.reconstruir() == []
+    assert carteira.reconstruir() == []
+    assert resumo.reconstruir() == []
+
+
+def test_apagar_divida_leva_os_filhos(http, novo):
+    cliente = novo.cliente()
+    divida = _com_filhos(http, novo, cliente)
+    fica = _com_filhos(http, novo, cliente)
+    divida_id = divida.id
+
+    assert http.post(f'/dividas/{divida_id}/apagar').status_code == 200
+
+    for modelo in (Pagamento, Renegociacao, Parcela):
+        assert modelo.query.filter_by(divida_id=divida_id).count() == 0
+        assert modelo.query.filter_by(divida_id=fica.id).count() > 0
+    assert db.session.get(Divida, divida_id) is None
+    _conferir()
+
+
+def test_apagar_cliente_com_historico_arquivado(http, novo):
+    cliente, outro = novo.cliente(), novo.cliente()
+    antiga = novo.divida(cliente, 20.0, venda=novo.hoje - timedelta(days=500))
+    novo.pagamento(antiga, 20.0, data=novo.hoje - timedelta(days=450))
+    _com_filhos(http, novo, cliente)
+    fica = _com_filhos(http, novo, outro)
+    cliente_id = cliente.id
+    assert arquivo.arquivar() == 1
+
+    assert http.post(f'/clientes/{cliente_id}/apagar').status_code == 200
+
+    db.session.expire_all()
+    assert db.session.get(Cliente, cliente_id) is None
+    assert [d.id for d in Divida.query] == [fica.id]
+    assert {p.divida_id for p in Pagamento.query} == {fica.id}
+    assert {p.divida_id for p in Parcela.query} == {fica.id}
+    assert DividaArquivo.query.count() == PagamentoArquivo.query.count() == 0
+    _conferir()
+
+
+def test_quantidade_de_comandos_nao_depende_das_dividas(app, novo, comandos):
+    poucas, muitas = novo.cliente(), novo.cliente()
+    novo.divida(poucas, 10.0)
+    for _ in range(6):
+        novo.divida(muitas, 10.0, parcelas=2)
+
+    contagens = []
+    for cliente in (poucas, muitas):
+        comandos.clear()
+        Divida.apagar_todas(Divida.cliente_id == cliente.id)
+        contagens.append(len(comandos))
+    db.session.commit()
+
+    assert contagens[0] == contagens[1]
+    assert Divida.query.count() == Parcela.query.count() == 0
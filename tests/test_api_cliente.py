@@ -0,0 +1,46 @@
+"""
+Perfil do cliente em /api/cliente/<id>: dívidas com pagamentos,
+renegociações e parcelas carregados com um número fixo de consultas
+"""
+
+from web.models import db
+from datetime import timedelta
+
+
+def test_perfil_completo(http, novo):
+    cliente = novo.cliente('Ana', cpf='12345678900')
+    paga = novo.divida(cliente, 50.0, vencimento=-3)
+    novo.pagamento(paga, 50.0, meio='Pix')
+    novo.divida(cliente, 90.0, parcelas=3)
+    renegociada = novo.divida(cliente, 20.0, vencimento=-5)
+    renegociada.renegociar(novo.hoje + timedelta(days=7), 10.0, 'adm')
+    db.session.commit()
+
+    dados = http.get(f'/api/cliente/{cliente.id}').get_json()
+    assert (dados['nome'], dados['cpf']) == ('Ana', '12345678900')
+    quitada, parcelada, reneg = dados['dividas']
+    assert quitada['status'] == 'Paga'
+    assert [(p['valor'], p['meio']) for p in quitada['pagamentos']] == [(50.0, 'Pix')]
+    assert [p['numero'] for p in parcelada['parcelas']] == [1, 2, 3]
+    assert reneg['saldo'] == 22.0
+    assert [r['juros'] for r in reneg['renegociacoes']] == [10.0]
+
+    abertas = http.get(f'/api/cliente/{cliente.id}?status=abertas').get_json()
+    assert [d['id'] for d in abertas['dividas']] == [parcelada['id'], reneg['id']]
+
+
+def test_consultas_nao_crescem_com_as_dividas(http, novo, comandos):
+    def consultas_do_perfil(qtd_dividas):
+        cliente = novo.cliente()
+        for _ in range(qtd_dividas):
+            divida = novo.divida(cliente, 90.0, parcelas=3)
+            novo.pagamento(divida, 10.0)
+        comandos.clear()
+        assert http.get(f'/api/cliente/{cliente.id}').status_code == 200
+        return len(comandos)
+
+    assert consultas_do_perfil(1) == consultas_do_perfil(15)
+
+
+def test_cliente_inexistente(http):
+    assert http.get('/api/cliente/999').status_code == 404
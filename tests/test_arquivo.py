@@ -0,0 +1,106 @@
+"""
+Arquivo de dívidas quitadas (web/arquivo.py): move dívidas antigas sem
+mudar saldos, movimento, agenda nem resumo
+"""
+
+from web import arquivo, migrations, saldos, movimento, carteira, resumo, analytics
+from web.models import db, Divida, DividaArquivo, PagamentoArquivo, Migracao
+from datetime import timedelta
+from sqlalchemy import text
+import pytest
+
+
+def _quitada_antiga(novo, cliente, valor=60.0):
+    dois_anos = novo.hoje - timedelta(days=730)
+    divida = novo.divida(cliente, valor, venda=dois_anos)
+    novo.pagamento(divida, valor, data=dois_anos + timedelta(days=10))
+    return divida
+
+
+def _conferir():
+    assert saldos.divergentes() == []
+    assert movimento.reconstruir() == []
+    assert carteira.reconstruir() == []
+    assert resumo.reconstruir() == []
+
+
+def test_arquiva_quitadas_antigas(app, novo):
+    cliente = novo.cliente()
+    antiga = _quitada_antiga(novo, cliente)
+    recente = novo.divida(cliente, 40.0)
+    novo.pagamento(recente, 40.0)
+    aberta = novo.divida(cliente, 25.0)
+    ids = antiga.id, recente.id, aberta.id
+    pagas = analytics.relatorio_resumo()['qtd_pagas']
+
+    assert arquivo.arquivar(12) == 1
+
+    assert db.session.get(Divida, ids[0]) is None
+    assert [d.id for d in DividaArquivo.query] == [ids[0]]
+    assert PagamentoArquivo.query.one().valor == 60.0
+    assert {d.id for d in Divida.query} == set(ids[1:])
+    assert analytics.relatorio_resumo()['qtd_pagas'] == pagas == 2
+    _conferir()
+
+
+def test_ids_arquivados_nao_se_repetem(app, novo):
+    cliente = novo.cliente()
+    primeira = _quitada_antiga(novo, cliente).id  # Maior id da tabela
+    assert arquivo.arquivar(12) == 1
+
+    segunda = _quitada_antiga(novo, cliente).id
+    assert segunda > primeira
+    assert arquivo.arquivar(12) == 1
+
+    assert [d.id for d in DividaArquivo.query.order_by(DividaArquivo.id)] == [primeira, segunda]
+    assert len({p.id for p in PagamentoArquivo.query}) == 2
+    _conferir()
+
+
+def test_mantem_quitadas_recentes(app, novo):
+    cliente = novo.cliente()
+    for _ in range(3):
+        divida = novo.divida(cliente, 10.0, venda=novo.hoje - timedelta(days=60))
+        novo.pagamento(divida, 10.0)
+
+    assert arquivo.arquivar(12) == 0
+    assert DividaArquivo.query.count() == 0
+
+
+def test_prazo_minimo(app):
+    with pytest.raises(ValueError):
+        arquivo.arquivar(arquivo.MESES_MINIMO - 1)
+
+
+def test_migracao_de_banco_sem_autoincrement(app, novo):
+    cliente = novo.cliente()
+    arquivada = _quitada_antiga(novo, cliente).id
+    arquivo.arquivar(12)
+    apagada = novo.divida(cliente, 30.0, parcelas=3)
+    novo.pagamento(apagada, 5.0)
+    fica = novo.divida(novo.cliente(), 20.0)
+    Divida.apagar_todas(Divida.cliente_id == cliente.id)
+    db.session.commit()
+
+    # Simula um banco anterior à v12 (tabelas sem AUTOINCREMENT)
+    tabelas = "('divida', 'pagamento', 'renegociacao', 'parcela')"
+    with db.engine.begin() as conn:
+        conn.execute(text('PRAGMA writable_schema = ON'))
+        conn.execute(text("UPDATE sqlite_master SET sql = replace(sql, ' AUTOINCREMENT', '') "
+                          f"WHERE type = 'table' AND name IN {tabelas}"))
+        conn.execute(text('PRAGMA writable_schema = OFF'))
+        conn.execute(text(f'DELETE FROM sqlite_sequence WHERE name IN {tabelas}'))
+    Migracao.query.filter_by(versao=12).delete()
+    db.session.commit()
+    db.engine.dispose()
+    gatilhos = db.session.execute(text("SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger'")).scalar()
+
+    assert [v for v, _ in migrations.aplicar()] == [12]
+
+    sql = db.session.execute(text("SELECT sql FROM sqlite_master WHERE name = 'divida'")).scalar()
+    assert 'AUTOINCREMENT' in sql
+    assert db.session.execute(text("SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger'")).scalar() == gatilhos
+    assert [d.id for d in Divida.query] == [fica.id]
+    nova = novo.divida(cliente, 10.0)
+    assert nova.id > max(arquivada, fica.id)
+    _conferir()
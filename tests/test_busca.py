@@ -0,0 +1,56 @@
+"""
+Busca de clientes em /api/clientes?q= pelo índice FTS5 (sem acento, por prefixo)
+"""
+
+from web import busca
+from web.models import db
+
+
+def _nomes(http, q, **args):
+    resposta = http.get('/api/clientes', query_string={'q': q, **args})
+    assert resposta.status_code == 200
+    return [c['nome'] for c in resposta.get_json()]
+
+
+def test_prefixo_sem_acento(http, novo):
+    novo.cliente('Paulo Gonçalves')
+    novo.cliente('José Antônio')
+    novo.cliente('Maria Silva')
+
+    assert _nomes(http, 'goncal') == ['Paulo Gonçalves']
+    assert _nomes(http, 'JOSE anto') == ['José Antônio']
+    assert _nomes(http, 'silva paulo') == []
+
+
+def test_busca_por_cpf(http, novo):
+    novo.cliente('Ana', cpf='12345678900')
+
+    assert _nomes(http, '123456') == ['Ana']
+
+
+def test_indice_segue_alteracoes_e_exclusoes(http, novo):
+    cliente = novo.cliente('Roberto')
+    cliente.nome = 'Rogério'
+    db.session.commit()
+    assert _nomes(http, 'rober') == []
+    assert _nomes(http, 'roger') == ['Rogério']
+
+    assert http.post(f'/clientes/{cliente.id}/apagar').status_code == 200
+    assert _nomes(http, 'roger') == []
+
+
+def test_paginacao_da_busca(http, novo):
+    for i in range(5):
+        novo.cliente(f'Carla {i}')
+
+    resposta = http.get('/api/clientes', query_string={'q': 'carla', 'limit': 2})
+    assert len(resposta.get_json()) == 2
+    assert 'offset=2' in resposta.headers['Link']
+    assert len(_nomes(http, 'carla', limit=2, offset=4)) == 1
+
+
+def test_texto_sem_palavras(http, novo):
+    novo.cliente('Ana')
+
+    assert _nomes(http, '"*()') == []
+    assert busca.limitar(10_000, -3) == (busca.LIMITE_MAXIMO, 0)
@@ -0,0 +1,74 @@
+"""
+Cache de respostas (web/cache.py): TTL, limite de memória, etiquetas e
+invalidação só depois do commit
+"""
+
+from web import cache
+from web.cache import CacheRespostas
+from web.models import db
+
+
+def test_expira_pelo_ttl():
+    respostas = CacheRespostas(ttl=0)
+    respostas.guardar(('rota', 1), 'valor')
+
+    assert respostas.obter(('rota', 1)) == (False, None)
+
+
+def test_descarta_os_menos_usados():
+    valor = 'x' * 1000
+    respostas = CacheRespostas(memoria_max=3500)
+    for i in range(3):
+        respostas.guardar(('rota', i), valor)
+    respostas.obter(('rota', 0))  # A entrada 0 passa a ser a mais recente
+
+    respostas.guardar(('rota', 3), valor)
+
+    assert respostas.obter(('rota', 1)) == (False, None)
+    assert respostas.obter(('rota', 0)) == (True, valor)
+    assert respostas.estatisticas()['descartes'] == 1
+
+
+def test_invalida_por_etiqueta():
+    respostas = CacheRespostas()
+    respostas.guardar(('a',), 1, ['cliente:1', 'dashboard'])
+    respostas.guardar(('b',), 2, ['cliente:2'])
+
+    respostas.invalidar('cliente:1')
+
+    assert respostas.obter(('a',)) == (False, None)
+    assert respostas.obter(('b',)) == (True, 2)
+
+
+def test_invalidacao_so_depois_do_commit(app):
+    calculos = []
+
+    def calcular():
+        calculos.append(1)
+        return len(calculos)
+
+    assert cache.obter_ou_calcular('teste', (), ['clientes'], calcular) == 1
+
+    cache.invalidar('clientes')
+    db.session.rollback()
+    assert cache.obter_ou_calcular('teste', (), ['clientes'], calcular) == 1
+
+    cache.invalidar('clientes')
+    assert cache.obter_ou_calcular('teste', (), ['clientes'], calcular) == 1  # Antes do commit
+    db.session.commit()
+    assert cache.obter_ou_calcular('teste', (), ['clientes'], calcular) == 2
+
+
+def test_escrita_atualiza_perfil_e_dashboard(http, novo):
+    cliente = novo.cliente()
+    divida = novo.divida(cliente, 80.0)
+    url = f'/api/cliente/{cliente.id}'
+    assert http.get(url).get_json()['dividas'][0]['saldo'] == 80.0
+    assert 'R$ 80.00' in http.get('/home').get_data(as_text=True)
+    assert http.get(url).get_json()['dividas'][0]['saldo'] == 80.0
+    assert cache.estatisticas()['por_rota']['api_cliente']['acertos'] == 1
+
+    assert http.post(f'/dividas/{divida.id}/pagar', data={'valor': '30', 'meio': 'Pix'}).status_code == 302
+
+    assert http.get(url).get_json()['dividas'][0]['saldo'] == 50.0
+    assert 'R$ 50.00' in http.get('/home').get_data(as_text=True)
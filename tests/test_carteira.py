@@ -0,0 +1,84 @@
+"""
+Carteira de recebíveis (web/carteira.py): agenda mantida por triggers,
+aging por faixa de atraso, maiores devedores e previsão semanal
+"""
+
+from web import carteira
+from web.models import db, AgendaDivida, Parcela
+from datetime import timedelta
+import pytest
+
+
+def _agenda(divida):
+    return [(a.vencimento, round(a.valor, 2))
+            for a in AgendaDivida.query.filter_by(divida_id=divida.id).order_by(AgendaDivida.vencimento)]
+
+
+def test_faixas_de_atraso(http, novo):
+    cliente = novo.cliente('Ana')
+    for dias, valor in ((5, 1.0), (0, 2.0), (-30, 4.0), (-45, 8.0), (-75, 16.0), (-120, 32.0)):
+        novo.divida(cliente, valor, vencimento=dias)
+
+    dados = http.get('/api/relatorios/aging').get_json()
+
+    esperado = {'a_vencer': 1.0, 'dias_0_30': 6.0, 'dias_31_60': 8.0, 'dias_61_90': 16.0,
+                'dias_90_mais': 32.0, 'total': 63.0}
+    assert dados['total'] == esperado
+    [linha] = dados['clientes']
+    assert {k: linha[k] for k in esperado} == esperado
+    assert carteira.reconstruir() == []
+
+
+def test_agenda_de_divida_parcelada(http, novo):
+    cliente = novo.cliente('Ana')
+    divida = novo.divida(cliente, 90.0, parcelas=3)
+    primeira = Parcela.query.filter_by(divida_id=divida.id, numero_parcela=1).one()
+    primeira.data_vencimento = novo.hoje - timedelta(days=40)
+    db.session.commit()
+    vencimentos = [p.data_vencimento for p in Parcela.query.order_by(Parcela.numero_parcela)]
+
+    assert _agenda(divida) == [(v, 30.0) for v in vencimentos]
+    total = http.get('/api/relatorios/aging').get_json()['total']
+    assert total['dias_31_60'] == 30.0  # Parcela vencida de dívida ainda a vencer
+
+    # Pagamento sem parcela abate as parcelas mais antigas primeiro
+    novo.pagamento(divida, 40.0)
+    assert _agenda(divida) == [(vencimentos[1], 20.0), (vencimentos[2], 30.0)]
+
+    # Renegociada, o saldo inteiro (com os juros) vai para o novo vencimento
+    http.post(f'/dividas/{divida.id}/renegociar', data={'prazo_dias': '200', 'juros': '10'})
+    assert _agenda(divida) == [(novo.hoje + timedelta(days=200), 55.0)]
+    assert carteira.reconstruir() == []
+
+
+def test_maiores_devedores(http, novo):
+    pouco, muito, em_dia = novo.cliente('Pouco'), novo.cliente('Muito'), novo.cliente('Em dia')
+    novo.divida(pouco, 50.0, vencimento=-10)
+    novo.divida(muito, 50.0, vencimento=-10)
+    novo.divida(muito, 150.0, vencimento=10)
+    novo.divida(em_dia, 190.0, vencimento=3)
+
+    dados = http.get('/api/relatorios/aging?limite=2').get_json()
+    assert [c['cliente'] for c in dados['clientes']] == ['Muito', 'Pouco']  # Vencido, depois total
+    assert dados['total']['total'] == 440.0
+
+    todos = http.get('/api/relatorios/aging?limite=10').get_json()['clientes']
+    assert [c['cliente'] for c in todos] == ['Muito', 'Pouco', 'Em dia']
+    um = http.get(f'/api/relatorios/aging?cliente_id={em_dia.id}').get_json()['clientes']
+    assert [c['total'] for c in um] == [190.0]
+
+
+def test_previsao_semanal(http, novo):
+    cliente = novo.cliente('Ana')
+    novo.divida(cliente, 10.0, vencimento=-3)
+    novo.divida(cliente, 20.0, vencimento=0)
+    novo.divida(cliente, 40.0, vencimento=7)
+    novo.divida(cliente, 80.0, vencimento=200)
+
+    dados = http.get('/api/relatorios/previsao').get_json()
+
+    assert dados['vencido'] == pytest.approx(10.0)
+    assert dados['depois'] == pytest.approx(80.0)
+    assert len(dados['semanas']) >= 12
+    previstas = [s for s in dados['semanas'] if s['previsto']]
+    assert sum(s['previsto'] for s in previstas) == pytest.approx(60.0)
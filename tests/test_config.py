@@ -0,0 +1,87 @@
+"""
+Perfis de configuração (web/config.py): pragmas do SQLite de produção e
+validações do perfil
+"""
+
+from app import create_app
+from web import config as app_config
+from web.models import db
+import pytest
+
+
+def _app(tmp_path, perfil, **config):
+    return create_app(perfil, config={
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'sgm.db'}",
+        'SNAPSHOT_RELATORIOS': False,
+        'VENCIMENTOS_AUTOMATICO': False,
+        **config,
+    })
+
+
+def test_producao_aplica_os_pragmas(tmp_path):
+    app = _app(tmp_path, 'producao', SECRET_KEY='segredo')
+    with app.app_context():
+        info = app_config.resumo_banco(app, db.engine)
+        db.engine.dispose()
+
+    assert info['perfil'] == 'producao'
+    assert info['pragmas']['journal_mode'] == 'wal'
+    assert info['pragmas']['busy_timeout'] == 5000
+    assert info['pragmas']['synchronous'] == 1  # NORMAL
+    assert info['engine_options']['pool_size'] == 10
+
+
+def test_desenvolvimento_mantem_o_padrao_do_sqlite(tmp_path):
+    app = _app(tmp_path, 'desenvolvimento')
+    with app.app_context():
+        info = app_config.resumo_banco(app, db.engine)
+        db.engine.dispose()
+
+    assert info['pragmas']['journal_mode'] == 'delete'
+    assert info['engine_options'] == {}
+
+
+def test_producao_exige_chave_secreta(tmp_path, monkeypatch):
+    monkeypatch.delenv('SGM_SECRET_KEY', raising=False)
+    with pytest.raises(ValueError, match='SGM_SECRET_KEY'):
+        _app(tmp_path, 'producao')
+
+
+def test_perfil_desconhecido(tmp_path):
+    with pytest.raises(ValueError, match='Perfil desconhecido'):
+        _app(tmp_path, 'homologacao')
+
+
+def test_variaveis_de_ambiente(tmp_path, monkeypatch):
+    banco = tmp_path / 'ambiente.db'
+    monkeypatch.setenv('SGM_SQLALCHEMY_DATABASE_URI', f'sqlite:///{banco}')
+    monkeypatch.setenv('SGM_CACHE_TTL', '120')
+    monkeypatch.setenv('SGM_SNAPSHOT_ARQUIVO', str(tmp_path / 'copia.db'))
+
+    app = create_app(config={'VENCIMENTOS_AUTOMATICO': False})
+
+    assert app.config['SQLALCHEMY_DATABASE_URI'] == f'sqlite:///{banco}'
+    assert app.config['CACHE_TTL'] == 120
+    assert app.config['SNAPSHOT_ARQUIVO'] == str(tmp_path / 'copia.db')
+    # O ambiente é lido ao criar o app, não ao importar o módulo
+    assert app_config.Config.SQLALCHEMY_DATABASE_URI == 'sqlite:///sgm.db'
+    assert _app(tmp_path, 'desenvolvimento', CACHE_TTL=5).config['CACHE_TTL'] == 5
+    assert not banco.exists()  # Criar o app não abre o banco
+
+
+def test_wsgi_usa_o_perfil_de_producao(tmp_path, monkeypatch):
+    import importlib
+    import sys
+
+    monkeypatch.setenv('SGM_PERFIL', 'producao')
+    monkeypatch.setenv('SGM_SECRET_KEY', 'segredo')
+    monkeypatch.setenv('SGM_SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'wsgi.db'}")
+    monkeypatch.setenv('SGM_VENCIMENTOS_AUTOMATICO', 'false')
+    monkeypatch.delitem(sys.modules, 'wsgi', raising=False)
+
+    wsgi = importlib.import_module('wsgi')
+
+    assert wsgi.app.config['SGM_PERFIL'] == 'producao'
+    assert wsgi.app.config['SECRET_KEY'] == 'segredo'
+    assert wsgi.app.config['VENCIMENTOS_AUTOMATICO'] is False
+    assert not (tmp_path / 'wsgi.db').exists()
@@ -0,0 +1,49 @@
+"""
+KPIs do dashboard do administrador calculados por agregação no banco
+(web/analytics.py) e exibidos em /home
+"""
+
+from web import analytics
+from web.models import db
+from datetime import timedelta
+
+
+def _carteira(novo):
+    """Uma dívida de cada situação: paga, vencida, vencendo hoje, futura e renegociada"""
+    cliente = novo.cliente()
+    paga = novo.divida(cliente, 50.0, vencimento=-3)
+    novo.pagamento(paga, 50.0)
+    novo.divida(cliente, 100.0, vencimento=-2)
+    novo.divida(cliente, 30.0)
+    novo.divida(cliente, 70.0, vencimento=10)
+    renegociada = novo.divida(cliente, 20.0, vencimento=-5)
+    renegociada.renegociar(novo.hoje + timedelta(days=5), 10.0, 'adm')
+    db.session.commit()
+    return cliente
+
+
+def test_kpis_recebiveis(novo):
+    _carteira(novo)
+
+    kpis = analytics.kpis_recebiveis(novo.hoje)
+    assert kpis['total_a_receber'] == 222.0
+    assert kpis['total_vencido'] == 130.0  # Inclui a que vence hoje
+    assert kpis['total_vencido_anterior'] == 100.0
+    assert (kpis['qtd_pagas'], kpis['qtd_vencidas'], kpis['qtd_abertas']) == (1, 1, 3)
+
+
+def test_contagem_por_status(novo):
+    _carteira(novo)
+
+    # [pagas, em dia, renegociadas, vencidas (inclui hoje)]
+    assert analytics.contagem_por_status(novo.hoje) == [1, 1, 1, 2]
+
+
+def test_home_do_administrador(http, novo):
+    _carteira(novo)
+
+    resposta = http.get('/home')
+    assert resposta.status_code == 200
+    pagina = resposta.get_data(as_text=True)
+    assert 'R$ 222.00' in pagina
+    assert 'R$ 130.00' in pagina
@@ -0,0 +1,55 @@
+"""
+Medição de desempenho por requisição (web/desempenho.py): Server-Timing,
+percentis por rota e log de lentidão
+"""
+
+from web import desempenho
+import logging
+import re
+
+
+def test_percentil():
+    valores = [10.0, 20.0, 30.0, 40.0]
+
+    assert desempenho.percentil(valores, 50) == 25.0
+    assert desempenho.percentil(valores, 100) == 40.0
+    assert desempenho.percentil([], 95) == 0.0
+
+
+def test_server_timing_e_percentis(http, novo):
+    novo.cliente('Ana')
+
+    resposta = http.get('/api/clientes')
+    sql = int(re.search(r'db;desc="(\d+) SQL"', resposta.headers['Server-Timing']).group(1))
+    assert sql > 0
+
+    rotas = {r['rota']: r for r in http.get('/admin/desempenho?formato=json').get_json()}
+    assert rotas['main.api_clientes']['requisicoes'] == 1
+    assert rotas['main.api_clientes']['sql_max'] == sql
+    assert http.get('/admin/desempenho').status_code == 200
+
+    assert http.post('/admin/desempenho').status_code == 302
+    rotas = {r['rota'] for r in http.get('/admin/desempenho?formato=json').get_json()}
+    assert 'main.api_clientes' not in rotas
+
+
+def test_log_de_requisicoes_e_sql_lentos(criar_app, caplog):
+    app = criar_app(DESEMPENHO_REQ_LENTA_MS=0, DESEMPENHO_SQL_LENTO_MS=0)
+    http = app.test_client()
+    http.post('/', data={'usuario': 'adm', 'senha': 'adm'})
+
+    with caplog.at_level(logging.WARNING, logger='sgm.lento'):
+        assert http.get('/api/clientes').status_code == 200
+
+    assert 'Requisição lenta' in caplog.text
+    assert 'rota=main.api_clientes GET /api/clientes status=200' in caplog.text
+    assert 'SQL lento' in caplog.text
+
+
+def test_desativado(criar_app):
+    app = criar_app(DESEMPENHO_ATIVO=False)
+    http = app.test_client()
+
+    assert 'Server-Timing' not in http.get('/').headers
+    with app.app_context():
+        assert desempenho.resumo() == []
@@ -0,0 +1,50 @@
+"""
+ETags das APIs de clientes: 304 enquanto nada muda, nova ETag depois de
+uma escrita que afeta a resposta
+"""
+
+from web import versoes
+
+
+def _revalidar(http, url, etag):
+    return http.get(url, headers={'If-None-Match': etag})
+
+
+def test_lista_de_clientes(http, novo):
+    novo.cliente('Ana')
+    resposta = http.get('/api/clientes')
+    assert resposta.status_code == 200
+    etag = resposta.headers['ETag']
+
+    repetida = _revalidar(http, '/api/clientes', etag)
+    assert repetida.status_code == 304
+    assert repetida.data == b''
+
+    assert http.post('/clientes/novo', data={'nome': 'Bia', 'limite': '100'}).status_code == 302
+    atualizada = _revalidar(http, '/api/clientes', etag)
+    assert atualizada.status_code == 200
+    assert atualizada.headers['ETag'] != etag
+    assert 'Bia' in atualizada.get_data(as_text=True)
+
+
+def test_perfil_do_cliente(http, novo):
+    cliente = novo.cliente('Ana')
+    divida = novo.divida(cliente, 50.0)
+    url = f'/api/cliente/{cliente.id}'
+    etag = http.get(url).headers['ETag']
+    assert _revalidar(http, url, etag).status_code == 304
+
+    resposta = http.post('/api/pagamentos/lote', json={'pagamentos': [{'divida_id': divida.id, 'valor': 20.0}]})
+    assert resposta.status_code == 200
+    atualizado = _revalidar(http, url, etag)
+    assert atualizado.status_code == 200
+    assert atualizado.headers['ETag'] != etag
+
+
+def test_cliente_apagado_nao_responde_304(http, novo):
+    cliente_id = novo.cliente('Ana').id
+    url = f'/api/cliente/{cliente_id}'
+    assert http.post(f'/clientes/{cliente_id}/apagar').status_code == 200
+
+    etag, _ = versoes.obter(f'cliente:{cliente_id}')  # ETag atual da chave
+    assert _revalidar(http, url, etag).status_code == 404
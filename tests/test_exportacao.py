@@ -0,0 +1,84 @@
+"""
+Exportações em CSV e JSON (web/exportacao.py): streaming em partes,
+filtros e histórico arquivado
+"""
+
+from web import arquivo, exportacao
+from datetime import timedelta
+import csv
+import io
+
+
+def _csv(resposta):
+    texto = resposta.get_data(as_text=True)
+    assert texto.startswith('\ufeff')
+    return list(csv.DictReader(io.StringIO(texto[1:])))
+
+
+def test_csv_e_json_com_os_mesmos_dados(http, novo):
+    cliente = novo.cliente('Ana')
+    divida = novo.divida(cliente, 100.0)
+    novo.pagamento(divida, 40.0, meio='Pix')
+    novo.pagamento(divida, 10.0)
+
+    resposta = http.get('/exportar/pagamentos.csv')
+    assert resposta.is_streamed
+    assert resposta.headers['Content-Disposition'].startswith('attachment; filename=pagamentos_')
+    linhas = _csv(resposta)
+    assert [(l['cliente'], float(l['valor']), l['meio_pagamento']) for l in linhas] == \
+        [('Ana', 40.0, 'Pix'), ('Ana', 10.0, 'Dinheiro')]
+
+    dados = http.get('/exportar/pagamentos.json').get_json()
+    assert [p['id'] for p in dados] == [int(l['id']) for l in linhas]
+    assert dados[0]['data_pagamento'] == novo.hoje.isoformat()
+
+
+def test_le_e_escreve_em_partes(app, novo, monkeypatch):
+    monkeypatch.setattr(exportacao, 'LINHAS_POR_PARTE', 2)
+    cliente = novo.cliente()
+    for i in range(5):
+        novo.divida(cliente, 10.0 + i)
+
+    f = exportacao.filtros({})
+    pedacos = list(exportacao.gerar_csv(exportacao.consulta_dividas(f)))
+    objetos = ''.join(exportacao.gerar_json(exportacao.consulta_dividas(f)))
+
+    assert len(pedacos) == 4  # 3 partes (2 + 2 + 1) e o fim
+    assert objetos.count('"valor_original"') == 5
+
+
+def test_filtros(http, novo):
+    cliente, outro = novo.cliente(), novo.cliente()
+    paga = novo.divida(cliente, 10.0)
+    novo.pagamento(paga, 10.0, meio='Pix')
+    aberta = novo.divida(outro, 20.0)
+    novo.pagamento(aberta, 5.0)
+
+    assert [int(l['id']) for l in _csv(http.get('/exportar/dividas.csv?status=abertas'))] == [aberta.id]
+    assert [l['cliente'] for l in _csv(http.get(f'/exportar/dividas.csv?cliente_id={cliente.id}'))] == [cliente.nome]
+    assert [float(l['valor']) for l in _csv(http.get('/exportar/pagamentos.csv?meio=Pix'))] == [10.0]
+    amanha = (novo.hoje + timedelta(days=1)).isoformat()
+    assert _csv(http.get(f'/exportar/dividas.csv?inicio={amanha}')) == []
+
+    assert http.get('/exportar/dividas.csv?inicio=ontem').status_code == 400
+    assert http.get('/exportar/clientes.csv').status_code == 404
+    assert http.get('/exportar/dividas.xml').status_code == 404
+
+
+def test_historico_arquivado_so_quando_pedido(http, novo):
+    cliente = novo.cliente()
+    antiga = novo.divida(cliente, 30.0, venda=novo.hoje - timedelta(days=500))
+    novo.pagamento(antiga, 30.0, data=novo.hoje - timedelta(days=450))
+    recente = novo.divida(cliente, 50.0)
+    novo.pagamento(recente, 5.0)
+    antiga_id = antiga.id
+    assert arquivo.arquivar() == 1
+
+    sem = _csv(http.get('/exportar/dividas.csv'))
+    com = _csv(http.get('/exportar/dividas.csv?arquivadas=1'))
+    assert [int(l['id']) for l in sem] == [recente.id]
+    assert [int(l['id']) for l in com] == [antiga_id, recente.id]
+
+    extrato = http.get(f'/exportar/extrato/{cliente.id}.json?arquivadas=1').get_json()
+    assert [(e['tipo'], e['divida_id']) for e in extrato[:2]] == [('Compra', antiga_id), ('Pagamento', antiga_id)]
+    assert len(http.get(f'/exportar/extrato/{cliente.id}.json').get_json()) == 2
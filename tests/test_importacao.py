@@ -0,0 +1,78 @@
+"""
+Importação em lote (POST /admin/importar): linhas inválidas rejeitadas com
+o motivo, codificação do CSV e arquivo mal formado
+"""
+
+from web import saldos, carteira, resumo
+from web.models import Cliente, Divida
+from io import BytesIO
+
+
+def _importar(http, conteudo, nome='clientes.csv', codificacao=''):
+    return http.post(
+        '/admin/importar?formato=json',
+        data={'arquivo': (BytesIO(conteudo), nome), 'codificacao': codificacao},
+        content_type='multipart/form-data',
+    )
+
+
+def test_linhas_invalidas_sao_rejeitadas(http):
+    csv = (
+        'nome,cpf,saldo,vencimento\n'
+        'Maria,11111111111,10.50,2030-01-10\n'
+        ',,5,2030-01-10\n'
+        'José,22222222222,-3,2030-01-10\n'
+        'Rita,33333333333,abc,2030-01-10\n'
+        'Paulo,44444444444,8,10/01/2030\n'
+        'Ana,55555555555,0,\n'
+    ).encode('utf-8')
+
+    resposta = _importar(http, csv)
+    assert resposta.status_code == 200
+    relatorio = resposta.get_json()
+    assert relatorio['linhas'] == 6
+    assert relatorio['rejeitadas'] == 4
+    assert [(e['linha'], e['motivo']) for e in relatorio['erros']] == [
+        (3, 'nome ou CPF obrigatório'),
+        (4, 'saldo negativo'),
+        (5, 'saldo inválido'),
+        (6, 'data inválida (use AAAA-MM-DD)'),
+    ]
+    assert relatorio['clientes_criados'] == 2
+    assert relatorio['dividas_criadas'] == 1
+    assert Divida.query.one().saldo_devedor == 10.5
+    assert saldos.divergentes() == []
+    assert carteira.reconstruir() == []
+    assert resumo.reconstruir() == []
+
+
+def test_csv_em_cp1252(http):
+    csv = 'nome,saldo\nJoão Gonçalves,12\n'.encode('cp1252')
+
+    resposta = _importar(http, csv)
+    assert resposta.status_code == 200
+    assert resposta.get_json()['clientes_criados'] == 1
+    assert Cliente.query.one().nome == 'João Gonçalves'
+
+
+def test_codificacao_explicita_e_estrita(http):
+    csv = 'nome,saldo\nJoão,12\n'.encode('cp1252')
+
+    resposta = _importar(http, csv, codificacao='utf-8')
+    assert resposta.status_code == 400
+    assert resposta.get_json()['erro'].startswith('Linha 2')
+    assert Cliente.query.count() == 0
+
+
+def test_json_mal_formado(http):
+    conteudo = b'[{"nome": "Ana", "saldo": 5}, {"nome": "Bia", '
+
+    resposta = _importar(http, conteudo, nome='clientes.json')
+    assert resposta.status_code == 400
+    assert 'erro' in resposta.get_json()
+
+
+def test_sem_arquivo(http):
+    resposta = http.post('/admin/importar', data={}, content_type='multipart/form-data')
+    assert resposta.status_code == 302
+    assert Cliente.query.count() == 0
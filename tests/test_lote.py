@@ -0,0 +1,87 @@
+"""
+Pagamentos em lote (POST /api/pagamentos/lote): validação do lote inteiro
+antes de gravar e aplicação em uma transação
+"""
+
+from web import pagamentos, saldos, carteira, resumo
+from web.models import db, Divida, Pagamento, Parcela
+
+
+def _saldo(divida):
+    db.session.expire_all()
+    return db.session.get(Divida, divida.id).saldo_devedor
+
+
+def test_item_invalido_nao_aplica_nada(http, novo):
+    divida = novo.divida(novo.cliente(), 100.0)
+    lote = {'pagamentos': [
+        {'divida_id': divida.id, 'valor': 25.0, 'meio': 'Dinheiro'},
+        {'divida_id': divida.id + 1000, 'valor': 10.0},
+    ]}
+
+    resposta = http.post('/api/pagamentos/lote', json=lote)
+
+    assert resposta.status_code == 422
+    dados = resposta.get_json()
+    assert (dados['aplicado'], dados['registrados']) == (False, 0)
+    assert [r['ok'] for r in dados['resultados']] == [False, False]
+    assert dados['resultados'][1]['erro'] == 'Dívida não encontrada.'
+    assert _saldo(divida) == 100.0
+    assert Pagamento.query.count() == 0
+
+
+def test_parcial_aplica_os_validos(http, novo):
+    divida = novo.divida(novo.cliente(), 100.0)
+    lote = {'parcial': True, 'pagamentos': [
+        {'divida_id': divida.id, 'valor': 25.0, 'meio': 'Dinheiro'},
+        {'divida_id': divida.id, 'valor': -1.0},
+        {'divida_id': divida.id, 'valor': 75.0, 'meio': 'Pix'},
+    ]}
+
+    resposta = http.post('/api/pagamentos/lote', json=lote)
+
+    assert resposta.status_code == 200
+    dados = resposta.get_json()
+    assert (dados['aplicado'], dados['registrados'], dados['erros']) == (True, 2, 1)
+    assert dados['resultados'][2]['status_divida'] == 'Paga'
+    assert _saldo(divida) == 0.0
+    assert [p.valor for p in Pagamento.query.order_by(Pagamento.id)] == [25.0, 75.0]
+    assert saldos.divergentes() == []
+    assert carteira.reconstruir() == []
+    assert resumo.reconstruir() == []
+
+
+def test_itens_da_mesma_divida_somam_no_saldo(app, novo):
+    divida = novo.divida(novo.cliente(), 50.0)
+
+    _, resultados = pagamentos.validar([
+        {'divida_id': divida.id, 'valor': 30.0},
+        {'divida_id': divida.id, 'valor': 30.0},
+    ], 'adm')
+
+    assert resultados[0]['ok']
+    assert resultados[1]['erro'] == 'Valor excede o saldo da dívida (R$ 20.00).'
+
+
+def test_pagamento_de_parcela(http, novo):
+    divida = novo.divida(novo.cliente(), 90.0, parcelas=3)
+    primeira = Parcela.query.filter_by(divida_id=divida.id, numero_parcela=1).one()
+
+    resposta = http.post('/api/pagamentos/lote', json=[
+        {'divida_id': divida.id, 'parcela_id': primeira.id, 'valor': 29.995},
+    ])
+
+    resultado = resposta.get_json()['resultados'][0]
+    assert resultado['status_parcela'] == 'Paga'  # Margem de 1 centavo
+    assert resultado['status_divida'] == 'Pendente'
+    db.session.expire_all()
+    assert db.session.get(Parcela, primeira.id).valor_pago == 30.0
+    assert carteira.reconstruir() == []
+
+
+def test_lote_mal_formado(http):
+    assert http.post('/api/pagamentos/lote', json={'pagamentos': 'x'}).status_code == 400
+    grande = [{'divida_id': 1, 'valor': 1}] * (pagamentos.LOTE_MAXIMO + 1)
+    resposta = http.post('/api/pagamentos/lote', json=grande)
+    assert resposta.status_code == 400
+    assert 'máximo' in resposta.get_json()['erro']
@@ -0,0 +1,62 @@
+"""
+Métricas do Prometheus (web/metricas.py): contadores de negócio, formato
+de texto e controle de acesso a /metrics
+"""
+
+from web import metricas
+from web.models import db, Pagamento
+import pytest
+
+
+def test_contadores_de_negocio(http, novo):
+    cliente = novo.cliente()
+    divida = novo.divida(cliente, 100.0)
+
+    resposta = http.post('/api/pagamentos/lote', json={'pagamentos': [
+        {'divida_id': divida.id, 'valor': 30, 'meio': 'Pix'},
+        {'divida_id': divida.id, 'valor': 20, 'meio': 'Pix'},
+    ]})
+    assert resposta.status_code == 200
+
+    texto = http.get('/metrics').get_data(as_text=True)
+    assert 'sgm_pagamentos_total{meio="Pix",usuario="adm"} 2' in texto
+    assert 'sgm_pagamentos_valor_reais_total{meio="Pix",usuario="adm"} 50' in texto
+    assert '# TYPE sgm_http_request_duration_seconds histogram' in texto
+    assert 'sgm_http_request_duration_seconds_count{endpoint="main.api_pagamentos_lote",method="POST"} 1' in texto
+
+
+def test_rollback_nao_conta(app, novo):
+    divida = novo.divida(novo.cliente(), 100.0)
+
+    db.session.add(Pagamento(divida_id=divida.id, valor=10.0, meio_pagamento='Pix', usuario_responsavel='adm'))
+    db.session.flush()
+    db.session.rollback()
+
+    assert metricas.exportar().count('sgm_pagamentos_total{') == 0
+
+
+def test_acesso(criar_app):
+    app = criar_app(METRICAS_TOKEN='segredo', METRICAS_IPS=['10.0.0.0/24'])
+    http = app.test_client()
+
+    assert http.get('/metrics').status_code == 403  # Nem localhost é liberado
+    assert http.get('/metrics', headers={'Authorization': 'Bearer segredo'}).status_code == 200
+    assert http.get('/metrics', headers={'Authorization': 'Bearer outro'}).status_code == 403
+    assert http.get('/metrics', environ_base={'REMOTE_ADDR': '10.0.0.7'}).status_code == 200
+    assert http.get('/metrics', environ_base={'REMOTE_ADDR': '10.0.1.7'}).status_code == 403
+
+    http.post('/', data={'usuario': 'adm', 'senha': 'adm'})
+    assert http.get('/metrics').status_code == 200
+
+
+def test_lista_de_enderecos_em_texto(criar_app):
+    app = criar_app(METRICAS_IPS='10.0.0.5, 192.168.0.0/16')
+    http = app.test_client()
+
+    assert http.get('/metrics', environ_base={'REMOTE_ADDR': '192.168.3.4'}).status_code == 200
+    assert http.get('/metrics', environ_base={'REMOTE_ADDR': '10.0.0.6'}).status_code == 403
+
+
+def test_endereco_invalido_impede_a_subida(criar_app):
+    with pytest.raises(ValueError, match='METRICAS_IPS'):
+        criar_app(METRICAS_IPS=['10.0.0.5', 'rede-do-coletor'])
@@ -0,0 +1,47 @@
+"""
+Migrações de schema (web/migrations.py): versões registradas, índices
+das consultas principais e passos idempotentes
+"""
+
+from web import migrations, saldos, movimento, carteira, resumo
+from web.models import db, Divida, Migracao
+from sqlalchemy import text
+
+
+def _nomes(tipo):
+    return set(db.session.execute(
+        text('SELECT name FROM sqlite_master WHERE type = :tipo'), {'tipo': tipo}
+    ).scalars())
+
+
+def test_banco_preparado_na_ultima_versao(app):
+    assert migrations.versao_atual() == migrations.MIGRACOES[-1][0]
+    assert {'ix_divida_cliente_status', 'ix_divida_status_vencimento', 'ix_pagamento_divida',
+            'ix_parcela_divida_numero', 'ix_cliente_cpf'} <= _nomes('index')
+    assert migrations.aplicar() == []
+
+
+def test_consulta_por_cliente_usa_o_indice(app):
+    plano = db.session.execute(text(
+        "EXPLAIN QUERY PLAN SELECT * FROM divida WHERE cliente_id = 1 AND status != 'Paga'"
+    )).all()
+    assert any('ix_divida_cliente_status' in linha[-1] for linha in plano)
+
+
+def test_migracoes_reaplicadas_sobre_um_banco_com_dados(novo):
+    cliente = novo.cliente()
+    divida = novo.divida(cliente, 90.0, parcelas=3, vencimento=-5)
+    novo.pagamento(divida, 30.0)
+    novo.divida(cliente, 40.0, vencimento=-2)
+    gatilhos = _nomes('trigger')
+    db.session.execute(db.delete(Migracao))
+    db.session.commit()
+
+    assert [v for v, _ in migrations.aplicar()] == [v for v, _, _ in migrations.MIGRACOES]
+
+    assert _nomes('trigger') == gatilhos
+    assert Divida.query.count() == 2
+    assert saldos.divergentes() == []
+    assert movimento.reconstruir() == []
+    assert carteira.reconstruir() == []
+    assert resumo.reconstruir() == []
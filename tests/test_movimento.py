@@ -0,0 +1,63 @@
+"""
+Movimento diário (web/movimento.py): vendas, pagamentos e renegociações
+somados por dia e o relatório por período
+"""
+
+from web import arquivo, movimento
+from web.models import db, MovimentoDiario
+from datetime import timedelta
+
+
+def test_relatorio_do_dia(http, novo):
+    ana = novo.cliente('Ana')
+    divida = novo.divida(ana, 100.0)
+    outra = novo.divida(ana, 40.0)
+    novo.pagamento(divida, 30.0, meio='Pix')
+    novo.pagamento(divida, 20.0)
+    assert http.post(f'/dividas/{outra.id}/renegociar', data={'prazo_dias': '10', 'juros': '10'}).status_code == 302
+
+    dados = http.get('/api/relatorios/movimento?agrupar=dia&por=meio').get_json()
+
+    [hoje] = dados['periodos']
+    assert hoje['periodo'] == novo.hoje.isoformat()
+    assert (hoje['vendido'], hoje['vendas']) == (140.0, 2)
+    assert (hoje['recebido'], hoje['pagamentos']) == (50.0, 2)
+    assert (hoje['renegociado'], hoje['renegociacoes']) == (44.0, 1)  # Saldo já com os juros
+    por_meio = {d['meio']: d['recebido'] for d in hoje['detalhe'] if d['pagamentos']}
+    assert por_meio == {'Pix': 30.0, 'Dinheiro': 20.0}
+    assert movimento.reconstruir() == []
+
+
+def test_agrupa_por_mes_e_mantem_o_arquivo(http, novo):
+    ana = novo.cliente('Ana')
+    inicio_do_mes = novo.hoje.replace(day=1)
+    antiga = novo.divida(ana, 25.0, venda=inicio_do_mes - timedelta(days=400))
+    novo.pagamento(antiga, 25.0, data=inicio_do_mes - timedelta(days=390))
+    novo.divida(ana, 10.0)
+    apagada = novo.divida(ana, 5.0)
+    assert http.post(f'/dividas/{apagada.id}/apagar').status_code == 200
+    assert arquivo.arquivar(12) == 1
+
+    inicio = (inicio_do_mes - timedelta(days=400)).isoformat()
+    dados = http.get(f'/api/relatorios/movimento?inicio={inicio}&agrupar=mes').get_json()
+
+    meses = {p['periodo']: p for p in dados['periodos']}
+    assert meses[novo.hoje.strftime('%Y-%m-01')]['vendido'] == 10.0  # Sem a apagada
+    assert sum(p['vendido'] for p in meses.values()) == 35.0
+    assert sum(p['recebido'] for p in meses.values()) == 25.0  # Pagamento arquivado
+    assert movimento.reconstruir() == []
+
+
+def test_reconstruir_corrige_divergencias(app, novo):
+    novo.divida(novo.cliente(), 10.0)
+    db.session.execute(db.update(MovimentoDiario).values(valor=0.0))
+
+    assert movimento.reconstruir() != []
+    assert movimento.reconstruir() == []
+
+
+def test_parametros_invalidos(http):
+    for consulta in ('inicio=2024-02-01&fim=2024-01-01', 'agrupar=ano', 'por=cliente', 'inicio=ontem'):
+        resposta = http.get(f'/api/relatorios/movimento?{consulta}')
+        assert resposta.status_code == 400
+        assert 'erro' in resposta.get_json()
@@ -0,0 +1,76 @@
+"""
+Paginação por cursor (keyset) das listas de clientes, dívidas e usuários
+"""
+
+from web import paginacao
+from web.models import Cliente, Divida
+import re
+
+
+def _todas(consulta, chaves, tamanho):
+    """Percorre todas as páginas pelo cursor `proximo`"""
+    paginas, apos = [], None
+    while True:
+        pagina = paginacao.paginar(consulta, chaves, apos=apos, tamanho=tamanho)
+        paginas.append(pagina)
+        if not pagina.proximo:
+            return paginas
+        apos = pagina.proximo
+
+
+def test_percorre_sem_repetir_nem_pular(novo):
+    for nome in ['Bia', 'Ana', 'Gil', 'Caio', 'Edu', 'Fabi', 'Davi']:
+        novo.cliente(nome)
+    chaves = [Cliente.nome, Cliente.id]
+
+    paginas = _todas(Cliente.query, chaves, tamanho=2)
+
+    vistos = [c.id for p in paginas for c in p]
+    assert vistos == [c.id for c in Cliente.query.order_by(Cliente.nome, Cliente.id)]
+    assert [len(p) for p in paginas] == [2, 2, 2, 1]
+    assert paginas[0].anterior is None
+
+
+def test_volta_pela_pagina_anterior(novo):
+    for i in range(7):
+        novo.cliente(f'Cliente {i}')
+    chaves = [Cliente.nome, Cliente.id]
+    segunda, terceira = _todas(Cliente.query, chaves, tamanho=3)[1:]
+
+    volta = paginacao.paginar(Cliente.query, chaves, antes=terceira.anterior, tamanho=3)
+    assert [c.id for c in volta] == [c.id for c in segunda]
+    primeira = paginacao.paginar(Cliente.query, chaves, antes=volta.anterior, tamanho=3)
+    assert [c.nome for c in primeira] == ['Cliente 0', 'Cliente 1', 'Cliente 2']
+    assert primeira.anterior is None
+
+
+def test_cursor_com_data(novo):
+    cliente = novo.cliente()
+    # Vencimentos repetidos: o id desempata
+    for dias in (5, -3, 5, 0, 5, 12):
+        novo.divida(cliente, 10.0, vencimento=dias)
+    chaves = [Divida.data_vencimento, Divida.id]
+
+    vistas = [d.id for p in _todas(Divida.query, chaves, tamanho=2) for d in p]
+    assert vistas == [d.id for d in Divida.query.order_by(Divida.data_vencimento, Divida.id)]
+
+
+def test_cursor_invalido_volta_para_o_inicio(novo):
+    for i in range(3):
+        novo.cliente(f'Cliente {i}')
+
+    pagina = paginacao.paginar(Cliente.query, [Cliente.nome, Cliente.id], apos='nao-e-um-cursor', tamanho=2)
+    assert [c.nome for c in pagina] == ['Cliente 0', 'Cliente 1']
+
+
+def test_links_da_api_e_telas(http, novo):
+    for i in range(5):
+        novo.cliente(f'Cliente {i}')
+
+    resposta = http.get('/api/clientes?tamanho=2')
+    assert [c['nome'] for c in resposta.get_json()] == ['Cliente 0', 'Cliente 1']
+    proximo = re.search(r'<([^>]+)>; rel="next"', resposta.headers['Link']).group(1)
+    assert [c['nome'] for c in http.get(proximo).get_json()] == ['Cliente 2', 'Cliente 3']
+
+    for tela in ('/clientes?tamanho=2', '/dividas?tamanho=2', '/admin/usuarios?tamanho=2'):
+        assert http.get(tela).status_code == 200
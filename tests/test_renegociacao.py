@@ -0,0 +1,48 @@
+"""
+Renegociação em lote das dívidas abertas do cliente ao lançar uma nova
+dívida (Divida.renegociar_pendentes)
+"""
+
+from web import saldos, movimento, carteira, resumo
+from web.models import db, Divida, Renegociacao
+from datetime import timedelta
+
+
+def test_nova_divida_renegocia_as_abertas(http, novo):
+    cliente, outro = novo.cliente(), novo.cliente()
+    abertas = [novo.divida(cliente, 10.0, vencimento=-3), novo.divida(cliente, 20.0, vencimento=4)]
+    novo.pagamento(abertas[1], 5.0)
+    paga = novo.divida(cliente, 15.0)
+    novo.pagamento(paga, 15.0)
+    alheia = novo.divida(outro, 30.0)
+    ids = [d.id for d in abertas]
+
+    resposta = http.post('/dividas/novo', data={'cliente_id': cliente.id, 'valor': '40', 'prazo': '30'})
+    assert resposta.status_code == 302
+
+    db.session.expire_all()
+    nova = Divida.query.filter_by(cliente_id=cliente.id).order_by(Divida.id.desc()).first()
+    assert nova.data_vencimento == novo.hoje + timedelta(days=30)
+    assert nova.status == 'Pendente'
+    for divida in Divida.query.filter(Divida.id.in_(ids)):
+        assert (divida.status, divida.data_vencimento) == ('Renegociada', nova.data_vencimento)
+    assert db.session.get(Divida, paga.id).status == 'Paga'
+    assert db.session.get(Divida, alheia.id).status == 'Pendente'
+
+    renegociacoes = Renegociacao.query.order_by(Renegociacao.divida_id).all()
+    assert [(r.divida_id, r.juros_percent, r.saldo_renegociado, r.usuario_responsavel) for r in renegociacoes] == \
+        [(ids[0], 0.0, 10.0, 'adm'), (ids[1], 0.0, 15.0, 'adm')]
+    assert all(r.nova_data_venc == nova.data_vencimento for r in renegociacoes)
+
+    assert saldos.divergentes() == []
+    assert movimento.reconstruir() == []
+    assert carteira.reconstruir() == []
+    assert resumo.reconstruir() == []
+    assert 'sgm_renegociacoes_total{usuario="adm"} 2' in http.get('/metrics').get_data(as_text=True)
+
+
+def test_sem_dividas_abertas(app, novo):
+    cliente = novo.cliente()
+
+    assert Divida.renegociar_pendentes(cliente.id, novo.hoje, 'adm') == 0
+    assert Renegociacao.query.count() == 0
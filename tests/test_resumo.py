@@ -0,0 +1,66 @@
+"""
+Resumo de recebíveis mantido a cada escrita (web/resumo.py)
+
+O resumo gravado precisa bater com o recálculo depois de qualquer
+sequência de escritas, e as leituras de um novo dia não gravam nada.
+"""
+
+from web import resumo, vencimentos
+from web.models import db, ResumoRecebiveis
+from datetime import timedelta
+import pytest
+
+
+def test_escritas_mantem_o_resumo(http, novo):
+    cliente = novo.cliente()
+    vencida = novo.divida(cliente, 120.0, vencimento=-10)
+    a_vencer = novo.divida(cliente, 80.0, vencimento=15)
+    apagada = novo.divida(cliente, 30.0, vencimento=5)
+    novo.divida(cliente, 300.0, parcelas=3)
+
+    assert http.post(f'/dividas/{vencida.id}/pagar', data={'valor': '120', 'meio': 'Pix'}).status_code == 302
+    assert http.post(f'/dividas/{a_vencer.id}/pagar', data={'valor': '30', 'meio': 'Dinheiro'}).status_code == 302
+    assert http.post(f'/dividas/{a_vencer.id}/renegociar', data={'prazo_dias': '-2', 'juros': '5'}).status_code == 302
+    assert http.post(f'/dividas/{apagada.id}/apagar').status_code == 200
+
+    assert resumo.reconstruir() == []
+
+
+def test_leitura_de_outro_dia_nao_grava(novo, comandos):
+    cliente = novo.cliente()
+    novo.divida(cliente, 40.0, vencimento=2)
+    novo.divida(cliente, 60.0, vencimento=20)
+    dia = novo.hoje + timedelta(days=5)
+    comandos.clear()
+
+    obtido = resumo.obter(dia)
+
+    assert not [c for c in comandos if c in ('INSERT', 'UPDATE', 'DELETE')]
+    assert db.session.get(ResumoRecebiveis, resumo.RESUMO_ID).data_referencia == novo.hoje
+    esperado = resumo.calcular(dia)
+    assert {k: getattr(obtido, k) for k in resumo.CONTADORES} == pytest.approx(esperado)
+    assert obtido.total_vencido == 40.0
+
+
+def test_dashboard_de_um_novo_dia_sem_escrita(http, novo, comandos):
+    novo.divida(novo.cliente(), 40.0, vencimento=-1)
+    # Resumo gravado ontem; a tarefa de vencimentos ainda não rodou hoje
+    db.session.execute(db.update(ResumoRecebiveis).values(data_referencia=novo.hoje - timedelta(days=1)))
+    db.session.commit()
+    comandos.clear()
+
+    assert http.get('/home').status_code == 200
+    assert http.get('/relatorios/dashboard').status_code == 200
+    assert not [c for c in comandos if c in ('INSERT', 'UPDATE', 'DELETE')]
+    assert 'R$ 40.00' in http.get('/home').get_data(as_text=True)
+
+
+def test_tarefa_diaria_avanca_o_resumo(novo):
+    cliente = novo.cliente()
+    novo.divida(cliente, 40.0, vencimento=2)
+    dia = novo.hoje + timedelta(days=5)
+
+    vencimentos.atualizar(dia)
+
+    assert db.session.get(ResumoRecebiveis, resumo.RESUMO_ID, populate_existing=True).data_referencia == dia
+    assert resumo.reconstruir(dia) == []
@@ -0,0 +1,99 @@
+"""
+Saldos por cliente mantidos por triggers (web/saldos.py) e limite de
+crédito ao lançar uma dívida
+"""
+
+from web import saldos, importacao, vencimentos
+from web.models import db, Cliente, Divida, Parcela
+from datetime import timedelta
+from sqlalchemy import text
+import pytest
+
+
+def _cliente(cliente_id):
+    db.session.expire_all()
+    return db.session.get(Cliente, cliente_id)
+
+
+def test_escritas_por_todos_os_caminhos(http, novo):
+    ana, bia, caio = novo.cliente('Ana'), novo.cliente('Bia'), novo.cliente('Caio')
+    vencida = novo.divida(ana, 120.0, vencimento=-10)
+    a_vencer = novo.divida(ana, 80.0, vencimento=15)
+    parcelada = novo.divida(bia, 300.0, parcelas=3)
+    avulsa = novo.divida(caio, 50.0, vencimento=-40)
+    apagada = novo.divida(caio, 30.0, vencimento=5)
+    novo.pagamento(vencida, 20.0)
+
+    parcela = Parcela.query.filter_by(divida_id=parcelada.id, numero_parcela=1).one()
+    assert http.post('/api/pagamentos/lote', json={'pagamentos': [
+        {'divida_id': parcelada.id, 'parcela_id': parcela.id, 'valor': 60.0, 'meio': 'Pix'},
+        {'divida_id': avulsa.id, 'valor': 50.0, 'meio': 'Cartão'},
+    ]}).status_code == 200
+    assert http.post(f'/api/clientes/{ana.id}/pagamento', json={'valor': 110.0, 'meio': 'Pix'}).status_code == 200
+    assert http.post(f'/dividas/{a_vencer.id}/renegociar', data={'prazo_dias': '20', 'juros': '5'}).status_code == 302
+    assert http.post(f'/dividas/{apagada.id}/apagar').status_code == 200
+    importacao.importar([(1, {'nome': 'Importado', 'saldo': '45,50', 'vencimento': '2020-01-10'})])
+    vencimentos.atualizar()
+
+    assert saldos.divergentes() == []
+    ana = _cliente(ana.id)
+    abertas = Divida.query.filter(Divida.cliente_id == ana.id, Divida.status != 'Paga').all()
+    assert ana.qtd_dividas_abertas == len(abertas) == 1
+    assert ana.saldo_aberto == pytest.approx(sum(d.saldo_devedor for d in abertas)) == pytest.approx(73.5)
+    assert ana.saldo_vencido == 0.0
+    caio = _cliente(caio.id)
+    assert (caio.saldo_aberto, caio.qtd_dividas_abertas, caio.vencimento_mais_antigo) == (0.0, 0, None)
+
+
+def test_sql_direto_tambem_atualiza(app, novo):
+    ana, bia = novo.cliente('Ana'), novo.cliente('Bia')
+    antiga = novo.divida(ana, 10.0, vencimento=-5)
+    novo.divida(ana, 20.0, vencimento=3)
+
+    # Mudar a dívida de cliente tira o saldo de um e soma no outro
+    db.session.execute(text('UPDATE divida SET cliente_id = :bia WHERE id = :id'), {'bia': bia.id, 'id': antiga.id})
+    db.session.commit()
+
+    ana, bia = _cliente(ana.id), _cliente(bia.id)
+    assert (ana.saldo_aberto, ana.saldo_vencido, ana.qtd_dividas_abertas) == (20.0, 0.0, 1)
+    assert ana.vencimento_mais_antigo == novo.hoje + timedelta(days=3)
+    assert (bia.saldo_aberto, bia.saldo_vencido) == (10.0, 10.0)
+
+    db.session.execute(text('DELETE FROM divida WHERE cliente_id = :ana'), {'ana': ana.id})
+    db.session.commit()
+    assert _cliente(ana.id).saldo_aberto == 0.0
+    assert saldos.divergentes() == []
+
+
+def test_conferencia_acusa_e_recalculo_corrige(app, novo):
+    ana = novo.cliente('Ana')
+    novo.divida(ana, 40.0)
+    db.session.execute(db.update(Cliente).where(Cliente.id == ana.id).values(saldo_aberto=0.0))
+
+    assert saldos.divergentes() == [ana.id]
+    saldos.recalcular()
+    assert saldos.divergentes() == []
+
+
+def test_limite_de_credito_na_nova_divida(http, novo):
+    cliente = novo.cliente('Ana', limite_credito=100.0)
+    novo.divida(cliente, 80.0)
+
+    resposta = http.post('/dividas/novo', data={'cliente_id': cliente.id, 'valor': '30'})
+    assert resposta.status_code == 302
+    assert f'/dividas/novo?cliente_id={cliente.id}' in resposta.headers['Location']
+    assert 'Limite de crédito excedido: disponível R$ 20.00' in http.get(resposta.headers['Location']).get_data(as_text=True)
+    assert Divida.query.count() == 1
+    assert _cliente(cliente.id).saldo_aberto == 80.0
+
+    assert http.post('/dividas/novo', data={'cliente_id': cliente.id, 'valor': '20'}).status_code == 302
+    assert Divida.query.count() == 2
+    assert _cliente(cliente.id).saldo_aberto == 100.0
+
+
+def test_cliente_sem_limite(app, novo):
+    cliente = novo.cliente('Ana')
+    cliente.limite_credito = None
+    novo.divida(cliente, 5000.0)
+
+    assert saldos.excede_limite(cliente.id) is False
@@ -0,0 +1,69 @@
+"""
+Cópia somente leitura dos relatórios (web/snapshot.py): cópia online,
+leitura pela sessão da cópia e reserva da atualização entre workers
+"""
+
+from web import snapshot
+from web.models import db, Cliente
+from sqlalchemy import func, select, text
+from sqlalchemy.exc import OperationalError
+import pytest
+import threading
+
+
+@pytest.fixture
+def relatorios(criar_app, tmp_path):
+    app = criar_app(SNAPSHOT_RELATORIOS=True, SNAPSHOT_ARQUIVO=str(tmp_path / 'relatorios.db'))
+    with app.app_context():
+        yield app
+        db.session.remove()
+
+
+def _novo_cliente(nome):
+    db.session.add(Cliente(nome=nome))
+    db.session.commit()
+
+
+def _clientes(sessao):
+    return sessao.execute(select(func.count(Cliente.id))).scalar()
+
+
+def test_relatorios_leem_a_copia(relatorios):
+    _novo_cliente('Ana')
+    assert snapshot.info() is None
+    with snapshot.sessao() as sessao:
+        assert sessao is db.session  # Sem cópia, o banco principal
+
+    snapshot.atualizar()
+    _novo_cliente('Bia')
+
+    assert snapshot.info()['minutos'] == 0
+    with snapshot.sessao() as sessao:
+        assert _clientes(sessao) == 1
+        with pytest.raises(OperationalError, match='readonly'):
+            sessao.execute(text("DELETE FROM cliente"))
+
+    snapshot.atualizar()
+    with snapshot.sessao() as sessao:  # Cada sessão abre o arquivo atual
+        assert _clientes(sessao) == 2
+
+
+def test_so_um_worker_reserva_a_atualizacao(relatorios):
+    assert snapshot.reservar(300) is True
+    assert snapshot.reservar(300) is False
+
+
+def test_atualizacao_automatica(relatorios):
+    relatorios.test_client().get('/')
+    for tarefa in threading.enumerate():
+        if tarefa.name == 'sgm-snapshot':
+            tarefa.join(10)
+
+    assert snapshot.gerado_em() is not None
+
+
+def test_desativado(app):
+    assert snapshot.ativo() is False
+    assert snapshot.versao() is None
+    with snapshot.sessao() as sessao:
+        assert sessao is db.session
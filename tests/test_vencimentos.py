@@ -0,0 +1,69 @@
+"""
+Tarefa diária de vencimentos (web/vencimentos.py): status em lote, saldo
+vencido dos clientes e execução automática
+"""
+
+from web import vencimentos, saldos, resumo
+from web.models import db, Cliente, Divida, Parcela
+from datetime import timedelta
+import threading
+
+
+def test_marca_dividas_e_parcelas_vencidas(app, novo):
+    cliente = novo.cliente()
+    vencida = novo.divida(cliente, 10.0, vencimento=-2)
+    hoje = novo.divida(cliente, 10.0, vencimento=0)
+    futura = novo.divida(cliente, 10.0, vencimento=5)
+    renegociada = novo.divida(cliente, 10.0, vencimento=-2)
+    renegociada.status = 'Renegociada'
+    parcelada = novo.divida(cliente, 30.0, parcelas=3)
+    primeira = Parcela.query.filter_by(divida_id=parcelada.id, numero_parcela=1).one()
+    primeira.data_vencimento = novo.hoje - timedelta(days=1)
+    db.session.commit()
+
+    assert vencimentos.atualizar() == (1, 1)
+
+    db.session.expire_all()
+    status = {d.id: d.status for d in Divida.query}
+    assert status[vencida.id] == 'Vencida'
+    assert status[hoje.id] == status[futura.id] == status[parcelada.id] == 'Pendente'
+    assert status[renegociada.id] == 'Renegociada'
+    assert [p.status for p in Parcela.query.order_by(Parcela.numero_parcela)] == ['Vencida', 'Pendente', 'Pendente']
+
+    execucao = vencimentos.ultima_execucao()
+    assert (execucao.data_referencia, execucao.registros) == (novo.hoje, 2)
+    assert vencimentos.atualizar() == (0, 0)
+
+
+def test_recalcula_o_saldo_vencido_desde_a_ultima_execucao(app, novo):
+    cliente = novo.cliente()
+    novo.divida(cliente, 40.0, vencimento=-1)
+    vencimentos.atualizar(novo.hoje - timedelta(days=3))
+    assert db.session.get(Cliente, cliente.id).saldo_vencido == 0.0  # Ainda não vencia
+
+    vencimentos.atualizar(novo.hoje)
+
+    db.session.expire_all()
+    assert db.session.get(Cliente, cliente.id).saldo_vencido == 40.0
+    assert saldos.divergentes() == []
+    assert resumo.reconstruir() == []
+
+
+def test_comando_da_cli(app, novo):
+    novo.divida(novo.cliente(), 10.0, vencimento=-1)
+
+    saida = app.test_cli_runner().invoke(args=['vencimentos-atualizar']).output
+
+    assert '1 dívida(s) e 0 parcela(s)' in saida
+
+
+def test_execucao_automatica_na_primeira_requisicao(criar_app):
+    app = criar_app(VENCIMENTOS_AUTOMATICO=True)
+
+    app.test_client().get('/')
+    for tarefa in threading.enumerate():
+        if tarefa.name == 'sgm-vencimentos':
+            tarefa.join(10)
+
+    with app.app_context():
+        assert vencimentos.ultima_execucao() is not None
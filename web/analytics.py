@@ -0,0 +1,235 @@
+"""
+Análises do SGM - consultas agregadas para dashboards e relatórios
+
+As funções de cálculo usam o banco diretamente (SUM/COUNT com CASE e
+GROUP BY), sem carregar dívidas ou pagamentos em memória. Os dashboards
+leem os totais já mantidos em web.resumo e só consultam as tabelas para
+listas e séries. Retornam dicionários com as variáveis dos templates.
+"""
+
+from web.models import db, Cliente, Divida, Pagamento, PagamentoArquivo, MovimentoDiario
+from web import resumo
+from datetime import date
+from sqlalchemy import case, func, select, union_all
+import calendar
+
+
+def _em_aberto():
+    """Filtro: dívidas ainda não quitadas"""
+    return Divida.status != 'Paga'
+
+
+def _vencida(hoje, incluir_hoje=False):
+    """
+    Filtro: dívidas vencidas antes de `hoje` (ou até `hoje`, com `incluir_hoje`)
+
+    Lê o status 'Vencida' marcado pela tarefa diária (web/vencimentos.py).
+    As renegociadas mantêm o status e são avaliadas pela data, assim como
+    as pendentes que a tarefa ainda não marcou (antes da execução do dia ou
+    vencendo hoje): cada parte é uma faixa do índice (status, data_vencimento).
+    """
+    vencimento = Divida.data_vencimento <= hoje if incluir_hoje else Divida.data_vencimento < hoje
+    return (Divida.status == 'Vencida') | (Divida.status.in_(('Pendente', 'Renegociada')) & vencimento)
+
+
+def kpis_recebiveis(hoje=None):
+    """
+    KPIs globais de recebíveis em uma única consulta
+
+    Returns:
+        dict com total_a_receber, total_vencido (inclui hoje),
+        total_vencido_anterior (antes de hoje), qtd_pagas,
+        qtd_vencidas e qtd_abertas
+    """
+    hoje = hoje or date.today()
+    aberta = _em_aberto()
+    vencida = _vencida(hoje)
+
+    row = db.session.query(
+        func.coalesce(func.sum(case((aberta, Divida.saldo_devedor), else_=0.0)), 0.0),
+        func.coalesce(func.sum(case(
+            (_vencida(hoje, incluir_hoje=True), Divida.saldo_devedor), else_=0.0
+        )), 0.0),
+        func.coalesce(func.sum(case((vencida, Divida.saldo_devedor), else_=0.0)), 0.0),
+        func.coalesce(func.sum(case((Divida.status == 'Paga', 1), else_=0)), 0),
+        func.coalesce(func.sum(case((vencida, 1), else_=0)), 0),
+        func.coalesce(func.sum(case((aberta & ~vencida, 1), else_=0)), 0),
+    ).one()
+
+    return {
+        'total_a_receber': float(row[0]),
+        'total_vencido': float(row[1]),
+        'total_vencido_anterior': float(row[2]),
+        'qtd_pagas': int(row[3]),
+        'qtd_vencidas': int(row[4]),
+        'qtd_abertas': int(row[5]),
+    }
+
+
+def ranking_devedores(limite=5, sessao=None):
+    """
+    Top devedores: saldo em aberto por cliente (lista de (nome, valor))
+
+    Lê o saldo mantido em cliente.saldo_aberto (web/saldos.py) pelo
+    índice, sem somar as dívidas.
+    """
+    rows = (sessao or db.session).query(Cliente.nome, Cliente.saldo_aberto)\
+        .filter(Cliente.saldo_aberto > 0)\
+        .order_by(Cliente.saldo_aberto.desc(), Cliente.id)\
+        .limit(limite).all()
+    return [(nome, float(valor)) for nome, valor in rows]
+
+
+def contagem_por_status(hoje=None):
+    """
+    Contagem de dívidas por situação para o gráfico de status
+
+    A ordem de prioridade é a mesma do dashboard: paga > vencida
+    (inclui hoje) > renegociada > em dia.
+
+    Returns:
+        lista [pagas, em_dia, renegociadas, vencidas]
+    """
+    hoje = hoje or date.today()
+    situacao = case(
+        ((Divida.status == 'Paga') | (Divida.saldo_devedor <= 0), 'pagas'),
+        (_vencida(hoje, incluir_hoje=True), 'vencidas'),
+        (Divida.status == 'Renegociada', 'renegociadas'),
+        else_='em_dia'
+    )
+    rows = db.session.query(situacao, func.count(Divida.id)).group_by(situacao).all()
+    contagem = dict(rows)
+    return [
+        contagem.get('pagas', 0),
+        contagem.get('em_dia', 0),
+        contagem.get('renegociadas', 0),
+        contagem.get('vencidas', 0),
+    ]
+
+
+def pagamentos_por_meio():
+    """
+    Quantidade de pagamentos por meio (labels, valores), na ordem de primeiro uso
+
+    Inclui os pagamentos de dívidas arquivadas.
+    """
+    todos = union_all(
+        select(Pagamento.id, Pagamento.meio_pagamento),
+        select(PagamentoArquivo.id, PagamentoArquivo.meio_pagamento),
+    ).subquery()
+    meio = func.coalesce(func.nullif(todos.c.meio_pagamento, ''), 'Outro')
+    rows = db.session.query(meio, func.count())\
+        .select_from(todos)\
+        .group_by(meio)\
+        .order_by(func.min(todos.c.id)).all()
+    return [m for m, _ in rows], [ct for _, ct in rows]
+
+
+def _meses_anteriores(hoje, quantidade):
+    """Lista de (ano, mes) dos últimos `quantidade` meses, do mais antigo ao atual"""
+    meses = []
+    for i in range(quantidade - 1, -1, -1):
+        ano = hoje.year
+        mes = hoje.month - i
+        # Ajusta ano se mês for negativo
+        while mes <= 0:
+            ano -= 1
+            mes += 12
+        meses.append((ano, mes))
+    return meses
+
+
+def dividas_por_mes(hoje=None, meses=6, sessao=None):
+    """
+    Valor das dívidas criadas por mês (últimos `meses` meses)
+
+    Lê o movimento diário (vendas), que inclui as dívidas já arquivadas.
+
+    Returns:
+        (labels, valores) no formato 'Mes/AA'
+    """
+    hoje = hoje or date.today()
+    periodo = _meses_anteriores(hoje, meses)
+    inicio = date(periodo[0][0], periodo[0][1], 1)
+
+    ano = db.extract('year', MovimentoDiario.dia)
+    mes = db.extract('month', MovimentoDiario.dia)
+    rows = (sessao or db.session).query(ano, mes, func.sum(MovimentoDiario.valor))\
+        .filter(MovimentoDiario.tipo == 'venda', MovimentoDiario.dia >= inicio)\
+        .group_by(ano, mes).all()
+    by_month = {(int(a), int(m)): float(v or 0) for a, m, v in rows}
+
+    labels = [f"{calendar.month_abbr[m]}/{str(a)[-2:]}" for a, m in periodo]
+    valores = [round(by_month.get((a, m), 0.0), 2) for a, m in periodo]
+    return labels, valores
+
+
+def dividas_vencidas(hoje=None, sessao=None):
+    """Lista de dívidas vencidas (inclui hoje), mais antigas primeiro"""
+    hoje = hoje or date.today()
+    rows = (sessao or db.session).query(
+        Divida.id, Cliente.nome, Divida.descricao, Divida.saldo_devedor, Divida.data_vencimento
+    ).join(Cliente, Cliente.id == Divida.cliente_id)\
+        .filter(_vencida(hoje, incluir_hoje=True), Divida.saldo_devedor > 0)\
+        .order_by(Divida.data_vencimento, Divida.id).all()
+    return [
+        {
+            'id': id_,
+            'cliente_nome': nome,
+            'descricao': descricao or 'Sem descrição',
+            'saldo': saldo,
+            'vencimento': vencimento
+        }
+        for id_, nome, descricao, saldo, vencimento in rows
+    ]
+
+
+def dashboard_admin(hoje=None, sessao=None):
+    """
+    Monta todas as variáveis do dashboard do administrador (home.html)
+
+    KPIs, contagens por status e por meio de pagamento vêm do resumo
+    pré-calculado; ranking, série mensal e vencidas são consultados
+    em `sessao` (a cópia dos relatórios, ver web/snapshot.py).
+
+    Returns:
+        dict pronto para ser passado ao render_template
+    """
+    hoje = hoje or date.today()
+    r = resumo.obter(hoje)
+    ranking = ranking_devedores(5, sessao)
+    meio_labels, meio_values = resumo.meios_pagamento()
+    month_labels, month_values = dividas_por_mes(hoje, sessao=sessao)
+
+    return dict(
+        total_a_receber=r.total_a_receber,
+        total_vencido=r.total_vencido,
+        qtd_pagas=r.qtd_pagas,
+        qtd_vencidas=r.qtd_vencidas,
+        qtd_abertas=r.qtd_abertas,
+        ranking=ranking,
+        dividas_vencidas=dividas_vencidas(hoje, sessao),
+        top_labels=[n for n, _ in ranking],
+        top_values=[v for _, v in ranking],
+        status_labels=['Pagas', 'Em dia', 'Renegociadas', 'Vencidas'],
+        status_values=[r.pagas_ct, r.em_dia_ct, r.renegociadas_ct, r.vencidas_ct],
+        meio_labels=meio_labels,
+        meio_values=meio_values,
+        month_labels=month_labels,
+        month_values=month_values,
+    )
+
+
+def relatorio_resumo(hoje=None, sessao=None):
+    """
+    Variáveis do relatório consolidado (relatorios_dashboard.html)
+
+    Aqui o total vencido considera apenas vencimentos anteriores a hoje.
+    """
+    r = resumo.obter(hoje)
+    return {
+        'total_a_receber': r.total_a_receber,
+        'total_vencido': r.total_vencido_anterior,
+        'qtd_pagas': r.qtd_pagas,
+        'ranking': ranking_devedores(5, sessao),
+    }
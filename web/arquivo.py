@@ -0,0 +1,153 @@
+"""
+Arquivo de dívidas quitadas antigas
+
+Dívidas 'Paga' quitadas há mais de ARQUIVO_MESES meses (data do último
+pagamento; sem pagamentos, a data da venda) são movidas, com pagamentos,
+renegociações e parcelas, para as tabelas *_arquivo do mesmo banco. Assim
+as tabelas principais crescem com o crédito em aberto, não com todo o
+histórico da mercearia.
+
+A movimentação é feita em lotes de LOTE dívidas, cada um com um commit:
+INSERT ... SELECT em cada tabela de arquivo e DELETE nas principais. As
+linhas mantêm os ids: as tabelas principais são AUTOINCREMENT (migração
+v12), então um id arquivado nunca volta a ser usado.
+
+O histórico continua disponível:
+- no extrato e nas exportações, com `arquivadas=1` (web/exportacao.py)
+- nos dashboards: dívidas arquivadas seguem contando como pagas e seus
+  pagamentos entram na contagem por meio (o resumo não muda)
+
+Roda pela CLI: flask --app app arquivar [--meses N]
+"""
+
+from flask import current_app
+from web.models import (
+    db, Divida, Pagamento, Renegociacao, Parcela, TarefaExecucao,
+    DividaArquivo, PagamentoArquivo, RenegociacaoArquivo, ParcelaArquivo,
+)
+from web import resumo, cache, versoes, movimento
+from datetime import date, datetime
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import delete, func, insert, select
+
+TAREFA = 'arquivo'
+LOTE = 1000
+MESES_MINIMO = 6  # O gráfico mensal dos dashboards cobre os últimos 6 meses
+
+# (tabela principal, tabela de arquivo) dos filhos de uma dívida
+FILHOS = (
+    (Pagamento, PagamentoArquivo),
+    (Renegociacao, RenegociacaoArquivo),
+    (Parcela, ParcelaArquivo),
+)
+
+
+def data_quitacao():
+    """Expressão SQL: data do último pagamento da dívida (ou da venda, se não houver)"""
+    ultimo = select(func.max(Pagamento.data_pagamento))\
+        .where(Pagamento.divida_id == Divida.id).scalar_subquery()
+    return func.coalesce(ultimo, Divida.data_venda)
+
+
+def candidatas(corte, apos=0, limite=LOTE):
+    """Ids das próximas dívidas pagas e quitadas antes de `corte` (em ordem de id)"""
+    return db.session.execute(
+        select(Divida.id)
+        .where(Divida.status == 'Paga', Divida.id > apos, data_quitacao() < corte)
+        .order_by(Divida.id).limit(limite)
+    ).scalars().all()
+
+
+def _copiar(origem, destino, filtro):
+    """INSERT INTO destino SELECT <colunas de origem> FROM origem WHERE filtro"""
+    colunas = [c.name for c in origem.__table__.columns]
+    db.session.execute(
+        insert(destino).from_select(colunas, select(*[getattr(origem, c) for c in colunas]).where(filtro))
+    )
+
+
+def _mover(ids):
+    """Move as dívidas e os filhos para o arquivo (sem commit)"""
+    _copiar(Divida, DividaArquivo, Divida.id.in_(ids))
+    for modelo, arquivo in FILHOS:
+        _copiar(modelo, arquivo, modelo.divida_id.in_(ids))
+        db.session.execute(
+            delete(modelo).where(modelo.divida_id.in_(ids)).execution_options(synchronize_session=False)
+        )
+    db.session.execute(delete(Divida).where(Divida.id.in_(ids)).execution_options(synchronize_session=False))
+
+
+def arquivar(meses=None, hoje=None):
+    """
+    Move para o arquivo as dívidas quitadas há mais de `meses` meses
+
+    Args:
+        meses: padrão ARQUIVO_MESES da configuração (mínimo MESES_MINIMO)
+
+    Returns:
+        quantidade de dívidas arquivadas
+    """
+    hoje = hoje or date.today()
+    meses = current_app.config.get('ARQUIVO_MESES', 12) if meses is None else meses
+    if meses < MESES_MINIMO:
+        raise ValueError(f'O arquivo guarda apenas dívidas quitadas há pelo menos {MESES_MINIMO} meses.')
+    corte = hoje - relativedelta(months=meses)
+
+    total = 0
+    apos = 0
+    while True:
+        ids = candidatas(corte, apos)
+        if not ids:
+            break
+        _mover(ids)
+        # Dívidas saem dos perfis de muitos clientes: todas as ETags mudam
+        versoes.marcar(versoes.TODOS)
+        db.session.commit()
+        total += len(ids)
+        apos = ids[-1]
+
+    execucao = db.session.get(TarefaExecucao, TAREFA)
+    if execucao is None:
+        execucao = TarefaExecucao(nome=TAREFA)
+        db.session.add(execucao)
+    execucao.ultima_execucao = datetime.now()
+    execucao.data_referencia = corte
+    execucao.registros = total
+    db.session.commit()
+
+    if total:
+        # Listas e APIs de clientes em cache ainda mostram as dívidas movidas
+        cache.limpar()
+    return total
+
+
+def quantidade():
+    """Total de dívidas no arquivo"""
+    return db.session.query(func.count(DividaArquivo.id)).scalar()
+
+
+def apagar_do_cliente(cliente_id):
+    """
+    Apaga o histórico arquivado de um cliente (usado ao apagar o cliente)
+
+    Tira do resumo as dívidas pagas e os pagamentos por meio que elas
+    ainda somavam, e do movimento diário as vendas, pagamentos e
+    renegociações arquivados.
+    """
+    qtd = db.session.query(func.count(DividaArquivo.id))\
+        .filter(DividaArquivo.cliente_id == cliente_id).scalar()
+    if not qtd:
+        return 0
+
+    ids = select(DividaArquivo.id).where(DividaArquivo.cliente_id == cliente_id).scalar_subquery()
+    meio = func.coalesce(func.nullif(PagamentoArquivo.meio_pagamento, ''), 'Outro')
+    rows = db.session.query(meio, func.count(PagamentoArquivo.id))\
+        .filter(PagamentoArquivo.divida_id.in_(ids)).group_by(meio).all()
+    resumo.meios_alterados({m: -ct for m, ct in rows})
+    resumo.dividas_alteradas([(('Paga', 0.0, None), None)] * qtd)
+    movimento.removidos(movimento.ARQUIVADAS, ids)
+
+    for _, arquivo in FILHOS:
+        db.session.execute(delete(arquivo).where(arquivo.divida_id.in_(ids)))
+    db.session.execute(delete(DividaArquivo).where(DividaArquivo.cliente_id == cliente_id))
+    return qtd
@@ -0,0 +1,143 @@
+"""
+Busca de clientes do SGM
+
+Usa um índice de texto completo do SQLite (FTS5, tabela `cliente_busca`)
+sincronizado com a tabela `cliente` por triggers, criados na migração v2.
+O tokenizador remove acentos e o índice guarda prefixos, então "goncal"
+encontra "Paulo Gonçalves" sem varrer a tabela.
+
+Se o SQLite não tiver FTS5, a busca volta para LIKE no nome.
+"""
+
+from web.models import db, Cliente
+from sqlalchemy import inspect, text
+import re
+
+TABELA_BUSCA = 'cliente_busca'
+LIMITE_PADRAO = 50
+LIMITE_MAXIMO = 200
+
+_PALAVRA = re.compile(r'\w+', re.UNICODE)
+
+# Cache por engine: a existência da tabela só muda com migrações
+_indice_por_engine = {}
+
+
+def criar_indice(conn):
+    """
+    Cria a tabela FTS5 de busca, os triggers de sincronização e a popula
+
+    Returns:
+        False se o SQLite não suportar FTS5 (a busca usará LIKE)
+    """
+    try:
+        conn.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABELA_BUSCA} USING fts5("
+            "nome, cpf, content='cliente', content_rowid='id', "
+            "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        ))
+    except Exception:
+        return False
+
+    conn.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS {TABELA_BUSCA}_ai AFTER INSERT ON cliente BEGIN
+            INSERT INTO {TABELA_BUSCA}(rowid, nome, cpf) VALUES (new.id, new.nome, new.cpf);
+        END
+    """))
+    conn.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS {TABELA_BUSCA}_ad AFTER DELETE ON cliente BEGIN
+            INSERT INTO {TABELA_BUSCA}({TABELA_BUSCA}, rowid, nome, cpf)
+            VALUES ('delete', old.id, old.nome, old.cpf);
+        END
+    """))
+    _criar_trigger_atualizacao(conn)
+    reconstruir_indice(conn)
+    return True
+
+
+def _criar_trigger_atualizacao(conn):
+    # Só quando nome/cpf mudam: os saldos do cliente (web/saldos.py) são
+    # atualizados a cada dívida e não entram no índice
+    conn.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS {TABELA_BUSCA}_au AFTER UPDATE OF nome, cpf ON cliente BEGIN
+            INSERT INTO {TABELA_BUSCA}({TABELA_BUSCA}, rowid, nome, cpf)
+            VALUES ('delete', old.id, old.nome, old.cpf);
+            INSERT INTO {TABELA_BUSCA}(rowid, nome, cpf) VALUES (new.id, new.nome, new.cpf);
+        END
+    """))
+
+
+def restringir_trigger_atualizacao(conn):
+    """Recria o trigger de atualização (bancos da v2) para disparar só com nome/cpf"""
+    if not inspect(conn).has_table(TABELA_BUSCA):
+        return
+    conn.execute(text(f'DROP TRIGGER IF EXISTS {TABELA_BUSCA}_au'))
+    _criar_trigger_atualizacao(conn)
+
+
+def reconstruir_indice(conn):
+    """Repopula o índice a partir da tabela cliente"""
+    conn.execute(text(f"INSERT INTO {TABELA_BUSCA}({TABELA_BUSCA}) VALUES ('rebuild')"))
+
+
+def indice_disponivel():
+    """Indica se a tabela FTS de busca existe neste banco"""
+    engine = db.engine
+    if engine not in _indice_por_engine:
+        _indice_por_engine[engine] = inspect(engine).has_table(TABELA_BUSCA)
+    return _indice_por_engine[engine]
+
+
+def _consulta_fts(q):
+    """
+    Converte o texto digitado em uma consulta FTS5 de prefixos
+
+    Cada palavra vira um termo de prefixo ("pau"* "gon"*) e todas precisam
+    aparecer. Retorna None se não houver palavras.
+    """
+    palavras = _PALAVRA.findall(q)
+    if not palavras:
+        return None
+    return ' '.join(f'"{p}"*' for p in palavras)
+
+
+def limitar(limit, offset):
+    """Normaliza limit/offset vindos da query string"""
+    limit = LIMITE_PADRAO if limit is None else max(1, min(limit, LIMITE_MAXIMO))
+    offset = max(0, offset or 0)
+    return limit, offset
+
+
+def buscar_clientes(q, limit=None, offset=0):
+    """
+    Busca clientes por nome (ou CPF), com prefixo e sem acento
+
+    Args:
+        q: texto digitado
+        limit, offset: paginação dos resultados
+
+    Returns:
+        lista de (id, nome) ordenada por relevância e depois por nome
+    """
+    limit, offset = limitar(limit, offset)
+
+    if indice_disponivel():
+        consulta = _consulta_fts(q)
+        if consulta is None:
+            return []
+        rows = db.session.execute(text(f"""
+            SELECT c.id, c.nome
+            FROM {TABELA_BUSCA} b
+            JOIN cliente c ON c.id = b.rowid
+            WHERE {TABELA_BUSCA} MATCH :consulta
+            ORDER BY b.rank, c.nome
+            LIMIT :limit OFFSET :offset
+        """), {'consulta': consulta, 'limit': limit, 'offset': offset}).all()
+        return [(id_, nome) for id_, nome in rows]
+
+    # Sem FTS5: busca por nome parcial, ao menos com limite
+    rows = db.session.query(Cliente.id, Cliente.nome)\
+        .filter(Cliente.nome.ilike(f'%{q}%'))\
+        .order_by(Cliente.nome)\
+        .limit(limit).offset(offset).all()
+    return [(id_, nome) for id_, nome in rows]
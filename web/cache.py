@@ -0,0 +1,218 @@
+"""
+Cache em processo do SGM para relatórios e APIs de leitura
+
+Guarda o resultado já calculado (variáveis do template ou dados do JSON),
+não o HTML: a página ainda é renderizada a cada acesso, com o nome do
+usuário e as mensagens da sessão.
+
+- Chave: (rota, argumentos); cada entrada tem etiquetas (tags) como
+  'dashboard', 'clientes' ou 'cliente:<id>'
+- Expiração por tempo (CACHE_TTL) e descarte LRU quando o total estimado
+  passa de CACHE_MEMORIA_MAX bytes
+- Escritas marcam etiquetas para invalidar; a invalidação só acontece
+  depois do commit, para que nenhuma leitura concorrente guarde dados
+  anteriores à escrita
+- As mesmas etiquetas ganham nova versão no banco (web/versoes.py), usada
+  nas ETags das APIs e nas chaves do cache das respostas condicionais
+
+Cada processo tem seu próprio cache: com vários workers, o TTL limita
+por quanto tempo um worker pode mostrar dados que outro já alterou.
+"""
+
+from flask import current_app
+from web.models import db
+from web import versoes
+from sqlalchemy import event
+from collections import OrderedDict, defaultdict
+from datetime import date, datetime
+import sys
+import threading
+import time
+
+TTL_PADRAO = 60  # segundos
+MEMORIA_PADRAO = 32 * 1024 * 1024  # 32 MB
+
+
+def _estimar_tamanho(valor):
+    """Estimativa simples do tamanho em memória de um resultado"""
+    if isinstance(valor, dict):
+        return sys.getsizeof(valor) + sum(
+            _estimar_tamanho(k) + _estimar_tamanho(v) for k, v in valor.items()
+        )
+    if isinstance(valor, (list, tuple)):
+        return sys.getsizeof(valor) + sum(_estimar_tamanho(v) for v in valor)
+    return sys.getsizeof(valor)
+
+
+class CacheRespostas:
+    """Cache LRU com TTL, limite de memória e invalidação por etiqueta"""
+
+    def __init__(self, ttl=TTL_PADRAO, memoria_max=MEMORIA_PADRAO):
+        self.ttl = ttl
+        self.memoria_max = memoria_max
+        self._entradas = OrderedDict()  # chave -> (expira_em, tamanho, valor, tags)
+        self._por_tag = defaultdict(set)  # tag -> chaves
+        self._memoria = 0
+        self._lock = threading.Lock()
+        self.acertos = defaultdict(int)  # por rota
+        self.falhas = defaultdict(int)  # por rota
+        self.descartes = 0
+        self.invalidacoes = 0
+
+    def _remover(self, chave):
+        """Remove uma entrada (chamar com o lock)"""
+        _, tamanho, _, tags = self._entradas.pop(chave)
+        self._memoria -= tamanho
+        for tag in tags:
+            chaves = self._por_tag.get(tag)
+            if chaves is not None:
+                chaves.discard(chave)
+                if not chaves:
+                    del self._por_tag[tag]
+
+    def obter(self, chave):
+        """Retorna (True, valor) se houver entrada válida, senão (False, None)"""
+        rota = chave[0]
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is not None and entrada[0] > time.monotonic():
+                self._entradas.move_to_end(chave)
+                self.acertos[rota] += 1
+                return True, entrada[2]
+            if entrada is not None:
+                self._remover(chave)
+            self.falhas[rota] += 1
+            return False, None
+
+    def guardar(self, chave, valor, tags=()):
+        """Guarda um resultado, descartando os menos usados se passar do limite"""
+        tamanho = _estimar_tamanho(valor)
+        if tamanho > self.memoria_max:
+            return
+        with self._lock:
+            if chave in self._entradas:
+                self._remover(chave)
+            self._entradas[chave] = (time.monotonic() + self.ttl, tamanho, valor, tuple(tags))
+            self._memoria += tamanho
+            for tag in tags:
+                self._por_tag[tag].add(chave)
+            while self._memoria > self.memoria_max:
+                self._remover(next(iter(self._entradas)))
+                self.descartes += 1
+
+    def invalidar(self, *tags):
+        """Remove todas as entradas com alguma das etiquetas"""
+        with self._lock:
+            for tag in tags:
+                for chave in list(self._por_tag.get(tag, ())):
+                    self._remover(chave)
+                    self.invalidacoes += 1
+
+    def limpar(self):
+        """Esvazia o cache"""
+        with self._lock:
+            self._entradas.clear()
+            self._por_tag.clear()
+            self._memoria = 0
+
+    def estatisticas(self):
+        """Contadores de acertos/falhas por rota e uso de memória"""
+        with self._lock:
+            rotas = sorted(set(self.acertos) | set(self.falhas))
+            return {
+                'entradas': len(self._entradas),
+                'memoria_bytes': self._memoria,
+                'memoria_max_bytes': self.memoria_max,
+                'ttl_segundos': self.ttl,
+                'descartes': self.descartes,
+                'invalidacoes': self.invalidacoes,
+                'acertos': sum(self.acertos.values()),
+                'falhas': sum(self.falhas.values()),
+                'por_rota': {
+                    r: {'acertos': self.acertos[r], 'falhas': self.falhas[r]} for r in rotas
+                },
+            }
+
+
+def init_app(app):
+    """Cria o cache da aplicação a partir da configuração"""
+    app.extensions['cache_respostas'] = CacheRespostas(
+        ttl=app.config.get('CACHE_TTL', TTL_PADRAO),
+        memoria_max=app.config.get('CACHE_MEMORIA_MAX', MEMORIA_PADRAO),
+    )
+
+
+def _cache():
+    """Cache da aplicação atual (None se desativado)"""
+    if not current_app.config.get('CACHE_ATIVO', True):
+        return None
+    return current_app.extensions.get('cache_respostas')
+
+
+def _normalizar(valor):
+    """Torna argumentos da chave comparáveis e imutáveis"""
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    return valor
+
+
+def obter_ou_calcular(rota, argumentos, tags, calcular):
+    """
+    Retorna o resultado em cache ou calcula e guarda
+
+    Args:
+        rota: nome da rota (primeira parte da chave e nome nos contadores)
+        argumentos: valores que distinguem o resultado (tupla)
+        tags: etiquetas usadas para invalidar
+        calcular: função sem argumentos que produz o resultado
+    """
+    cache = _cache()
+    if cache is None:
+        return calcular()
+
+    chave = (rota,) + tuple(_normalizar(a) for a in argumentos)
+    encontrado, valor = cache.obter(chave)
+    if encontrado:
+        return valor
+    valor = calcular()
+    cache.guardar(chave, valor, tags)
+    return valor
+
+
+def invalidar(*tags):
+    """
+    Marca etiquetas para invalidar quando a transação atual fizer commit
+
+    Se a transação for desfeita, nada é invalidado. As etiquetas também
+    ganham nova versão (versoes.marcar), na mesma transação.
+    """
+    pendentes = db.session.info.setdefault('cache_invalidar', set())
+    pendentes.update(tags)
+    versoes.marcar(*tags)
+
+
+def limpar():
+    """Esvazia o cache da aplicação atual (mudanças que afetam muitas etiquetas)"""
+    cache = current_app.extensions.get('cache_respostas')
+    if cache is not None:
+        cache.limpar()
+
+
+def estatisticas():
+    """Contadores do cache da aplicação atual"""
+    cache = current_app.extensions.get('cache_respostas')
+    return cache.estatisticas() if cache else {}
+
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidar_apos_commit(session):
+    tags = session.info.pop('cache_invalidar', None)
+    if tags:
+        cache = current_app.extensions.get('cache_respostas')
+        if cache is not None:
+            cache.invalidar(*tags)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _descartar_invalidacoes(session):
+    session.info.pop('cache_invalidar', None)
@@ -0,0 +1,370 @@
+"""
+Carteira de recebíveis: aging por atraso e previsão semanal de recebimentos
+
+Agenda: o saldo em aberto de cada dívida repartido pelos vencimentos
+- dívida à vista (ou renegociada): o saldo inteiro no vencimento da dívida
+- dívida parcelada: o restante de cada parcela aberta no vencimento dela.
+  O saldo da dívida manda: pagamentos lançados sem parcela abatem as
+  parcelas mais antigas primeiro, e juros de renegociação ou outra
+  diferença a mais ficam no vencimento da dívida
+
+O total de cada dívida na agenda é o seu saldo_devedor, então o aging
+bate com o saldo aberto dos clientes (web/saldos.py).
+
+Tabelas mantidas por triggers (migração v9, refeitos na v11), na mesma
+transação de qualquer escrita em divida ou parcela:
+- agenda_divida: a agenda de cada dívida aberta (índice por cliente).
+  Dívidas sem parcelas têm uma linha só, atualizada direto de OLD/NEW;
+  só a agenda de uma dívida parcelada é refeita a partir das parcelas
+  dela, e só quando a escrita pode mudá-la
+- saldo_vencimento: soma de agenda_divida por data de vencimento, com o
+  delta de cada linha que entra, sai ou muda de valor
+
+Faixas de atraso (dias desde o vencimento, em relação a `hoje`), por CASE:
+a vencer, 0–30 (inclui hoje), 31–60, 61–90 e mais de 90.
+
+As consultas das funções consulta_* também servem para a exportação
+CSV/JSON em streaming (web/exportacao.py).
+"""
+
+from web.models import db, Cliente, Divida, Parcela, AgendaDivida, SaldoVencimento
+from web.movimento import AGRUPAMENTOS
+from datetime import date, timedelta
+from sqlalchemy import and_, case, delete, func, literal_column, select, text, union_all
+
+# (nome, menor atraso, maior atraso) em dias; None = sem limite
+FAIXAS = (
+    ('a_vencer', None, -1),
+    ('dias_0_30', 0, 30),
+    ('dias_31_60', 31, 60),
+    ('dias_61_90', 61, 90),
+    ('dias_90_mais', 91, None),
+)
+SEMANAS_PADRAO = 12
+
+
+# ==================== AGENDA ====================
+
+def _agenda(*filtro):
+    """
+    SELECT divida_id, cliente_id, vencimento, valor da agenda das dívidas
+    abertas que atendem ao filtro
+    """
+    filtro = [Divida.status != 'Paga', *filtro]
+    por_parcelas = and_(Divida.parcelado.is_(True), Divida.status != 'Renegociada')
+    restante = Parcela.valor_parcela - func.coalesce(Parcela.valor_pago, 0.0)
+
+    # Parcelas abertas, com o restante das parcelas que vencem depois de cada uma
+    parcelas = select(
+        Parcela.divida_id, Divida.cliente_id, Parcela.data_vencimento, Divida.saldo_devedor,
+        restante.label('restante'),
+        func.coalesce(func.sum(restante).over(
+            partition_by=Parcela.divida_id,
+            order_by=(Parcela.data_vencimento.desc(), Parcela.numero_parcela.desc()),
+            rows=(None, -1),
+        ), 0.0).label('depois'),
+    ).join(Divida, Divida.id == Parcela.divida_id)\
+        .where(*filtro, por_parcelas, Parcela.status != 'Paga')\
+        .subquery()
+    # As parcelas que vencem depois ficam com o saldo primeiro; as antigas, com o que sobrar
+    na_parcela = func.max(0.0, func.min(parcelas.c.restante, parcelas.c.saldo_devedor - parcelas.c.depois))
+
+    soma_parcelas = select(func.coalesce(func.sum(restante), 0.0))\
+        .where(Parcela.divida_id == Divida.id, Parcela.status != 'Paga')\
+        .scalar_subquery()
+    na_divida = case(
+        (por_parcelas, func.max(0.0, Divida.saldo_devedor - soma_parcelas)),
+        else_=Divida.saldo_devedor,
+    )
+
+    itens = union_all(
+        select(Divida.id.label('divida_id'), Divida.cliente_id, Divida.data_vencimento.label('vencimento'),
+               na_divida.label('valor')).where(*filtro),
+        select(parcelas.c.divida_id, parcelas.c.cliente_id, parcelas.c.data_vencimento, na_parcela),
+    ).subquery()
+    return select(itens.c.divida_id, itens.c.cliente_id, itens.c.vencimento, func.sum(itens.c.valor))\
+        .group_by(itens.c.divida_id, itens.c.vencimento)\
+        .having(func.sum(itens.c.valor) > 0.005)
+
+
+def _refazer(conn, divida_id):
+    """Comandos (para um trigger) que refazem a agenda da dívida `divida_id` (expressão SQL)"""
+    consulta = _agenda(Divida.id == literal_column(divida_id))
+    sql = consulta.compile(dialect=conn.dialect, compile_kwargs={'literal_binds': True})
+    return f"""
+        DELETE FROM agenda_divida WHERE divida_id = {divida_id};
+        INSERT INTO agenda_divida (divida_id, cliente_id, vencimento, valor) {sql};
+    """
+
+
+def _por_parcelas(linha):
+    """Condição (para um trigger): a agenda da dívida `linha` vem das parcelas"""
+    return f"({linha}.parcelado IS 1 AND {linha}.status != 'Renegociada')"
+
+
+def _linha_simples(linha):
+    """Condição (para um trigger): a dívida `linha` sem parcelas ocupa uma linha na agenda"""
+    return f"({linha}.status != 'Paga' AND {linha}.saldo_devedor > 0.005)"
+
+
+def _parcelas_contam(divida_id):
+    """Condição (para um trigger): a agenda da dívida `divida_id` depende das parcelas"""
+    return (f"EXISTS (SELECT 1 FROM divida WHERE id = {divida_id} AND status != 'Paga' "
+            f"AND {_por_parcelas('divida')})")
+
+
+def criar_gatilhos(conn):
+    """Triggers que mantêm a agenda da dívida a cada escrita em divida ou parcela"""
+    # saldo_vencimento acompanha cada linha que entra ou sai da agenda
+    conn.execute(text("""
+        CREATE TRIGGER IF NOT EXISTS agenda_divida_ai AFTER INSERT ON agenda_divida BEGIN
+            INSERT INTO saldo_vencimento (vencimento, valor) VALUES (new.vencimento, new.valor)
+            ON CONFLICT (vencimento) DO UPDATE SET valor = valor + excluded.valor;
+        END
+    """))
+    conn.execute(text("""
+        CREATE TRIGGER IF NOT EXISTS agenda_divida_ad AFTER DELETE ON agenda_divida BEGIN
+            UPDATE saldo_vencimento SET valor = valor - old.valor WHERE vencimento = old.vencimento;
+        END
+    """))
+    conn.execute(text("""
+        CREATE TRIGGER IF NOT EXISTS agenda_divida_au AFTER UPDATE OF valor ON agenda_divida BEGIN
+            UPDATE saldo_vencimento SET valor = valor + new.valor - old.valor WHERE vencimento = new.vencimento;
+        END
+    """))
+
+    # Dívida sem parcelas: a própria linha entra na agenda
+    conn.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS divida_agenda_ai AFTER INSERT ON divida
+        WHEN {_linha_simples('new')} AND NOT {_por_parcelas('new')} BEGIN
+            INSERT INTO agenda_divida (divida_id, cliente_id, vencimento, valor)
+            VALUES (new.id, new.cliente_id, new.data_vencimento, new.saldo_devedor);
+        END
+    """))
+    conn.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS divida_agenda_ai_parcelas AFTER INSERT ON divida
+        WHEN new.status != 'Paga' AND {_por_parcelas('new')} BEGIN {_refazer(conn, 'new.id')} END
+    """))
+    # A marcação diária de vencidas (Pendente -> Vencida) não muda a agenda
+    mudou = """(old.cliente_id IS NOT new.cliente_id OR old.saldo_devedor IS NOT new.saldo_devedor
+          OR old.data_vencimento IS NOT new.data_vencimento OR old.parcelado IS NOT new.parcelado
+          OR (old.status = 'Paga') IS NOT (new.status = 'Paga')
+          OR (old.status = 'Renegociada') IS NOT (new.status = 'Renegociada'))"""
+    # Sem parcelas antes e depois: atualiza, retira ou insere a linha da dívida
+    conn.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS divida_agenda_au
+        AFTER UPDATE OF cliente_id, status, saldo_devedor, data_vencimento, parcelado ON divida
+        WHEN {mudou} AND NOT {_por_parcelas('old')} AND NOT {_por_parcelas('new')} BEGIN
+            DELETE FROM agenda_divida WHERE divida_id = old.id
+                AND (NOT {_linha_simples('new')} OR vencimento IS NOT new.data_vencimento
+                     OR cliente_id IS NOT new.cliente_id);
+            UPDATE agenda_divida SET valor = new.saldo_devedor
+                WHERE divida_id = new.id AND valor IS NOT new.saldo_devedor;
+            INSERT OR IGNORE INTO agenda_divida (divida_id, cliente_id, vencimento, valor)
+                SELECT new.id, new.cliente_id, new.data_vencimento, new.saldo_devedor
+                WHERE {_linha_simples('new')};
+        END
+    """))
+    conn.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS divida_agenda_au_parcelas
+        AFTER UPDATE OF cliente_id, status, saldo_devedor, data_vencimento, parcelado ON divida
+        WHEN {mudou} AND ({_por_parcelas('old')} OR {_por_parcelas('new')})
+        BEGIN {_refazer(conn, 'new.id')} END
+    """))
+    conn.execute(text("""
+        CREATE TRIGGER IF NOT EXISTS divida_agenda_ad AFTER DELETE ON divida BEGIN
+            DELETE FROM agenda_divida WHERE divida_id = old.id;
+        END
+    """))
+
+    # Parcelas só mudam a agenda de dívidas abertas parceladas (não renegociadas)
+    conn.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS parcela_agenda_ai AFTER INSERT ON parcela
+        WHEN {_parcelas_contam('new.divida_id')} BEGIN {_refazer(conn, 'new.divida_id')} END
+    """))
+    conn.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS parcela_agenda_au
+        AFTER UPDATE OF divida_id, valor_parcela, valor_pago, status, data_vencimento ON parcela
+        WHEN (old.divida_id IS NOT new.divida_id OR old.valor_parcela IS NOT new.valor_parcela
+          OR old.valor_pago IS NOT new.valor_pago OR old.data_vencimento IS NOT new.data_vencimento
+          OR (old.status = 'Paga') IS NOT (new.status = 'Paga'))
+          AND {_parcelas_contam('new.divida_id')}
+        BEGIN {_refazer(conn, 'new.divida_id')} END
+    """))
+    conn.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS parcela_agenda_au_divida AFTER UPDATE OF divida_id ON parcela
+        WHEN old.divida_id IS NOT new.divida_id AND {_parcelas_contam('old.divida_id')}
+        BEGIN {_refazer(conn, 'old.divida_id')} END
+    """))
+    conn.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS parcela_agenda_ad AFTER DELETE ON parcela
+        WHEN {_parcelas_contam('old.divida_id')} BEGIN {_refazer(conn, 'old.divida_id')} END
+    """))
+
+
+def reconstruir(conn=None, tolerancia=0.005):
+    """
+    Refaz a agenda de todas as dívidas e os saldos por vencimento (sem commit)
+
+    Returns:
+        ids das dívidas cuja agenda mantida diferia do recálculo
+    """
+    conn = conn or db.session
+    consulta = _agenda()
+    novos = {(d, v): valor for d, _, v, valor in conn.execute(consulta)}
+    t = AgendaDivida.__table__
+    mantidos = {(d, v): valor for d, v, valor in conn.execute(select(t.c.divida_id, t.c.vencimento, t.c.valor))}
+    divergentes = sorted({
+        chave[0] for chave in set(novos) | set(mantidos)
+        if abs(novos.get(chave, 0.0) - mantidos.get(chave, 0.0)) > tolerancia
+    })
+
+    # Sem linhas em saldo_vencimento, o trigger de exclusão não subtrai nada
+    conn.execute(delete(SaldoVencimento.__table__))
+    conn.execute(delete(t))
+    conn.execute(t.insert().from_select(['divida_id', 'cliente_id', 'vencimento', 'valor'], consulta))
+    return divergentes
+
+
+# ==================== AGING ====================
+
+def _condicao(vencimento, menor, maior, hoje):
+    """Vencimento com atraso entre `menor` e `maior` dias (comparando datas)"""
+    condicoes = []
+    if menor is not None:
+        condicoes.append(vencimento <= hoje - timedelta(days=menor))
+    if maior is not None:
+        condicoes.append(vencimento >= hoje - timedelta(days=maior))
+    return and_(*condicoes)
+
+
+def consulta_aging(f, hoje=None, clientes=None):
+    """
+    Aging por cliente: saldo em cada faixa de atraso e total, clientes com
+    mais saldo vencido primeiro
+
+    Filtro aceito: cliente_id. `clientes` (subconsulta de ids) restringe a
+    lista sem percorrer a agenda inteira.
+    """
+    hoje = hoje or date.today()
+    a = AgendaDivida
+    faixas = [
+        func.round(func.sum(case((_condicao(a.vencimento, menor, maior, hoje), a.valor), else_=0.0)), 2).label(nome)
+        for nome, menor, maior in FAIXAS
+    ]
+    por_cliente = select(a.cliente_id, *faixas, func.round(func.sum(a.valor), 2).label('total'))\
+        .group_by(a.cliente_id)
+    if f.get('cliente_id'):
+        por_cliente = por_cliente.where(a.cliente_id == f['cliente_id'])
+    if clientes is not None:
+        por_cliente = por_cliente.where(a.cliente_id.in_(clientes))
+    por_cliente = por_cliente.subquery()
+
+    vencido = por_cliente.c.total - por_cliente.c[FAIXAS[0][0]]
+    return select(
+        Cliente.id.label('cliente_id'), Cliente.nome.label('cliente'),
+        *[por_cliente.c[nome] for nome, _, _ in FAIXAS],
+        por_cliente.c.total,
+    ).join(por_cliente, por_cliente.c.cliente_id == Cliente.id)\
+        .order_by(vencido.desc(), por_cliente.c.total.desc(), Cliente.id)
+
+
+def maiores_devedores(limite, hoje=None):
+    """
+    Subconsulta dos ids dos `limite` clientes com mais saldo vencido e
+    depois mais saldo total, na mesma ordem de consulta_aging
+
+    O vencido é a soma das faixas de atraso na agenda (inclui parcelas
+    vencidas de dívidas cujo último vencimento ainda não chegou).
+    """
+    hoje = hoje or date.today()
+    a = AgendaDivida
+    vencido = func.sum(case((_condicao(a.vencimento, 0, None, hoje), a.valor), else_=0.0))
+    return select(a.cliente_id).group_by(a.cliente_id)\
+        .order_by(vencido.desc(), func.sum(a.valor).desc(), a.cliente_id)\
+        .limit(limite).scalar_subquery()
+
+
+def aging_total(hoje=None):
+    """
+    Saldo em aberto de todos os clientes por faixa de atraso, com o total
+
+    Lê saldo_vencimento (uma linha por data), agrupada pelo CASE da faixa.
+    """
+    hoje = hoje or date.today()
+    s = SaldoVencimento
+    faixa = case(
+        *[(_condicao(s.vencimento, menor, maior, hoje), nome) for nome, menor, maior in FAIXAS[:-1]],
+        else_=FAIXAS[-1][0],
+    ).label('faixa')
+    somas = dict(db.session.execute(select(faixa, func.sum(s.valor)).group_by(faixa)).all())
+    totais = {nome: round(somas.get(nome) or 0.0, 2) for nome, _, _ in FAIXAS}
+    totais['total'] = round(sum(somas.values()), 2)
+    return totais
+
+
+# ==================== PREVISÃO DE RECEBIMENTOS ====================
+
+def _periodo_previsao(f, hoje):
+    inicio = f.get('inicio') or hoje
+    fim = f.get('fim') or inicio + timedelta(weeks=SEMANAS_PADRAO, days=-1)
+    return inicio, fim
+
+
+def _saldos(f):
+    """(vencimento, valor, filtro): saldo_vencimento, ou a agenda de um cliente"""
+    if f.get('cliente_id'):
+        return AgendaDivida.vencimento, AgendaDivida.valor, [AgendaDivida.cliente_id == f['cliente_id']]
+    return SaldoVencimento.vencimento, SaldoVencimento.valor, []
+
+
+def consulta_previsao(f, hoje=None):
+    """
+    Recebimentos previstos por semana (segunda-feira), pelos vencimentos da agenda
+
+    Filtros aceitos: inicio e fim (padrão: de hoje até SEMANAS_PADRAO
+    semanas depois) e cliente_id.
+    """
+    inicio, fim = _periodo_previsao(f, hoje or date.today())
+    vencimento, valor, filtro = _saldos(f)
+    semana = AGRUPAMENTOS['semana'](vencimento).label('semana')
+    return select(semana, func.round(func.sum(valor), 2).label('previsto'))\
+        .where(vencimento.between(inicio, fim), *filtro)\
+        .group_by(semana)\
+        .having(func.sum(valor) > 0.005)\
+        .order_by(semana)
+
+
+def previsao(f, hoje=None):
+    """
+    Previsão semanal de recebimentos para a API
+
+    Returns:
+        dict com o intervalo, 'vencido' (saldo com vencimento anterior a
+        `inicio`, que não entra nas semanas), 'semanas' (todas as semanas do
+        intervalo, inclusive as sem vencimentos) e 'depois' (saldo com
+        vencimento posterior a `fim`)
+    """
+    hoje = hoje or date.today()
+    inicio, fim = _periodo_previsao(f, hoje)
+    previstas = dict(db.session.execute(consulta_previsao(f, hoje)).all())
+
+    vencimento, valor, filtro = _saldos(f)
+    vencido, depois = db.session.execute(select(
+        func.sum(case((vencimento < inicio, valor), else_=0.0)),
+        func.sum(case((vencimento > fim, valor), else_=0.0)),
+    ).where(*filtro)).one()
+
+    semanas = []
+    segunda = inicio - timedelta(days=inicio.weekday())
+    while segunda <= fim:
+        semanas.append({'semana': segunda.isoformat(), 'previsto': previstas.get(segunda.isoformat(), 0.0)})
+        segunda += timedelta(weeks=1)
+
+    return {
+        'inicio': inicio.isoformat(),
+        'fim': fim.isoformat(),
+        'vencido': round(vencido or 0.0, 2),
+        'semanas': semanas,
+        'depois': round(depois or 0.0, 2),
+    }
@@ -0,0 +1,152 @@
+"""
+Comandos de linha de comando do SGM (flask --app app <comando>)
+
+Organização:
+1. Schema (preparação, migrações) e configuração do banco
+2. Resumo de recebíveis, saldos por cliente, movimento diário e agenda de recebíveis
+3. Tarefas periódicas
+4. Importação de dados
+"""
+
+import click
+import json
+from web.models import db
+from web import resumo, migrations, vencimentos, importacao, arquivo, snapshot, saldos, movimento, carteira
+from web import config as app_config
+
+
+def register_commands(app):
+    """Registra os comandos de manutenção na CLI do Flask"""
+
+    # ==================== SCHEMA ====================
+    @app.cli.command('preparar-banco')
+    def preparar_banco():
+        """Cria as tabelas, aplica as migrações e cria o usuário admin padrão (rodar antes de subir o servidor)"""
+        aplicadas, admin_criado = migrations.preparar()
+        for versao, descricao in aplicadas:
+            click.echo(f'✓ v{versao}: {descricao}')
+        if admin_criado:
+            click.echo('✓ Usuário administrador criado: adm/adm')
+        click.echo(f'Banco pronto (schema na versão {migrations.versao_atual()}).')
+
+    @app.cli.command('migrar')
+    def migrar():
+        """Aplica as migrações de schema pendentes ao banco atual"""
+        aplicadas = migrations.aplicar()
+        for versao, descricao in aplicadas:
+            click.echo(f'✓ v{versao}: {descricao}')
+        click.echo(f'Schema na versão {migrations.versao_atual()}.')
+
+    @app.cli.command('banco-config')
+    def banco_config():
+        """Mostra o perfil ativo, as opções do pool e os pragmas efetivos do SQLite"""
+        click.echo(json.dumps(app_config.resumo_banco(app, db.engine), indent=2, ensure_ascii=False))
+
+    # ==================== RESUMO DE RECEBÍVEIS ====================
+    @app.cli.command('resumo-reconstruir')
+    def resumo_reconstruir():
+        """Recalcula o resumo de recebíveis do zero e mostra divergências"""
+        divergencias = resumo.reconstruir()
+        db.session.commit()
+
+        if not divergencias:
+            click.echo('✓ Resumo reconstruído: nenhuma divergência encontrada.')
+            return
+
+        click.echo(f'⚠ Resumo reconstruído: {len(divergencias)} divergência(s) corrigida(s):')
+        for campo, mantido, recalculado in divergencias:
+            click.echo(f'  - {campo}: mantido={mantido} recalculado={recalculado}')
+
+    @app.cli.command('saldos-recalcular')
+    def saldos_recalcular():
+        """Recalcula os saldos por cliente (aberto, vencido...) e mostra divergências"""
+        divergentes = saldos.divergentes()
+        saldos.recalcular()
+        db.session.commit()
+
+        if not divergentes:
+            click.echo('✓ Saldos recalculados: nenhuma divergência encontrada.')
+            return
+        amostra = ', '.join(str(i) for i in divergentes[:20])
+        click.echo(f'⚠ Saldos recalculados: {len(divergentes)} cliente(s) corrigido(s) (ids: {amostra}'
+                   f'{"..." if len(divergentes) > 20 else ""}).')
+
+    @app.cli.command('movimento-reconstruir')
+    def movimento_reconstruir():
+        """Refaz o movimento diário (relatórios por período) a partir das dívidas e do arquivo"""
+        divergencias = movimento.reconstruir()
+        db.session.commit()
+
+        if not divergencias:
+            click.echo('✓ Movimento reconstruído: nenhuma divergência encontrada.')
+            return
+        click.echo(f'⚠ Movimento reconstruído: {len(divergencias)} divergência(s) corrigida(s):')
+        for chave, mantido, recalculado in divergencias[:20]:
+            click.echo(f'  - {chave}: mantido={mantido} recalculado={recalculado}')
+        if len(divergencias) > 20:
+            click.echo('  ...')
+
+    @app.cli.command('carteira-reconstruir')
+    def carteira_reconstruir():
+        """Refaz a agenda de recebíveis (aging e previsão) e mostra divergências"""
+        divergentes = carteira.reconstruir()
+        db.session.commit()
+
+        if not divergentes:
+            click.echo('✓ Agenda reconstruída: nenhuma divergência encontrada.')
+            return
+        amostra = ', '.join(str(i) for i in divergentes[:20])
+        click.echo(f'⚠ Agenda reconstruída: {len(divergentes)} dívida(s) corrigida(s) (ids: {amostra}'
+                   f'{"..." if len(divergentes) > 20 else ""}).')
+
+    # ==================== TAREFAS PERIÓDICAS ====================
+    @app.cli.command('vencimentos-atualizar')
+    def vencimentos_atualizar():
+        """Marca como 'Vencida' as dívidas e parcelas pendentes já vencidas"""
+        anterior = vencimentos.ultima_execucao()
+        if anterior is not None:
+            click.echo(f'Última execução: {anterior.ultima_execucao:%d/%m/%Y %H:%M}')
+        dividas, parcelas = vencimentos.atualizar()
+        click.echo(f'✓ {dividas} dívida(s) e {parcelas} parcela(s) marcadas como vencidas.')
+
+    @app.cli.command('arquivar')
+    @click.option('--meses', type=int, default=None,
+                  help='Arquiva dívidas quitadas há mais de N meses (padrão: ARQUIVO_MESES)')
+    def arquivar(meses):
+        """Move dívidas quitadas antigas (e seus filhos) para as tabelas de arquivo"""
+        try:
+            total = arquivo.arquivar(meses)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        click.echo(f'✓ {total} dívida(s) arquivada(s). Total no arquivo: {arquivo.quantidade()}.')
+
+    @app.cli.command('snapshot-atualizar')
+    def snapshot_atualizar():
+        """Atualiza a cópia somente leitura usada pelos relatórios"""
+        if not snapshot.ativo():
+            raise click.ClickException('SNAPSHOT_RELATORIOS está desativado neste perfil.')
+        segundos = snapshot.atualizar()
+        click.echo(f'✓ Cópia dos relatórios atualizada em {segundos:.1f}s: {snapshot.arquivo_padrao(app)}')
+
+    # ==================== IMPORTAÇÃO ====================
+    @app.cli.command('importar-clientes')
+    @click.argument('arquivo', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--codificacao', default=None,
+                  help='Codificação do arquivo (padrão: UTF-8, com Windows-1252 nas linhas que não forem UTF-8)')
+    def importar_clientes(arquivo, codificacao):
+        """Importa clientes e saldos iniciais de um arquivo CSV ou JSON"""
+        formato = 'json' if arquivo.lower().endswith(('.json', '.jsonl')) else 'csv'
+        with open(arquivo, 'rb') as f:
+            try:
+                relatorio = importacao.importar(importacao.ler(f, formato, codificacao))
+            except importacao.ArquivoInvalido as e:
+                db.session.rollback()
+                raise click.ClickException(str(e))
+        dados = relatorio.como_dict()
+        click.echo(f"✓ {dados['linhas']} linha(s): {dados['clientes_criados']} cliente(s) criado(s), "
+                   f"{dados['clientes_atualizados']} atualizado(s), {dados['dividas_criadas']} dívida(s) "
+                   f"(R$ {dados['valor_importado']:.2f})")
+        if dados['rejeitadas']:
+            click.echo(f"⚠ {dados['rejeitadas']} linha(s) rejeitada(s):")
+            for erro in dados['erros']:
+                click.echo(f"  - linha {erro['linha']}: {erro['motivo']}")
@@ -0,0 +1,179 @@
+"""
+Perfis de configuração do SGM
+
+O perfil é escolhido pela variável de ambiente SGM_PERFIL (ou pelo
+argumento `perfil` de create_app):
+
+- desenvolvimento (padrão): SQLite com as opções padrão do SQLAlchemy
+- producao: SQLite em modo WAL, pragmas de desempenho em cada conexão,
+  busy timeout e pool de conexões dimensionado para vários threads
+
+Os pragmas ficam em SQLITE_PRAGMAS e as opções do engine em
+SQLALCHEMY_ENGINE_OPTIONS, para que um benchmark possa comparar perfis
+ou sobrescrever valores individuais (create_app(config={...})).
+
+Qualquer chave também pode vir do ambiente com o prefixo SGM_, lida ao
+criar o app (ex.: SGM_CACHE_TTL=120, SGM_SQLALCHEMY_DATABASE_URI=...;
+valores em JSON viram números/booleanos). No perfil de produção a chave
+de sessão (SGM_SECRET_KEY) é obrigatória.
+"""
+
+from flask import appcontext_pushed
+from sqlalchemy import event
+import os
+import threading
+
+PERFIL_PADRAO = 'desenvolvimento'
+CHAVE_PADRAO = 'troque-esta-chave-por-uma-segura'
+
+
+class Config:
+    """Perfil de desenvolvimento (comportamento original)"""
+
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///sgm.db'  # Banco SQLite local
+    SQLALCHEMY_TRACK_MODIFICATIONS = False  # Desativa warnings desnecessários
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    SECRET_KEY = CHAVE_PADRAO  # Para sessões
+    SQLITE_PRAGMAS = {}  # Executados em cada nova conexão: PRAGMA <nome> = <valor>
+
+    ITENS_POR_PAGINA = 50  # Tamanho padrão das listas paginadas
+    CACHE_TTL = 60  # Segundos que um relatório/consulta fica em cache
+    CACHE_MEMORIA_MAX = 32 * 1024 * 1024  # Limite do cache em bytes
+
+    VENCIMENTOS_AUTOMATICO = True  # Marca vencidos em segundo plano, uma vez por dia
+    ARQUIVO_MESES = 12  # Dívidas quitadas há mais tempo que isso vão para o arquivo
+
+    SNAPSHOT_RELATORIOS = False  # Relatórios pesados leem uma cópia somente leitura do banco
+    SNAPSHOT_INTERVALO = 300  # Segundos até a cópia ser atualizada em segundo plano
+    SNAPSHOT_ARQUIVO = None  # Padrão: instance/sgm_relatorios.db
+
+    DESEMPENHO_ATIVO = True  # Mede tempo, SQL e templates de cada requisição
+    DESEMPENHO_REQ_LENTA_MS = 500  # Requisições acima disso vão para o log sgm.lento
+    DESEMPENHO_SQL_LENTO_MS = 100  # Comandos SQL acima disso vão para o log sgm.lento
+    DESEMPENHO_AMOSTRAS = 1000  # Medições guardadas por rota para os percentis
+    DESEMPENHO_LOG_ARQUIVO = None  # Arquivo do log (opcional)
+
+    METRICAS_TOKEN = None  # Token do coletor em /metrics (Authorization: Bearer <token>)
+    METRICAS_IPS = ()  # Endereços ou redes liberados em /metrics (ex.: ["10.0.0.5", "10.1.0.0/24"])
+
+
+class ProducaoConfig(Config):
+    """Perfil de produção: vários caixas e o dashboard usando o banco ao mesmo tempo"""
+
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',  # Leitores não bloqueiam o escritor (e vice-versa)
+        'synchronous': 'NORMAL',  # Seguro com WAL; evita fsync a cada commit
+        'busy_timeout': 5000,  # ms esperando o lock antes de "database is locked"
+        'cache_size': -64000,  # ~64 MB de cache de páginas por conexão
+        'mmap_size': 256 * 1024 * 1024,  # Leitura via memória mapeada (256 MB)
+        'temp_store': 'MEMORY',  # Tabelas temporárias e ordenações em memória
+    }
+    SNAPSHOT_RELATORIOS = True
+    EXIGE_CHAVE_SECRETA = True  # Não sobe com a SECRET_KEY padrão
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': 10,  # Conexões mantidas abertas (uma por thread ativo)
+        'max_overflow': 10,  # Conexões extras em picos
+        'pool_timeout': 30,  # Segundos esperando uma conexão livre
+        'pool_pre_ping': True,
+        'connect_args': {
+            'timeout': 5,  # Busy timeout do driver (segundos)
+            'check_same_thread': False,  # Conexões do pool são usadas por vários threads
+        },
+    }
+
+
+PERFIS = {
+    'desenvolvimento': Config,
+    'producao': ProducaoConfig,
+}
+
+
+def carregar(app, perfil=None, config=None):
+    """
+    Aplica um perfil de configuração ao app
+
+    Ordem: perfil, variáveis de ambiente SGM_<CHAVE> e por último `config`.
+
+    Args:
+        perfil: nome do perfil (padrão: SGM_PERFIL ou 'desenvolvimento')
+        config: dict com valores que sobrescrevem o perfil
+
+    Returns:
+        nome do perfil aplicado
+    """
+    perfil = perfil or os.environ.get('SGM_PERFIL', PERFIL_PADRAO)
+    if perfil not in PERFIS:
+        raise ValueError(f"Perfil desconhecido: {perfil} (opções: {', '.join(PERFIS)})")
+
+    app.config.from_object(PERFIS[perfil])
+    app.config.from_prefixed_env('SGM')
+    app.config['SGM_PERFIL'] = perfil
+    if config:
+        app.config.update(config)
+    if app.config.get('EXIGE_CHAVE_SECRETA') and app.config.get('SECRET_KEY') in (None, '', CHAVE_PADRAO):
+        raise ValueError(f'Perfil {perfil}: defina a variável de ambiente SGM_SECRET_KEY.')
+    return perfil
+
+
+def ao_primeiro_contexto(app, funcao):
+    """
+    Executa `funcao()` uma única vez, no primeiro contexto do app
+    (requisição, comando da CLI ou thread), e não dentro de create_app
+
+    Usado no que precisa dos engines do banco (pragmas, medição de SQL):
+    criar o app continua sem abrir contextos nem tocar nos engines.
+    """
+    estado = {'feito': False}
+    lock = threading.Lock()
+
+    def _executar(sender, **extra):
+        if estado['feito']:
+            return
+        with lock:
+            if estado['feito']:
+                return
+            funcao()
+            estado['feito'] = True
+
+    appcontext_pushed.connect(_executar, app, weak=False)
+
+
+def configurar_sqlite(app, engine):
+    """Executa os pragmas do perfil em cada nova conexão SQLite do engine"""
+    pragmas = app.config.get('SQLITE_PRAGMAS') or {}
+    if not pragmas or engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _aplicar_pragmas(dbapi_conn, _record):
+        cursor = dbapi_conn.cursor()
+        for nome, valor in pragmas.items():
+            cursor.execute(f'PRAGMA {nome} = {valor}')
+        cursor.close()
+
+
+def resumo_banco(app, engine):
+    """
+    Configuração efetiva do banco, para comparação em benchmarks
+
+    Returns:
+        dict com perfil, opções do pool e os pragmas lidos da conexão
+    """
+    info = {
+        'perfil': app.config.get('SGM_PERFIL'),
+        'url': engine.url.render_as_string(hide_password=True),
+        'pool': engine.pool.status(),
+        'engine_options': {
+            k: v for k, v in (app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {}).items()
+            if k != 'connect_args'
+        },
+        'pragmas': {},
+    }
+    if engine.dialect.name == 'sqlite':
+        nomes = set(app.config.get('SQLITE_PRAGMAS') or {}) | {
+            'journal_mode', 'synchronous', 'busy_timeout', 'cache_size', 'mmap_size', 'temp_store'
+        }
+        with engine.connect() as conn:
+            for nome in sorted(nomes):
+                info['pragmas'][nome] = conn.exec_driver_sql(f'PRAGMA {nome}').scalar()
+    return info
@@ -0,0 +1,260 @@
+"""
+Medição de desempenho por requisição do SGM
+
+Para cada requisição registra:
+- tempo total (wall time)
+- tempo e quantidade de comandos SQL (eventos do engine do SQLAlchemy)
+- tempo de renderização de templates (sinais do Flask)
+
+Requisições acima de DESEMPENHO_REQ_LENTA_MS e comandos SQL acima de
+DESEMPENHO_SQL_LENTO_MS vão para o log `sgm.lento` com o nome da rota
+(e para o arquivo DESEMPENHO_LOG_ARQUIVO, se configurado).
+
+As últimas DESEMPENHO_AMOSTRAS medições de cada rota ficam em memória
+para os percentis da página /admin/desempenho. A resposta também leva o
+cabeçalho Server-Timing, visível nas ferramentas do navegador.
+"""
+
+from flask import current_app, g, request, has_request_context, template_rendered, before_render_template
+from web.models import db
+from web import config as app_config
+from sqlalchemy import event
+from collections import defaultdict, deque
+import logging
+import threading
+import time
+
+REQ_LENTA_MS = 500
+SQL_LENTO_MS = 100
+AMOSTRAS_PADRAO = 1000
+
+# Limites (em segundos) dos buckets do histograma de latência do /metrics
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+log_lento = logging.getLogger('sgm.lento')
+
+
+def percentil(valores, p):
+    """Percentil p (0-100) de uma lista já ordenada, por interpolação linear"""
+    if not valores:
+        return 0.0
+    pos = (len(valores) - 1) * p / 100
+    baixo = int(pos)
+    alto = min(baixo + 1, len(valores) - 1)
+    return valores[baixo] + (valores[alto] - valores[baixo]) * (pos - baixo)
+
+
+class Medicoes:
+    """Amostras recentes por rota (tempo total, banco, templates e nº de SQL)"""
+
+    def __init__(self, amostras=AMOSTRAS_PADRAO):
+        self.amostras = amostras
+        self._por_rota = defaultdict(lambda: deque(maxlen=self.amostras))
+        self._contagem = defaultdict(int)  # Total de requisições desde o início
+        self._lentas = defaultdict(int)
+        # Acumulados desde o início (não são zerados): (rota, método) -> dados
+        self._histogramas = {}
+        self._sql_total = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def registrar(self, rota, total_ms, banco_ms, template_ms, sql_qtd, lenta=False, metodo='GET'):
+        with self._lock:
+            self._por_rota[rota].append((total_ms, banco_ms, template_ms, sql_qtd))
+            self._contagem[rota] += 1
+            if lenta:
+                self._lentas[rota] += 1
+
+            segundos = total_ms / 1000
+            hist = self._histogramas.get((rota, metodo))
+            if hist is None:
+                hist = self._histogramas[(rota, metodo)] = {
+                    'buckets': [0] * len(BUCKETS_LATENCIA), 'soma': 0.0, 'qtd': 0,
+                }
+            for i, limite in enumerate(BUCKETS_LATENCIA):
+                if segundos <= limite:
+                    hist['buckets'][i] += 1
+            hist['soma'] += segundos
+            hist['qtd'] += 1
+            self._sql_total[rota] += sql_qtd
+
+    def histogramas(self):
+        """Histogramas cumulativos de latência: {(rota, método): {buckets, soma, qtd}}"""
+        with self._lock:
+            return {
+                chave: {'buckets': list(h['buckets']), 'soma': h['soma'], 'qtd': h['qtd']}
+                for chave, h in self._histogramas.items()
+            }
+
+    def sql_total(self):
+        """Comandos SQL executados por rota desde o início"""
+        with self._lock:
+            return dict(self._sql_total)
+
+    def limpar(self):
+        """Zera as amostras dos percentis (os histogramas do /metrics continuam)"""
+        with self._lock:
+            self._por_rota.clear()
+            self._contagem.clear()
+            self._lentas.clear()
+
+    def resumo(self):
+        """Percentis por rota, da mais lenta (p95) para a mais rápida"""
+        with self._lock:
+            dados = {rota: list(amostras) for rota, amostras in self._por_rota.items()}
+            contagem = dict(self._contagem)
+            lentas = dict(self._lentas)
+
+        rotas = []
+        for rota, amostras in dados.items():
+            total = sorted(a[0] for a in amostras)
+            banco = sorted(a[1] for a in amostras)
+            template = sorted(a[2] for a in amostras)
+            sql = sorted(a[3] for a in amostras)
+            rotas.append({
+                'rota': rota,
+                'requisicoes': contagem.get(rota, 0),
+                'lentas': lentas.get(rota, 0),
+                'amostras': len(amostras),
+                'p50_ms': round(percentil(total, 50), 1),
+                'p90_ms': round(percentil(total, 90), 1),
+                'p95_ms': round(percentil(total, 95), 1),
+                'p99_ms': round(percentil(total, 99), 1),
+                'max_ms': round(total[-1], 1),
+                'banco_p50_ms': round(percentil(banco, 50), 1),
+                'banco_p95_ms': round(percentil(banco, 95), 1),
+                'template_p50_ms': round(percentil(template, 50), 1),
+                'sql_p50': round(percentil(sql, 50), 1),
+                'sql_max': sql[-1],
+            })
+        rotas.sort(key=lambda r: r['p95_ms'], reverse=True)
+        return rotas
+
+
+def _medicao_atual():
+    """Contadores da requisição em andamento (None fora de requisição)"""
+    if not has_request_context():
+        return None
+    return g.get('desempenho')
+
+
+def _rota():
+    return request.endpoint or request.path
+
+
+def init_app(app):
+    """Liga a medição ao app: hooks de requisição, eventos do engine e de templates"""
+    app.config.setdefault('DESEMPENHO_ATIVO', True)
+    if not app.config['DESEMPENHO_ATIVO']:
+        return
+
+    medicoes = Medicoes(app.config.get('DESEMPENHO_AMOSTRAS', AMOSTRAS_PADRAO))
+    app.extensions['desempenho'] = medicoes
+    req_lenta = app.config.get('DESEMPENHO_REQ_LENTA_MS', REQ_LENTA_MS)
+    sql_lento = app.config.get('DESEMPENHO_SQL_LENTO_MS', SQL_LENTO_MS)
+
+    arquivo = app.config.get('DESEMPENHO_LOG_ARQUIVO')
+    if arquivo and not any(getattr(h, 'baseFilename', None) == arquivo for h in log_lento.handlers):
+        handler = logging.FileHandler(arquivo, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        log_lento.addHandler(handler)
+    log_lento.setLevel(logging.INFO)
+
+    # ---------- SQL ----------
+
+    def _antes_sql(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('desempenho_inicio', []).append(time.perf_counter())
+
+    def _depois_sql(conn, cursor, statement, parameters, context, executemany):
+        inicios = conn.info.get('desempenho_inicio')
+        if not inicios:
+            return
+        duracao_ms = (time.perf_counter() - inicios.pop()) * 1000
+        medicao = _medicao_atual()
+        if medicao is None:
+            return
+        medicao['sql_qtd'] += 1
+        medicao['banco_ms'] += duracao_ms
+        if duracao_ms >= sql_lento:
+            log_lento.warning('SQL lento %.1fms rota=%s: %s', duracao_ms, _rota(),
+                              ' '.join(statement.split())[:500])
+
+    def _medir_engines():
+        # Banco principal e binds extras (ex.: cópia dos relatórios)
+        for engine in db.engines.values():
+            event.listen(engine, 'before_cursor_execute', _antes_sql)
+            event.listen(engine, 'after_cursor_execute', _depois_sql)
+
+    # No primeiro contexto do app, não na factory
+    app_config.ao_primeiro_contexto(app, _medir_engines)
+
+    # ---------- Templates ----------
+
+    def _antes_template(sender, template, context, **extra):
+        medicao = _medicao_atual()
+        if medicao is not None:
+            medicao['templates'].append(time.perf_counter())
+
+    def _depois_template(sender, template, context, **extra):
+        medicao = _medicao_atual()
+        if medicao is not None and medicao['templates']:
+            medicao['template_ms'] += (time.perf_counter() - medicao['templates'].pop()) * 1000
+
+    before_render_template.connect(_antes_template, app, weak=False)
+    template_rendered.connect(_depois_template, app, weak=False)
+
+    # ---------- Requisição ----------
+
+    @app.before_request
+    def _iniciar_medicao():
+        g.desempenho = {
+            'inicio': time.perf_counter(),
+            'sql_qtd': 0,
+            'banco_ms': 0.0,
+            'template_ms': 0.0,
+            'templates': [],
+        }
+
+    def _finalizar(status):
+        medicao = g.pop('desempenho', None)
+        if medicao is None or request.endpoint == 'static':
+            return None
+        total_ms = (time.perf_counter() - medicao['inicio']) * 1000
+        lenta = total_ms >= req_lenta
+        medicoes.registrar(_rota(), total_ms, medicao['banco_ms'], medicao['template_ms'],
+                           medicao['sql_qtd'], lenta, request.method)
+        if lenta:
+            log_lento.warning(
+                'Requisição lenta %.1fms rota=%s %s %s status=%s sql=%d banco=%.1fms template=%.1fms',
+                total_ms, _rota(), request.method, request.full_path.rstrip('?'), status,
+                medicao['sql_qtd'], medicao['banco_ms'], medicao['template_ms'])
+        medicao['total_ms'] = total_ms
+        return medicao
+
+    @app.after_request
+    def _registrar_medicao(response):
+        medicao = _finalizar(response.status_code)
+        if medicao is not None:
+            response.headers['Server-Timing'] = (
+                f"db;desc=\"{medicao['sql_qtd']} SQL\";dur={medicao['banco_ms']:.1f}, "
+                f"tpl;dur={medicao['template_ms']:.1f}, total;dur={medicao['total_ms']:.1f}"
+            )
+        return response
+
+    @app.teardown_request
+    def _registrar_erro(exc):
+        # Requisições que terminaram em exceção não passam pelo after_request
+        if exc is not None:
+            _finalizar(500)
+
+
+def resumo():
+    """Percentis por rota do app atual (lista vazia se desativado)"""
+    medicoes = current_app.extensions.get('desempenho')
+    return medicoes.resumo() if medicoes else []
+
+
+def limpar():
+    """Descarta as medições acumuladas"""
+    medicoes = current_app.extensions.get('desempenho')
+    if medicoes:
+        medicoes.limpar()
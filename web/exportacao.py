@@ -0,0 +1,219 @@
+"""
+Exportação de dívidas, pagamentos e extratos do SGM (CSV ou JSON)
+
+As consultas são lidas em partes (yield_per) e cada parte é escrita na
+resposta assim que fica pronta, por um gerador: a memória usada é a
+mesma para 100 linhas ou 2 milhões.
+
+Filtros aceitos (query string):
+- inicio, fim: intervalo de datas (AAAA-MM-DD), inclusivo
+- status: status da dívida ou 'abertas' (não pagas)
+- cliente_id: apenas um cliente
+- meio: meio de pagamento (só em pagamentos)
+- arquivadas=1: inclui as dívidas quitadas já movidas para o arquivo
+  (web/arquivo.py), consultadas só quando pedidas
+"""
+
+from web.models import (
+    db, Cliente, Divida, Pagamento, Renegociacao,
+    DividaArquivo, PagamentoArquivo, RenegociacaoArquivo,
+)
+from sqlalchemy import select, literal, union_all, cast, String
+from datetime import date, datetime
+import csv
+import io
+import json
+
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'json': 'application/json; charset=utf-8',
+}
+LINHAS_POR_PARTE = 1000  # Linhas buscadas do banco e escritas de cada vez
+
+
+class FiltroInvalido(ValueError):
+    """Parâmetro de filtro mal formado"""
+
+
+def _data(valor, nome):
+    if not valor:
+        return None
+    try:
+        return date.fromisoformat(valor)
+    except ValueError:
+        raise FiltroInvalido(f'{nome}: data inválida (use AAAA-MM-DD).')
+
+
+def filtros(args):
+    """Lê e valida os filtros da query string"""
+    cliente_id = args.get('cliente_id')
+    if cliente_id and not cliente_id.isdigit():
+        raise FiltroInvalido('cliente_id inválido.')
+    return {
+        'inicio': _data(args.get('inicio'), 'inicio'),
+        'fim': _data(args.get('fim'), 'fim'),
+        'status': (args.get('status') or '').strip() or None,
+        'cliente_id': int(cliente_id) if cliente_id else None,
+        'meio': (args.get('meio') or '').strip() or None,
+        'arquivadas': args.get('arquivadas') in ('1', 'true', 'sim'),
+    }
+
+
+# Tabelas principais e de arquivo (mesmas colunas): (dívida, pagamento, renegociação)
+PRINCIPAIS = (Divida, Pagamento, Renegociacao)
+ARQUIVADAS = (DividaArquivo, PagamentoArquivo, RenegociacaoArquivo)
+
+
+def _filtrar_status(consulta, D, status):
+    if status == 'abertas':
+        return consulta.where(D.status != 'Paga')
+    if status:
+        return consulta.where(D.status == status)
+    return consulta
+
+
+def _intervalo(consulta, coluna, f):
+    if f['inicio']:
+        consulta = consulta.where(coluna >= f['inicio'])
+    if f['fim']:
+        consulta = consulta.where(coluna <= f['fim'])
+    return consulta
+
+
+def _tabelas(f):
+    """Conjuntos de tabelas consultados: o arquivo só entra com arquivadas=1 (e nunca em 'abertas')"""
+    if f['arquivadas'] and f['status'] != 'abertas':
+        return (PRINCIPAIS, ARQUIVADAS)
+    return (PRINCIPAIS,)
+
+
+def _unir(partes, ordem):
+    """Uma consulta ou a UNION ALL das partes, ordenada pelas colunas `ordem`"""
+    if len(partes) == 1:
+        consulta = partes[0]
+        return consulta.order_by(*[consulta.selected_columns[c] for c in ordem])
+    uniao = union_all(*partes).subquery()
+    return select(*[c for c in uniao.c if c.name != 'ordem']).order_by(*[uniao.c[c] for c in ordem])
+
+
+# ==================== CONSULTAS ====================
+
+def consulta_dividas(f):
+    """Dívidas com o nome do cliente, filtradas por data da venda"""
+    partes = []
+    for D, _, _ in _tabelas(f):
+        consulta = select(
+            D.id, D.cliente_id, Cliente.nome.label('cliente'),
+            D.data_venda, D.data_vencimento, D.descricao,
+            D.valor_original, D.saldo_devedor, D.status,
+            D.parcelado, D.num_parcelas, D.juros_parcelamento,
+        ).join(Cliente, Cliente.id == D.cliente_id)
+        consulta = _intervalo(consulta, D.data_venda, f)
+        consulta = _filtrar_status(consulta, D, f['status'])
+        if f['cliente_id']:
+            consulta = consulta.where(D.cliente_id == f['cliente_id'])
+        partes.append(consulta)
+    return _unir(partes, ('data_venda', 'id'))
+
+
+def consulta_pagamentos(f):
+    """Pagamentos com dívida e cliente, filtrados por data do pagamento"""
+    partes = []
+    for D, P, _ in _tabelas(f):
+        consulta = select(
+            P.id, P.data_pagamento, P.divida_id,
+            D.cliente_id, Cliente.nome.label('cliente'), P.valor,
+            P.meio_pagamento, P.usuario_responsavel,
+            D.status.label('status_divida'),
+        ).join(D, D.id == P.divida_id)\
+         .join(Cliente, Cliente.id == D.cliente_id)
+        consulta = _intervalo(consulta, P.data_pagamento, f)
+        consulta = _filtrar_status(consulta, D, f['status'])
+        if f['cliente_id']:
+            consulta = consulta.where(D.cliente_id == f['cliente_id'])
+        if f['meio']:
+            consulta = consulta.where(P.meio_pagamento == f['meio'])
+        partes.append(consulta)
+    return _unir(partes, ('data_pagamento', 'id'))
+
+
+def consulta_extrato(cliente_id, f):
+    """
+    Extrato de um cliente em ordem cronológica: compras (débito),
+    pagamentos (crédito) e renegociações (juros aplicados e novo prazo)
+    """
+    partes = []
+    for D, P, R in _tabelas(f):
+        compras = select(
+            D.data_venda.label('data'), literal(1).label('ordem'), literal('Compra').label('tipo'),
+            D.id.label('divida_id'), D.descricao.label('descricao'),
+            D.valor_original.label('debito'), literal(None).label('credito'),
+            D.status.label('detalhe'),
+        ).where(D.cliente_id == cliente_id)
+        partes.append(_filtrar_status(_intervalo(compras, D.data_venda, f), D, f['status']))
+
+        pagos = select(
+            P.data_pagamento, literal(2), literal('Pagamento'),
+            P.divida_id, P.meio_pagamento,
+            literal(None), P.valor, P.usuario_responsavel,
+        ).join(D, D.id == P.divida_id).where(D.cliente_id == cliente_id)
+        partes.append(_filtrar_status(_intervalo(pagos, P.data_pagamento, f), D, f['status']))
+
+        renegociacoes = select(
+            R.data_reneg, literal(3), literal('Renegociação'),
+            R.divida_id, literal('Juros de ') + cast(R.juros_percent, String) + '%',
+            literal(None), literal(None), cast(R.nova_data_venc, String),
+        ).join(D, D.id == R.divida_id).where(D.cliente_id == cliente_id)
+        partes.append(_filtrar_status(_intervalo(renegociacoes, R.data_reneg, f), D, f['status']))
+
+    return _unir(partes, ('data', 'ordem', 'divida_id'))
+
+
+# ==================== SAÍDA ====================
+
+def _valor_json(valor):
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    return valor
+
+
+def _linhas(consulta):
+    """Executa a consulta em partes de LINHAS_POR_PARTE (cursor do lado do banco)"""
+    resultado = db.session.execute(consulta, execution_options={'yield_per': LINHAS_POR_PARTE})
+    colunas = list(resultado.keys())
+    return colunas, resultado.partitions()
+
+
+def gerar_csv(consulta):
+    """Gera o CSV em pedaços (cabeçalho + uma parte por vez)"""
+    colunas, partes = _linhas(consulta)
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    buffer.write('\ufeff')  # BOM: acentos corretos ao abrir no Excel
+    escritor.writerow(colunas)
+    for parte in partes:
+        escritor.writerows(parte)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def gerar_json(consulta):
+    """Gera um array JSON de objetos em pedaços"""
+    colunas, partes = _linhas(consulta)
+    yield '['
+    primeiro = True
+    for parte in partes:
+        pedaco = []
+        for linha in parte:
+            objeto = {c: _valor_json(v) for c, v in zip(colunas, linha)}
+            pedaco.append(('' if primeiro else ',') + '\n' + json.dumps(objeto, ensure_ascii=False))
+            primeiro = False
+        yield ''.join(pedaco)
+    yield '\n]\n'
+
+
+def gerar(consulta, formato):
+    """Gerador da saída no formato pedido ('csv' ou 'json')"""
+    return gerar_csv(consulta) if formato == 'csv' else gerar_json(consulta)
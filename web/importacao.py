@@ -0,0 +1,394 @@
+"""
+Importação em lote de clientes e saldos iniciais (CSV ou JSON)
+
+Usada na implantação de uma mercearia: o caderno de fiado vira um arquivo
+com uma linha por cliente (e o saldo em aberto, se houver). O arquivo é
+lido em streaming e processado em partes de LINHAS_POR_PARTE linhas; cada
+parte é gravada e confirmada com um commit próprio:
+
+- 1 SELECT para achar os clientes da parte já cadastrados (nome ou CPF)
+- UPDATE em lote dos clientes existentes e INSERT em lote dos novos
+- 1 INSERT em lote das dívidas de saldo inicial
+- 1 UPDATE no resumo de recebíveis
+
+Colunas (CSV com cabeçalho; JSON como array de objetos ou um objeto por
+linha): nome, cpf, celular, endereco, nivel, limite, saldo, vencimento
+(AAAA-MM-DD, padrão hoje), data_venda (padrão hoje) e descricao.
+
+O cliente é procurado primeiro pelo CPF e depois pelo nome; os campos
+preenchidos no arquivo atualizam o cadastro (o nome de um cliente achado
+pelo CPF não muda). Linhas inválidas são rejeitadas com o motivo e não
+impedem o restante da importação.
+
+Codificação: por padrão cada linha do CSV é lida como UTF-8 e, se não for
+UTF-8 válido, como Windows-1252 (planilhas salvas pelo Excel em
+português). Com uma codificação explícita a leitura é estrita e um byte
+inválido interrompe a importação com o número da linha. JSON é sempre
+UTF-8, salvo codificação explícita.
+"""
+
+from web.models import db, Cliente, Divida
+from web import resumo, metricas, cache
+from datetime import date
+from sqlalchemy import or_, select, update
+import codecs
+import csv
+import io
+import json
+import math
+
+LINHAS_POR_PARTE = 1000
+REJEITADAS_LISTADAS = 500  # As demais só entram na contagem
+NIVEIS = ('Novo', 'Bronze', 'Prata', 'Ouro')
+DESCRICAO_PADRAO = 'Saldo anterior (importação)'
+_LEITURA_JSON = 64 * 1024
+CODIFICACAO_ALTERNATIVA = 'cp1252'  # Tentada nas linhas do CSV que não são UTF-8
+
+CAMPOS_CLIENTE = {
+    'cpf': 'cpf',
+    'celular': 'celular',
+    'endereco': 'endereco',
+    'nivel': 'nivel_confianca',
+    'limite': 'limite_credito',
+}
+
+
+class ArquivoInvalido(ValueError):
+    """Arquivo que não pode ser lido (formato ou estrutura)"""
+
+
+# ==================== LEITURA ====================
+
+def _decodificar_csv(arquivo, codificacao):
+    """
+    Linhas de texto de um CSV binário, decodificadas uma a uma
+
+    Sem `codificacao`, tenta UTF-8 e depois CODIFICACAO_ALTERNATIVA em cada
+    linha; com ela, a decodificação é estrita.
+    """
+    tentativas = (codificacao,) if codificacao else ('utf-8', CODIFICACAO_ALTERNATIVA)
+    for numero, bruta in enumerate(arquivo, 1):
+        if numero == 1 and bruta.startswith(codecs.BOM_UTF8):
+            bruta = bruta[len(codecs.BOM_UTF8):]
+        for nome in tentativas:
+            try:
+                yield bruta.decode(nome)
+                break
+            except UnicodeDecodeError:
+                continue
+        else:
+            raise ArquivoInvalido(f'Linha {numero}: caracteres inválidos para a codificação '
+                                  f'{" ou ".join(tentativas)}.')
+
+
+def _linhas_csv(texto):
+    leitor = csv.DictReader(texto)
+    if not leitor.fieldnames or 'nome' not in [c.strip().lower() for c in leitor.fieldnames]:
+        raise ArquivoInvalido('CSV sem cabeçalho com a coluna "nome".')
+    for linha in leitor:
+        yield leitor.line_num, {(k or '').strip().lower(): v for k, v in linha.items()}
+
+
+def _ler_json(texto, numero):
+    """Próximo pedaço do JSON; `numero` é o último objeto lido, para a mensagem de erro"""
+    try:
+        return texto.read(_LEITURA_JSON)
+    except UnicodeDecodeError as e:
+        raise ArquivoInvalido(f'JSON com caracteres inválidos para a codificação {e.encoding} '
+                              f'após o objeto {numero}.')
+
+
+def _linhas_json(texto):
+    """
+    Objetos de um array JSON ou de um arquivo com um objeto por linha,
+    decodificados um a um conforme o arquivo é lido
+    """
+    decodificador = json.JSONDecoder()
+    buffer = ''
+    fim = False
+    numero = 0
+    while True:
+        buffer = buffer.lstrip(' \t\r\n,[]')
+        if not buffer:
+            if fim:
+                return
+            pedaco = _ler_json(texto, numero)
+            fim = not pedaco
+            buffer += pedaco
+            continue
+        try:
+            objeto, pos = decodificador.raw_decode(buffer)
+        except ValueError:
+            pedaco = '' if fim else _ler_json(texto, numero)
+            if not pedaco:
+                raise ArquivoInvalido('JSON mal formado.')
+            fim = False
+            buffer += pedaco
+            continue
+        buffer = buffer[pos:]
+        if not isinstance(objeto, dict):
+            raise ArquivoInvalido('JSON deve conter objetos (um por cliente).')
+        numero += 1
+        yield numero, {str(k).strip().lower(): v for k, v in objeto.items()}
+
+
+def ler(arquivo, formato, codificacao=None):
+    """
+    Itera sobre as linhas de um arquivo binário (upload ou arquivo aberto)
+
+    Args:
+        formato: 'csv' ou 'json'
+        codificacao: nome da codificação (ex.: 'utf-8', 'cp1252'); padrão:
+            UTF-8, com Windows-1252 nas linhas do CSV que não forem UTF-8
+
+    Returns:
+        gerador de (numero, dict): linha do arquivo no CSV, posição do
+        objeto no JSON
+    """
+    if codificacao:
+        try:
+            codificacao = codecs.lookup(codificacao).name
+        except LookupError:
+            raise ArquivoInvalido(f'Codificação desconhecida: {codificacao}.')
+    if formato == 'csv':
+        return _linhas_csv(_decodificar_csv(arquivo, codificacao))
+    if formato == 'json':
+        texto = io.TextIOWrapper(arquivo, encoding=codificacao or 'utf-8-sig', newline='')
+        return _linhas_json(texto)
+    raise ArquivoInvalido('Formato não suportado (use CSV ou JSON).')
+
+
+# ==================== VALIDAÇÃO ====================
+
+def _texto(valor):
+    return str(valor).strip() if valor not in (None, '') else None
+
+
+def _data(valor, hoje):
+    if valor in (None, ''):
+        return hoje
+    return date.fromisoformat(str(valor).strip())
+
+
+def _numero(valor):
+    """Aceita 1234.5 ou 1.234,50 (padrão brasileiro)"""
+    if valor in (None, ''):
+        return None
+    texto = str(valor).strip().replace('R$', '').strip()
+    if ',' in texto:
+        texto = texto.replace('.', '').replace(',', '.')
+    numero = float(texto)
+    if not math.isfinite(numero):
+        raise ValueError(texto)
+    return numero
+
+
+def validar_linha(linha, hoje):
+    """
+    Normaliza uma linha do arquivo
+
+    Returns:
+        dict com nome, cpf, campos do cliente, saldo e datas
+
+    Raises:
+        ValueError: com o motivo da rejeição
+    """
+    nome = _texto(linha.get('nome'))
+    cpf = _texto(linha.get('cpf'))
+    if not nome and not cpf:
+        raise ValueError('nome ou CPF obrigatório')
+    if nome and len(nome) > 150:
+        raise ValueError('nome com mais de 150 caracteres')
+
+    campos = {}
+    for origem, coluna in CAMPOS_CLIENTE.items():
+        valor = _texto(linha.get(origem))
+        if valor is not None:
+            campos[coluna] = valor
+    if 'nivel_confianca' in campos and campos['nivel_confianca'] not in NIVEIS:
+        raise ValueError(f'nível inválido (use {", ".join(NIVEIS)})')
+    if 'limite_credito' in campos:
+        try:
+            campos['limite_credito'] = _numero(campos['limite_credito'])
+        except ValueError:
+            raise ValueError('limite inválido')
+        if campos['limite_credito'] < 0:
+            raise ValueError('limite negativo')
+
+    try:
+        saldo = _numero(linha.get('saldo'))
+    except ValueError:
+        raise ValueError('saldo inválido')
+    saldo = round(saldo or 0.0, 2)
+    if saldo < 0:
+        raise ValueError('saldo negativo')
+
+    try:
+        vencimento = _data(linha.get('vencimento'), hoje)
+        data_venda = _data(linha.get('data_venda'), hoje)
+    except ValueError:
+        raise ValueError('data inválida (use AAAA-MM-DD)')
+    if data_venda > hoje:
+        raise ValueError('data da venda no futuro')
+
+    return {
+        'nome': nome,
+        'cpf': cpf,
+        'campos': campos,
+        'saldo': saldo,
+        'vencimento': vencimento,
+        'data_venda': data_venda,
+        'descricao': (_texto(linha.get('descricao')) or DESCRICAO_PADRAO)[:255],
+    }
+
+
+# ==================== GRAVAÇÃO ====================
+
+class Relatorio:
+    """Totais da importação e linhas rejeitadas (com número da linha e motivo)"""
+
+    def __init__(self):
+        self.linhas = 0
+        self.clientes_criados = 0
+        self.clientes_atualizados = 0
+        self.dividas_criadas = 0
+        self.valor_importado = 0.0
+        self.rejeitadas = 0
+        self.erros = []
+
+    def rejeitar(self, numero, motivo, linha):
+        self.rejeitadas += 1
+        if len(self.erros) < REJEITADAS_LISTADAS:
+            self.erros.append({'linha': numero, 'motivo': motivo, 'nome': linha.get('nome'), 'cpf': linha.get('cpf')})
+
+    def como_dict(self):
+        return {
+            'linhas': self.linhas,
+            'clientes_criados': self.clientes_criados,
+            'clientes_atualizados': self.clientes_atualizados,
+            'dividas_criadas': self.dividas_criadas,
+            'valor_importado': round(self.valor_importado, 2),
+            'rejeitadas': self.rejeitadas,
+            'erros': self.erros,
+        }
+
+
+def _existentes(itens):
+    """Clientes já cadastrados com o nome ou CPF de algum item: (por_cpf, por_nome)"""
+    nomes = {i['nome'] for i in itens if i['nome']}
+    cpfs = {i['cpf'] for i in itens if i['cpf']}
+    condicoes = []
+    if nomes:
+        condicoes.append(Cliente.nome.in_(nomes))
+    if cpfs:
+        condicoes.append(Cliente.cpf.in_(cpfs))
+    por_cpf, por_nome = {}, {}
+    linhas = db.session.execute(select(Cliente.id, Cliente.nome, Cliente.cpf).where(or_(*condicoes)))
+    for cliente_id, nome, cpf in linhas:
+        por_nome[nome] = cliente_id
+        if cpf:
+            por_cpf.setdefault(cpf, cliente_id)
+    return por_cpf, por_nome
+
+
+def _gravar_parte(parte, relatorio, hoje):
+    """Grava uma parte já validada: lista de (numero_linha, item, linha_original)"""
+    por_cpf, por_nome = _existentes([item for _, item, _ in parte])
+
+    atualizacoes = {}  # cliente_id -> campos
+    novos = {}  # nome -> campos
+    novos_por_cpf = {}  # cpf -> nome de cliente novo desta parte
+    dividas = []  # (cliente_id ou nome do cliente novo, item)
+    for numero, item, linha in parte:
+        cpf, nome = item['cpf'], item['nome']
+        cliente_id = por_cpf.get(cpf) if cpf else None
+        if cliente_id is None and cpf in novos_por_cpf:
+            nome = novos_por_cpf[cpf]
+        elif cliente_id is None and nome:
+            cliente_id = por_nome.get(nome)
+
+        if cliente_id is not None:
+            atualizacoes.setdefault(cliente_id, {}).update(item['campos'])
+            chave = cliente_id
+        elif nome:
+            novos.setdefault(nome, {}).update(item['campos'])
+            if cpf:
+                novos_por_cpf[cpf] = nome
+            chave = nome
+        else:
+            relatorio.rejeitar(numero, 'CPF não cadastrado e linha sem nome', linha)
+            continue
+        if item['saldo'] > 0:
+            dividas.append((chave, item))
+
+    atualizacoes = [{'id': cid, **campos} for cid, campos in atualizacoes.items() if campos]
+    for colunas in {tuple(sorted(a)) for a in atualizacoes}:
+        # executemany exige as mesmas colunas em todas as linhas do lote
+        db.session.execute(update(Cliente), [a for a in atualizacoes if tuple(sorted(a)) == colunas])
+    relatorio.clientes_atualizados += len(atualizacoes)
+
+    ids = {}
+    if novos:
+        db.session.execute(Cliente.__table__.insert(), [
+            {'nome': nome, 'cpf': None, 'celular': None, 'endereco': None, 'nivel_confianca': 'Novo',
+             'limite_credito': 200.0, 'notificacoes_ativas': True, **campos}
+            for nome, campos in novos.items()
+        ])
+        ids = dict(db.session.execute(select(Cliente.nome, Cliente.id).where(Cliente.nome.in_(novos))).all())
+        relatorio.clientes_criados += len(novos)
+
+    linhas = [{
+        'cliente_id': ids[chave] if isinstance(chave, str) else chave,
+        'valor_original': item['saldo'],
+        'saldo_devedor': item['saldo'],
+        'data_venda': item['data_venda'],
+        'data_vencimento': item['vencimento'],
+        'descricao': item['descricao'],
+        'status': 'Vencida' if item['vencimento'] < hoje else 'Pendente',
+        'parcelado': False,
+        'num_parcelas': 1,
+        'juros_parcelamento': 0.0,
+    } for chave, item in dividas]
+    if linhas:
+        db.session.execute(Divida.__table__.insert(), linhas)
+        resumo.dividas_alteradas([
+            (None, (l['status'], l['saldo_devedor'], l['data_vencimento'])) for l in linhas
+        ])
+        metricas.dividas_inseridas(linhas)
+        relatorio.dividas_criadas += len(linhas)
+        relatorio.valor_importado += sum(l['valor_original'] for l in linhas)
+
+    tocados = set(ids.values()) | {a['id'] for a in atualizacoes} | {l['cliente_id'] for l in linhas}
+    cache.invalidar('clientes', 'dashboard', *{f'cliente:{cid}' for cid in tocados})
+    db.session.commit()
+
+
+def importar(linhas, hoje=None):
+    """
+    Importa clientes e saldos iniciais, em partes de LINHAS_POR_PARTE linhas
+
+    Cada parte é confirmada com um commit: se a importação for interrompida,
+    as partes anteriores já estão gravadas.
+
+    Args:
+        linhas: iterável de (numero_linha, dict), como o retornado por ler()
+
+    Returns:
+        Relatorio
+    """
+    hoje = hoje or date.today()
+    relatorio = Relatorio()
+    parte = []
+    for numero, linha in linhas:
+        relatorio.linhas += 1
+        try:
+            parte.append((numero, validar_linha(linha, hoje), linha))
+        except ValueError as e:
+            relatorio.rejeitar(numero, str(e), linha)
+            continue
+        if len(parte) >= LINHAS_POR_PARTE:
+            _gravar_parte(parte, relatorio, hoje)
+            parte = []
+    if parte:
+        _gravar_parte(parte, relatorio, hoje)
+    return relatorio
@@ -0,0 +1,270 @@
+"""
+Métricas do SGM no formato de texto do Prometheus (/metrics)
+
+Tudo é mantido no próprio processo, sem agente externo:
+- Latência por rota: histogramas acumulados pela medição de desempenho
+  (web/desempenho.py) e total de comandos SQL por rota
+- Pool de conexões do banco: tamanho, em uso, livres e overflow
+- Contadores de negócio: pagamentos (quantidade e valor) por meio e por
+  usuário, dívidas criadas e renegociações por usuário
+
+Os contadores de negócio são alimentados pelo que é gravado na sessão do
+SQLAlchemy (qualquer rota ou comando que crie Pagamento, Divida ou
+Renegociacao) e só contam depois do commit.
+
+Cada processo expõe os próprios números: com vários workers, o Prometheus
+deve coletar cada um (ou somar por instância).
+
+Acesso: administradores logados, o coletor com o token METRICAS_TOKEN
+(cabeçalho Authorization: Bearer <token>) ou endereços em METRICAS_IPS.
+Nenhum endereço é confiável por padrão: atrás de um proxy reverso toda
+requisição chega de 127.0.0.1.
+"""
+
+from flask import current_app, has_app_context, has_request_context, session as flask_session
+from web.models import db, Divida, Pagamento, Renegociacao
+from web.desempenho import BUCKETS_LATENCIA
+from sqlalchemy import event
+from collections import defaultdict
+import hmac
+import ipaddress
+import threading
+
+TIPO_CONTEUDO = 'text/plain; version=0.0.4; charset=utf-8'
+
+# nome -> (tipo, ajuda, labels)
+CONTADORES = {
+    'sgm_pagamentos_total': ('counter', 'Pagamentos registrados', ('meio', 'usuario')),
+    'sgm_pagamentos_valor_reais_total': ('counter', 'Valor pago (R$)', ('meio', 'usuario')),
+    'sgm_dividas_criadas_total': ('counter', 'Dívidas criadas', ('usuario',)),
+    'sgm_dividas_valor_reais_total': ('counter', 'Valor original das dívidas criadas (R$)', ('usuario',)),
+    'sgm_renegociacoes_total': ('counter', 'Renegociações registradas', ('usuario',)),
+}
+
+
+class ContadoresNegocio:
+    """Contadores monotônicos por nome e valores de labels"""
+
+    def __init__(self):
+        self._valores = defaultdict(float)  # (nome, labels) -> valor
+        self._lock = threading.Lock()
+
+    def somar(self, itens):
+        """Soma uma lista de (nome, labels, valor)"""
+        with self._lock:
+            for nome, labels, valor in itens:
+                self._valores[(nome, labels)] += valor
+
+    def valores(self):
+        with self._lock:
+            return dict(self._valores)
+
+
+def redes_liberadas(valor):
+    """
+    Converte METRICAS_IPS (lista ou texto separado por vírgulas) em redes
+
+    Raises:
+        ValueError: endereço ou rede inválida
+    """
+    if isinstance(valor, str):  # SGM_METRICAS_IPS=10.0.0.5,10.0.0.6 (sem JSON)
+        valor = [item for item in valor.split(',') if item.strip()]
+    redes = []
+    for item in valor or ():
+        try:
+            redes.append(ipaddress.ip_network(str(item).strip(), strict=False))
+        except ValueError:
+            raise ValueError(f'METRICAS_IPS: endereço ou rede inválida: {item!r}')
+    return tuple(redes)
+
+
+def init_app(app):
+    """Cria os contadores de negócio e valida os endereços liberados em /metrics"""
+    app.extensions['metricas'] = ContadoresNegocio()
+    # Uma vez, ao criar o app: um item inválido impede a subida em vez de
+    # derrubar cada coleta
+    app.extensions['metricas_redes'] = redes_liberadas(app.config.get('METRICAS_IPS'))
+
+
+def _usuario_atual():
+    """Usuário logado na requisição (ou 'sistema' em comandos e scripts)"""
+    if has_request_context():
+        return flask_session.get('user_nome') or 'anonimo'
+    return 'sistema'
+
+
+def _eventos(objeto):
+    """Contadores afetados por um objeto recém-gravado"""
+    if isinstance(objeto, Pagamento):
+        meio = objeto.meio_pagamento or 'Outro'
+        usuario = objeto.usuario_responsavel or _usuario_atual()
+        return [
+            ('sgm_pagamentos_total', (meio, usuario), 1),
+            ('sgm_pagamentos_valor_reais_total', (meio, usuario), float(objeto.valor or 0)),
+        ]
+    if isinstance(objeto, Divida):
+        usuario = _usuario_atual()
+        return [
+            ('sgm_dividas_criadas_total', (usuario,), 1),
+            ('sgm_dividas_valor_reais_total', (usuario,), float(objeto.valor_original or 0)),
+        ]
+    if isinstance(objeto, Renegociacao):
+        return [('sgm_renegociacoes_total', (objeto.usuario_responsavel or _usuario_atual(),), 1)]
+    return []
+
+
+@event.listens_for(db.session, 'after_flush')
+def _coletar_novos(session, flush_context):
+    pendentes = None
+    for objeto in session.new:
+        eventos = _eventos(objeto)
+        if eventos:
+            if pendentes is None:
+                pendentes = session.info.setdefault('metricas_pendentes', [])
+            pendentes.extend(eventos)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _contar_apos_commit(session):
+    pendentes = session.info.pop('metricas_pendentes', None)
+    if pendentes and has_app_context():
+        contadores = current_app.extensions.get('metricas')
+        if contadores is not None:
+            contadores.somar(pendentes)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _descartar_pendentes(session):
+    session.info.pop('metricas_pendentes', None)
+
+
+def contar(nome, labels, valor=1):
+    """Soma em um contador após o commit (para gravações feitas sem o ORM)"""
+    db.session.info.setdefault('metricas_pendentes', []).append((nome, tuple(labels), valor))
+
+
+def pagamentos_inseridos(linhas):
+    """Conta pagamentos inseridos em lote (dicts com as colunas de Pagamento)"""
+    for linha in linhas:
+        labels = (linha.get('meio_pagamento') or 'Outro', linha.get('usuario_responsavel') or _usuario_atual())
+        contar('sgm_pagamentos_total', labels, 1)
+        contar('sgm_pagamentos_valor_reais_total', labels, float(linha.get('valor') or 0))
+
+
+def dividas_inseridas(linhas):
+    """Conta dívidas inseridas em lote (dicts com as colunas de Divida)"""
+    usuario = _usuario_atual()
+    contar('sgm_dividas_criadas_total', (usuario,), len(linhas))
+    contar('sgm_dividas_valor_reais_total', (usuario,), sum(float(l.get('valor_original') or 0) for l in linhas))
+
+
+def renegociacoes_inseridas(quantidade, usuario=None):
+    """Conta renegociações inseridas em lote"""
+    contar('sgm_renegociacoes_total', (usuario or _usuario_atual(),), quantidade)
+
+
+# ==================== FORMATO DE TEXTO ====================
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(nomes, valores):
+    if not nomes:
+        return ''
+    pares = ','.join(f'{n}="{_escapar(v)}"' for n, v in zip(nomes, valores))
+    return '{' + pares + '}'
+
+
+def _numero(valor):
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return repr(valor) if isinstance(valor, float) else str(valor)
+
+
+def _cabecalho(linhas, nome, tipo, ajuda):
+    linhas.append(f'# HELP {nome} {ajuda}')
+    linhas.append(f'# TYPE {nome} {tipo}')
+
+
+def _latencia(linhas):
+    medicoes = current_app.extensions.get('desempenho')
+    if medicoes is None:
+        return
+
+    nome = 'sgm_http_request_duration_seconds'
+    _cabecalho(linhas, nome, 'histogram', 'Tempo de resposta por rota')
+    for (rota, metodo), hist in sorted(medicoes.histogramas().items()):
+        for limite, qtd in zip(BUCKETS_LATENCIA, hist['buckets']):
+            rotulos = _labels(('endpoint', 'method', 'le'), (rota, metodo, _numero(limite)))
+            linhas.append(f'{nome}_bucket{rotulos} {qtd}')
+        linhas.append(f'{nome}_bucket{_labels(("endpoint", "method", "le"), (rota, metodo, "+Inf"))} {hist["qtd"]}')
+        linhas.append(f'{nome}_sum{_labels(("endpoint", "method"), (rota, metodo))} {hist["soma"]:.6f}')
+        linhas.append(f'{nome}_count{_labels(("endpoint", "method"), (rota, metodo))} {hist["qtd"]}')
+
+    nome = 'sgm_sql_statements_total'
+    _cabecalho(linhas, nome, 'counter', 'Comandos SQL executados por rota')
+    for rota, qtd in sorted(medicoes.sql_total().items()):
+        linhas.append(f'{nome}{_labels(("endpoint",), (rota,))} {qtd}')
+
+
+def _pool(linhas):
+    pool = db.engine.pool
+    medidas = [
+        ('sgm_db_pool_size', 'Conexões mantidas pelo pool', 'size'),
+        ('sgm_db_pool_checked_out', 'Conexões em uso', 'checkedout'),
+        ('sgm_db_pool_checked_in', 'Conexões livres no pool', 'checkedin'),
+        ('sgm_db_pool_overflow', 'Conexões além do tamanho do pool', 'overflow'),
+    ]
+    for nome, ajuda, metodo in medidas:
+        # Pools sem contagem (ex.: SQLite em memória) não expõem esses métodos
+        if hasattr(pool, metodo):
+            _cabecalho(linhas, nome, 'gauge', ajuda)
+            linhas.append(f'{nome} {getattr(pool, metodo)()}')
+
+
+def _negocio(linhas):
+    contadores = current_app.extensions.get('metricas')
+    valores = contadores.valores() if contadores else {}
+    for nome, (tipo, ajuda, nomes_labels) in CONTADORES.items():
+        _cabecalho(linhas, nome, tipo, ajuda)
+        for (n, labels), valor in sorted(valores.items()):
+            if n == nome:
+                linhas.append(f'{nome}{_labels(nomes_labels, labels)} {_numero(round(valor, 2))}')
+
+
+def exportar():
+    """Texto no formato de exposição do Prometheus com todas as métricas"""
+    linhas = []
+    _latencia(linhas)
+    _pool(linhas)
+    _negocio(linhas)
+    return '\n'.join(linhas) + '\n'
+
+
+def _endereco_liberado(remote_addr, redes):
+    """Indica se o endereço está em alguma das redes liberadas"""
+    if not remote_addr or not redes:
+        return False
+    try:
+        endereco = ipaddress.ip_address(remote_addr)
+    except ValueError:
+        return False
+    return any(endereco in rede for rede in redes)
+
+
+def acesso_permitido(remote_addr, tipo_usuario, autorizacao=None):
+    """
+    /metrics: administradores logados, o token METRICAS_TOKEN ou um endereço de METRICAS_IPS
+
+    Args:
+        autorizacao: valor do cabeçalho Authorization (Bearer <token>)
+    """
+    if tipo_usuario == 'Administrador':
+        return True
+    token = current_app.config.get('METRICAS_TOKEN')
+    if token and autorizacao:
+        esquema, _, valor = autorizacao.partition(' ')
+        if esquema.lower() == 'bearer' and hmac.compare_digest(valor.strip().encode(), str(token).encode()):
+            return True
+    return _endereco_liberado(remote_addr, current_app.extensions.get('metricas_redes', ()))
@@ -0,0 +1,270 @@
+"""
+Migrações de schema do SGM
+
+O db.create_all() só cria tabelas que ainda não existem; ele não altera
+tabelas de bancos antigos. Cada migração abaixo leva um sgm.db existente
+para a versão seguinte sem reconstruí-lo, e a tabela `migracao` registra
+quais versões já foram aplicadas.
+
+Os passos são idempotentes (IF NOT EXISTS / verificação de colunas),
+então também podem rodar sobre um banco recém-criado pelo create_all.
+
+Para adicionar uma migração: escreva uma função `_vN_descricao(conn)` e
+inclua (N, descrição, função) no fim de MIGRACOES.
+
+preparar() faz a preparação completa de um banco (tabelas, migrações,
+usuário administrador padrão e resumo). Ela não roda ao criar o app:
+use `flask --app app preparar-banco` (ou `python app.py`, que a chama
+antes de subir o servidor de desenvolvimento).
+"""
+
+from web.models import (
+    db, Migracao, Usuario, VersaoDado, MovimentoDiario, AgendaDivida, SaldoVencimento,
+    Divida, Pagamento, Renegociacao, Parcela,
+    DividaArquivo, PagamentoArquivo, RenegociacaoArquivo, ParcelaArquivo,
+)
+from web import busca, resumo, versoes, saldos, movimento, carteira
+from werkzeug.security import generate_password_hash
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateTable
+import time
+
+
+def _criar_indice(conn, nome, tabela, colunas):
+    """Cria um índice se ele ainda não existir"""
+    conn.execute(text(f'CREATE INDEX IF NOT EXISTS {nome} ON {tabela} ({colunas})'))
+
+
+def _adicionar_coluna(conn, tabela, coluna, definicao):
+    """Adiciona uma coluna se ela ainda não existir (ALTER TABLE ... ADD COLUMN)"""
+    existentes = {c['name'] for c in inspect(conn).get_columns(tabela)}
+    if coluna not in existentes:
+        conn.execute(text(f'ALTER TABLE {tabela} ADD COLUMN {coluna} {definicao}'))
+
+
+# ==================== MIGRAÇÕES ====================
+
+def _v1_indices_consultas(conn):
+    """Índices das consultas mais usadas (dívidas por cliente/status e filhos por dívida)"""
+    _criar_indice(conn, 'ix_divida_cliente_status', 'divida', 'cliente_id, status')
+    _criar_indice(conn, 'ix_divida_status_vencimento', 'divida', 'status, data_vencimento')
+    _criar_indice(conn, 'ix_divida_vencimento', 'divida', 'data_vencimento')
+    _criar_indice(conn, 'ix_divida_saldo_devedor', 'divida', 'saldo_devedor')
+    _criar_indice(conn, 'ix_pagamento_divida', 'pagamento', 'divida_id')
+    _criar_indice(conn, 'ix_renegociacao_divida', 'renegociacao', 'divida_id')
+    _criar_indice(conn, 'ix_parcela_divida_numero', 'parcela', 'divida_id, numero_parcela')
+
+
+def _v2_busca_clientes(conn):
+    """Índice FTS5 de busca de clientes (sem acento, por prefixo) e triggers de sincronização"""
+    busca.criar_indice(conn)
+
+
+def _v3_parcelas_vencidas(conn):
+    """Índice usado pela atualização em lote de parcelas vencidas"""
+    _criar_indice(conn, 'ix_parcela_status_vencimento', 'parcela', 'status, data_vencimento')
+
+
+def _v4_clientes_cpf(conn):
+    """Índice de clientes por CPF (usado na importação em lote)"""
+    _criar_indice(conn, 'ix_cliente_cpf', 'cliente', 'cpf')
+
+
+def _v5_parcelas_orfas(conn):
+    """Remove parcelas de dívidas já apagadas (exclusões antigas não as removiam)"""
+    conn.execute(text('DELETE FROM parcela WHERE divida_id NOT IN (SELECT id FROM divida)'))
+
+
+def _v6_versoes(conn):
+    """Tabela de versões das ETags, com a versão global iniciada no instante da migração"""
+    VersaoDado.__table__.create(conn, checkfirst=True)
+    # Um banco recriado nunca repete ETags de um banco anterior
+    conn.execute(
+        text('INSERT OR IGNORE INTO versao_dado (chave, versao) VALUES (:chave, :versao)'),
+        {'chave': versoes.TODOS, 'versao': int(time.time() * 1000)},
+    )
+
+
+def _v7_saldos_clientes(conn):
+    """Saldos por cliente (aberto, vencido, quantidade, vencimento mais antigo), triggers e carga inicial"""
+    _adicionar_coluna(conn, 'cliente', 'saldo_aberto', 'FLOAT NOT NULL DEFAULT 0')
+    _adicionar_coluna(conn, 'cliente', 'saldo_vencido', 'FLOAT NOT NULL DEFAULT 0')
+    _adicionar_coluna(conn, 'cliente', 'qtd_dividas_abertas', 'INTEGER NOT NULL DEFAULT 0')
+    _adicionar_coluna(conn, 'cliente', 'vencimento_mais_antigo', 'DATE')
+    _criar_indice(conn, 'ix_cliente_saldo_aberto', 'cliente', 'saldo_aberto')
+    # O índice de busca não deve ser reescrito a cada mudança de saldo
+    busca.restringir_trigger_atualizacao(conn)
+    saldos.criar_gatilhos(conn)
+    saldos.recalcular(conn)
+
+
+def _v8_movimento_diario(conn):
+    """Movimento diário (vendas, pagamentos, renegociações), triggers e carga do histórico"""
+    # O movimento lê o saldo renegociado (v10): a coluna já precisa existir aqui
+    _colunas_saldo_renegociado(conn)
+    MovimentoDiario.__table__.create(conn, checkfirst=True)
+    movimento.criar_gatilhos(conn)
+    movimento.reconstruir(conn)
+
+
+def _v9_agenda_recebiveis(conn):
+    """Agenda do saldo em aberto por vencimento (aging e previsão), triggers e carga inicial"""
+    SaldoVencimento.__table__.create(conn, checkfirst=True)
+    AgendaDivida.__table__.create(conn, checkfirst=True)
+    carteira.criar_gatilhos(conn)
+    carteira.reconstruir(conn)
+
+
+def _colunas_saldo_renegociado(conn):
+    _adicionar_coluna(conn, 'renegociacao', 'saldo_renegociado', 'FLOAT')
+    _adicionar_coluna(conn, 'renegociacao_arquivo', 'saldo_renegociado', 'FLOAT')
+
+
+def _v10_saldo_renegociado(conn):
+    """Saldo renegociado em cada renegociação, somado ao movimento diário"""
+    _colunas_saldo_renegociado(conn)
+    conn.execute(text('DROP TRIGGER IF EXISTS renegociacao_movimento_ai'))
+    movimento.criar_gatilhos(conn, tipos=('renegociacao',))
+    movimento.reconstruir(conn)
+
+
+def _v11_gatilhos_incrementais(conn):
+    """Triggers de saldos e da agenda por deltas de OLD/NEW, no lugar dos recálculos"""
+    for gatilho in ('divida_saldos_au', 'divida_saldos_ad', 'divida_agenda_ai', 'divida_agenda_au',
+                    'parcela_agenda_ai', 'parcela_agenda_au', 'parcela_agenda_au_divida', 'parcela_agenda_ad'):
+        conn.execute(text(f'DROP TRIGGER IF EXISTS {gatilho}'))
+    saldos.criar_gatilhos(conn)
+    carteira.criar_gatilhos(conn)
+
+
+def _recriar_com_autoincremento(conn, modelo):
+    """
+    Recria a tabela do modelo com AUTOINCREMENT, mantendo linhas e índices
+
+    O SQLite não altera a chave primária de uma tabela existente: cria-se
+    a tabela nova, copiam-se as linhas e ela toma o lugar da antiga. Os
+    triggers são refeitos pelo chamador.
+    """
+    tabela = modelo.__tablename__
+    sql_atual = conn.execute(
+        text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :nome"), {'nome': tabela}
+    ).scalar()
+    if 'AUTOINCREMENT' in sql_atual.upper():
+        return
+    indices = conn.execute(text(
+        "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = :nome AND sql IS NOT NULL"
+    ), {'nome': tabela}).scalars().all()
+
+    nova = f'{tabela}_nova'
+    ddl = str(CreateTable(modelo.__table__).compile(dialect=conn.dialect))
+    conn.execute(text(ddl.replace(f'CREATE TABLE {tabela} ', f'CREATE TABLE {nova} ', 1)))
+    existentes = {c['name'] for c in inspect(conn).get_columns(tabela)}
+    colunas = ', '.join(c.name for c in modelo.__table__.columns if c.name in existentes)
+    conn.execute(text(f'INSERT INTO {nova} ({colunas}) SELECT {colunas} FROM {tabela}'))
+    conn.execute(text(f'DROP TABLE {tabela}'))
+    conn.execute(text(f'ALTER TABLE {nova} RENAME TO {tabela}'))
+    for sql in indices:
+        conn.execute(text(sql))
+
+
+def _v12_ids_sem_reuso(conn):
+    """Dívidas, pagamentos, renegociações e parcelas com AUTOINCREMENT (ids do arquivo nunca se repetem)"""
+    # Triggers de outras tabelas citam estas; o RENAME do SQLite rejeita
+    # triggers que apontem para uma tabela que não existe no momento
+    gatilhos = conn.execute(text(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' ORDER BY name"
+    )).all()
+    for nome, _ in gatilhos:
+        conn.execute(text(f'DROP TRIGGER IF EXISTS {nome}'))
+
+    for modelo, arquivo in ((Divida, DividaArquivo), (Pagamento, PagamentoArquivo),
+                            (Renegociacao, RenegociacaoArquivo), (Parcela, ParcelaArquivo)):
+        _recriar_com_autoincremento(conn, modelo)
+        tabela = modelo.__tablename__
+        # A sequência parte do maior id já usado, inclusive no arquivo
+        maior = conn.execute(text(
+            f'SELECT MAX(COALESCE((SELECT MAX(id) FROM {tabela}), 0), '
+            f'COALESCE((SELECT MAX(id) FROM {arquivo.__tablename__}), 0))'
+        )).scalar()
+        conn.execute(text('DELETE FROM sqlite_sequence WHERE name = :nome'), {'nome': tabela})
+        conn.execute(text('INSERT INTO sqlite_sequence (name, seq) VALUES (:nome, :seq)'),
+                     {'nome': tabela, 'seq': maior})
+
+    for _, sql in gatilhos:
+        conn.execute(text(sql))
+
+
+MIGRACOES = [
+    (1, 'Índices das consultas principais', _v1_indices_consultas),
+    (2, 'Índice de busca de clientes (FTS5)', _v2_busca_clientes),
+    (3, 'Índice de parcelas por status e vencimento', _v3_parcelas_vencidas),
+    (4, 'Índice de clientes por CPF', _v4_clientes_cpf),
+    (5, 'Remoção de parcelas órfãs', _v5_parcelas_orfas),
+    (6, 'Versões para GET condicional (ETag)', _v6_versoes),
+    (7, 'Saldos por cliente mantidos por triggers', _v7_saldos_clientes),
+    (8, 'Movimento diário para relatórios por período', _v8_movimento_diario),
+    (9, 'Agenda de recebíveis para aging e previsão', _v9_agenda_recebiveis),
+    (10, 'Saldo renegociado no movimento diário', _v10_saldo_renegociado),
+    (11, 'Triggers incrementais de saldos e da agenda', _v11_gatilhos_incrementais),
+    (12, 'Ids de dívidas e filhos sem reaproveitamento (AUTOINCREMENT)', _v12_ids_sem_reuso),
+]
+
+
+def versao_atual():
+    """Maior versão de schema já aplicada (0 se nenhuma)"""
+    return db.session.query(db.func.coalesce(db.func.max(Migracao.versao), 0)).scalar()
+
+
+def aplicar():
+    """
+    Aplica as migrações pendentes, cada uma em sua própria transação
+
+    Returns:
+        lista de (versao, descricao) aplicadas nesta execução
+    """
+    Migracao.__table__.create(db.engine, checkfirst=True)
+    atual = versao_atual()
+    db.session.commit()
+
+    aplicadas = []
+    for versao, descricao, migracao in MIGRACOES:
+        if versao <= atual:
+            continue
+        with db.engine.begin() as conn:
+            migracao(conn)
+            conn.execute(
+                Migracao.__table__.insert().values(versao=versao, descricao=descricao)
+            )
+        aplicadas.append((versao, descricao))
+    return aplicadas
+
+
+# ==================== PREPARAÇÃO ====================
+
+def preparar():
+    """
+    Cria as tabelas, aplica as migrações, cria o usuário administrador
+    padrão (adm/adm) se não existir e o resumo de recebíveis
+
+    Returns:
+        (lista de (versao, descricao) aplicadas, True se o admin foi criado)
+    """
+    db.create_all(bind_key=None)  # Só o banco principal (a cópia dos relatórios é somente leitura)
+    aplicadas = aplicar()
+
+    admin_criado = False
+    if not Usuario.query.filter_by(nome='adm').first():
+        db.session.add(Usuario(
+            nome='adm',
+            cpf=None,
+            email='adm@sgm.com',
+            senha_hash=generate_password_hash('adm'),
+            tipo='Administrador'
+        ))
+        db.session.commit()
+        admin_criado = True
+
+    # Cria o resumo de recebíveis dos dashboards se ainda não existir (ou o leva para hoje)
+    resumo.avancar()
+    db.session.commit()
+    return aplicadas, admin_criado
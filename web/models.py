@@ -7,10 +7,19 @@ Define as tabelas do banco de dados e suas relações:
 - Divida: registro de compras a prazo
 - Pagamento: pagamentos realizados nas dívidas
 - Renegociacao: histórico de renegociações de prazo/juros
+- Parcela: parcelas de dívidas parceladas
+- DividaArquivo, PagamentoArquivo, RenegociacaoArquivo, ParcelaArquivo:
+  dívidas quitadas antigas e seus filhos, fora das tabelas principais
+- Migracao: versões de schema aplicadas
+- TarefaExecucao: última execução das tarefas periódicas
+- ResumoRecebiveis / ResumoMeioPagamento: totais pré-calculados para os dashboards
+- MovimentoDiario: totais por dia de vendas, pagamentos e renegociações
+- AgendaDivida / SaldoVencimento: saldo em aberto por vencimento (aging e previsão)
+- VersaoDado: versões dos dados para as ETags das APIs
 """
 
 from flask_sqlalchemy import SQLAlchemy
-from datetime import date
+from datetime import date, datetime
 
 # Inicializa o SQLAlchemy para gerenciar o banco de dados
 db = SQLAlchemy()
@@ -32,7 +41,11 @@ class Usuario(db.Model):
 
 class Cliente(db.Model):
     """Modelo de Cliente - pessoas que compram fiado na mercearia"""
-    
+    __table_args__ = (
+        db.Index('ix_cliente_cpf', 'cpf'),
+        db.Index('ix_cliente_saldo_aberto', 'saldo_aberto'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     nome = db.Column(db.String(150), nullable=False, unique=True)
     cpf = db.Column(db.String(20), nullable=True)
@@ -42,6 +55,12 @@ class Cliente(db.Model):
     limite_credito = db.Column(db.Float, default=200.0)  # Limite de crédito em R$
     notificacoes_ativas = db.Column(db.Boolean, default=True)
 
+    # Totais das dívidas não pagas, mantidos por triggers em `divida` (ver web/saldos.py)
+    saldo_aberto = db.Column(db.Float, nullable=False, default=0.0)
+    saldo_vencido = db.Column(db.Float, nullable=False, default=0.0)  # Vencimento antes de hoje
+    qtd_dividas_abertas = db.Column(db.Integer, nullable=False, default=0)
+    vencimento_mais_antigo = db.Column(db.Date, nullable=True)
+
     # Relacionamento: um cliente pode ter várias dívidas
     dividas = db.relationship('Divida', backref='cliente', lazy=True, cascade='all, delete-orphan')
 
@@ -50,6 +69,14 @@ class Cliente(db.Model):
 
 class Divida(db.Model):
     """Modelo de Dívida - registro de compra a prazo (fiado)"""
+    __table_args__ = (
+        db.Index('ix_divida_cliente_status', 'cliente_id', 'status'),
+        db.Index('ix_divida_status_vencimento', 'status', 'data_vencimento'),
+        db.Index('ix_divida_vencimento', 'data_vencimento'),
+        db.Index('ix_divida_saldo_devedor', 'saldo_devedor'),
+        # AUTOINCREMENT: um id apagado (ou arquivado) nunca é reutilizado
+        {'sqlite_autoincrement': True},
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     cliente_id = db.Column(db.Integer, db.ForeignKey('cliente.id'), nullable=False)
@@ -57,7 +84,7 @@ class Divida(db.Model):
     data_venda = db.Column(db.Date, default=date.today)  # Data da compra
     data_vencimento = db.Column(db.Date, nullable=False)  # Prazo para pagamento
     descricao = db.Column(db.String(255), default='')  # Descrição dos itens
-    status = db.Column(db.String(50), default='Pendente')  # Pendente, Paga, Renegociada
+    status = db.Column(db.String(50), default='Pendente')  # Pendente, Vencida, Paga, Renegociada
     saldo_devedor = db.Column(db.Float, nullable=False)  # Quanto ainda falta pagar
     
     # Campos de parcelamento
@@ -80,12 +107,19 @@ class Divida(db.Model):
             self.status = 'Paga'
 
     def registrar_pagamento(self, pagamento):
-        """Registra um pagamento no banco e atualiza o saldo"""
+        """Registra um pagamento no banco e atualiza o saldo (e o resumo de recebíveis)"""
+        from web import resumo
+        antes = resumo.estado_divida(self)
         db.session.add(pagamento)
         self.aplicar_pagamento(pagamento)
+        resumo.divida_alterada(antes, resumo.estado_divida(self))
+        resumo.pagamento_registrado(pagamento)
 
     def renegociar(self, nova_data, juros_percent, usuario_responsavel):
         """Renegocia a dívida: aplica juros e prorroga o prazo"""
+        from web import resumo
+        antes = resumo.estado_divida(self)
+
         # Calcula e aplica juros
         acrescimo = self.saldo_devedor * (juros_percent / 100)
         self.saldo_devedor += acrescimo
@@ -99,15 +133,93 @@ class Divida(db.Model):
             divida_id=self.id,
             nova_data_venc=nova_data,
             juros_percent=juros_percent,
-            usuario_responsavel=usuario_responsavel
+            usuario_responsavel=usuario_responsavel,
+            saldo_renegociado=self.saldo_devedor
         )
         db.session.add(reneg)
+        resumo.divida_alterada(antes, resumo.estado_divida(self))
+
+    @staticmethod
+    def renegociar_pendentes(cliente_id, nova_data, usuario_responsavel, exceto_id=None):
+        """
+        Renegocia sem juros todas as dívidas não pagas de um cliente para `nova_data`
+
+        Mesmo efeito de chamar renegociar(nova_data, 0.0, usuario) em cada uma,
+        mas em lote: 1 SELECT dos estados (para o resumo), 1 INSERT ... SELECT
+        em renegociacao e 1 UPDATE em divida.
+
+        Returns:
+            quantidade de dívidas renegociadas
+        """
+        from web import resumo, metricas
+        filtro = [Divida.cliente_id == cliente_id, Divida.status != 'Paga']
+        if exceto_id is not None:
+            filtro.append(Divida.id != exceto_id)
+
+        estados = db.session.execute(
+            db.select(Divida.status, Divida.saldo_devedor, Divida.data_vencimento).where(*filtro)
+        ).all()
+        if not estados:
+            return 0
+
+        db.session.execute(
+            db.insert(Renegociacao).from_select(
+                ['divida_id', 'nova_data_venc', 'juros_percent', 'data_reneg', 'usuario_responsavel',
+                 'saldo_renegociado'],
+                db.select(
+                    Divida.id, db.literal(nova_data, db.Date), db.literal(0.0),
+                    db.literal(date.today(), db.Date), db.literal(usuario_responsavel, db.String),
+                    Divida.saldo_devedor,
+                ).where(*filtro)
+            )
+        )
+        db.session.execute(
+            db.update(Divida).where(*filtro)
+            .values(data_vencimento=nova_data, status='Renegociada')
+            .execution_options(synchronize_session=False)
+        )
+
+        resumo.dividas_alteradas([
+            (resumo.estado_divida(e), ('Renegociada', e.saldo_devedor or 0.0, nova_data)) for e in estados
+        ])
+        metricas.renegociacoes_inseridas(len(estados), usuario_responsavel)
+        return len(estados)
+
+    @staticmethod
+    def apagar_todas(*filtro):
+        """
+        Apaga as dívidas que atendem ao filtro e todos os filhos (pagamentos,
+        renegociações e parcelas) com um DELETE por tabela, usando a
+        subconsulta dos ids da dívida
+
+        Atualiza o resumo de recebíveis e o movimento diário antes dos DELETEs.
+
+        Returns:
+            quantidade de dívidas apagadas
+        """
+        from web import resumo, movimento
+        resumo.dividas_removidas(Divida.query.filter(*filtro))
+
+        ids = db.select(Divida.id).where(*filtro).scalar_subquery()
+        movimento.removidos(movimento.PRINCIPAIS, ids)
+        for filho in (Pagamento, Renegociacao, Parcela):
+            db.session.execute(
+                db.delete(filho).where(filho.divida_id.in_(ids))
+                .execution_options(synchronize_session=False)
+            )
+        return db.session.execute(
+            db.delete(Divida).where(*filtro).execution_options(synchronize_session=False)
+        ).rowcount
 
     def __repr__(self):
         return f"<Divida #{self.id} - Cliente: {self.cliente.nome} - Saldo: R${self.saldo_devedor:.2f}>"
 
 class Pagamento(db.Model):
     """Modelo de Pagamento - registro de pagamento parcial ou total de uma dívida"""
+    __table_args__ = (
+        db.Index('ix_pagamento_divida', 'divida_id'),
+        {'sqlite_autoincrement': True},
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     divida_id = db.Column(db.Integer, db.ForeignKey('divida.id'), nullable=False)
@@ -122,6 +234,10 @@ class Pagamento(db.Model):
 
 class Renegociacao(db.Model):
     """Modelo de Renegociação - histórico de alterações de prazo e juros"""
+    __table_args__ = (
+        db.Index('ix_renegociacao_divida', 'divida_id'),
+        {'sqlite_autoincrement': True},
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     divida_id = db.Column(db.Integer, db.ForeignKey('divida.id'), nullable=False)
@@ -129,6 +245,7 @@ class Renegociacao(db.Model):
     juros_percent = db.Column(db.Float, nullable=False)  # Percentual de juros aplicado
     data_reneg = db.Column(db.Date, default=date.today)  # Data da renegociação
     usuario_responsavel = db.Column(db.String(150), nullable=True)  # Quem fez a renegociação
+    saldo_renegociado = db.Column(db.Float, nullable=True)  # Saldo da dívida após os juros (NULL antes da v10)
 
     def __repr__(self):
         return f"<Renegociacao - Novo vencimento: {self.nova_data_venc} - Juros: {self.juros_percent}%>"
@@ -136,6 +253,11 @@ class Renegociacao(db.Model):
 
 class Parcela(db.Model):
     """Modelo de Parcela - representa uma parcela de uma dívida parcelada"""
+    __table_args__ = (
+        db.Index('ix_parcela_divida_numero', 'divida_id', 'numero_parcela'),
+        db.Index('ix_parcela_status_vencimento', 'status', 'data_vencimento'),
+        {'sqlite_autoincrement': True},
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     divida_id = db.Column(db.Integer, db.ForeignKey('divida.id'), nullable=False)
@@ -147,3 +269,207 @@ class Parcela(db.Model):
     
     def __repr__(self):
         return f"<Parcela {self.numero_parcela} - R${self.valor_parcela:.2f} - {self.status}>"
+
+
+# ==================== ARQUIVO (DÍVIDAS QUITADAS ANTIGAS) ====================
+# Mesmas colunas (e ids) das tabelas principais, cujos ids não se repetem
+# (AUTOINCREMENT); ver web/arquivo.py
+
+class DividaArquivo(db.Model):
+    """Dívida quitada movida para o arquivo"""
+    __tablename__ = 'divida_arquivo'
+    __table_args__ = (
+        db.Index('ix_divida_arquivo_cliente', 'cliente_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    cliente_id = db.Column(db.Integer, nullable=False)
+    valor_original = db.Column(db.Float, nullable=False)
+    data_venda = db.Column(db.Date)
+    data_vencimento = db.Column(db.Date, nullable=False)
+    descricao = db.Column(db.String(255), default='')
+    status = db.Column(db.String(50), default='Paga')
+    saldo_devedor = db.Column(db.Float, nullable=False)
+    parcelado = db.Column(db.Boolean, default=False)
+    num_parcelas = db.Column(db.Integer, default=1)
+    juros_parcelamento = db.Column(db.Float, default=0.0)
+    arquivada_em = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+
+class PagamentoArquivo(db.Model):
+    """Pagamento de uma dívida arquivada"""
+    __tablename__ = 'pagamento_arquivo'
+    __table_args__ = (
+        db.Index('ix_pagamento_arquivo_divida', 'divida_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    divida_id = db.Column(db.Integer, nullable=False)
+    valor = db.Column(db.Float, nullable=False)
+    data_pagamento = db.Column(db.Date)
+    meio_pagamento = db.Column(db.String(50), nullable=True)
+    usuario_responsavel = db.Column(db.String(150), nullable=True)
+
+
+class RenegociacaoArquivo(db.Model):
+    """Renegociação de uma dívida arquivada"""
+    __tablename__ = 'renegociacao_arquivo'
+    __table_args__ = (
+        db.Index('ix_renegociacao_arquivo_divida', 'divida_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    divida_id = db.Column(db.Integer, nullable=False)
+    nova_data_venc = db.Column(db.Date, nullable=False)
+    juros_percent = db.Column(db.Float, nullable=False)
+    data_reneg = db.Column(db.Date)
+    usuario_responsavel = db.Column(db.String(150), nullable=True)
+    saldo_renegociado = db.Column(db.Float, nullable=True)
+
+
+class ParcelaArquivo(db.Model):
+    """Parcela de uma dívida arquivada"""
+    __tablename__ = 'parcela_arquivo'
+    __table_args__ = (
+        db.Index('ix_parcela_arquivo_divida', 'divida_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    divida_id = db.Column(db.Integer, nullable=False)
+    numero_parcela = db.Column(db.Integer, nullable=False)
+    valor_parcela = db.Column(db.Float, nullable=False)
+    data_vencimento = db.Column(db.Date, nullable=False)
+    status = db.Column(db.String(50), default='Paga')
+    valor_pago = db.Column(db.Float, default=0.0)
+
+
+class Migracao(db.Model):
+    """Versões de schema já aplicadas ao banco (ver web/migrations.py)"""
+    __tablename__ = 'migracao'
+
+    versao = db.Column(db.Integer, primary_key=True)
+    descricao = db.Column(db.String(255), nullable=False)
+    aplicada_em = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+    def __repr__(self):
+        return f"<Migracao v{self.versao} - {self.descricao}>"
+
+
+class TarefaExecucao(db.Model):
+    """Última execução de cada tarefa periódica (ex.: atualização de vencidos)"""
+    __tablename__ = 'tarefa_execucao'
+
+    nome = db.Column(db.String(100), primary_key=True)
+    ultima_execucao = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    data_referencia = db.Column(db.Date, nullable=True)  # Dia considerado na execução
+    registros = db.Column(db.Integer, default=0)  # Linhas alteradas na última execução
+
+    def __repr__(self):
+        return f"<TarefaExecucao {self.nome} - {self.ultima_execucao}>"
+
+
+class MovimentoDiario(db.Model):
+    """
+    Totais por dia de vendas, pagamentos e renegociações (ver web/movimento.py)
+
+    Uma linha por (dia, tipo, meio, usuário); meio e usuário ficam vazios
+    quando não se aplicam (vendas não têm meio nem usuário).
+    """
+    __tablename__ = 'movimento_diario'
+
+    dia = db.Column(db.Date, primary_key=True)
+    tipo = db.Column(db.String(20), primary_key=True)  # venda, pagamento, renegociacao
+    meio = db.Column(db.String(50), primary_key=True, default='')
+    usuario = db.Column(db.String(150), primary_key=True, default='')
+    quantidade = db.Column(db.Integer, nullable=False, default=0)
+    valor = db.Column(db.Float, nullable=False, default=0.0)
+
+    def __repr__(self):
+        return f"<MovimentoDiario {self.dia} {self.tipo} {self.meio} {self.usuario}: {self.quantidade}>"
+
+
+class AgendaDivida(db.Model):
+    """
+    Saldo em aberto de uma dívida repartido pelos vencimentos (ver web/carteira.py)
+
+    Mantida por triggers em divida e parcela; dívidas pagas não têm linhas.
+    """
+    __tablename__ = 'agenda_divida'
+    __table_args__ = (
+        db.Index('ix_agenda_divida_cliente', 'cliente_id'),
+    )
+
+    divida_id = db.Column(db.Integer, primary_key=True)
+    vencimento = db.Column(db.Date, primary_key=True)
+    cliente_id = db.Column(db.Integer, nullable=False)
+    valor = db.Column(db.Float, nullable=False)
+
+    def __repr__(self):
+        return f"<AgendaDivida #{self.divida_id} {self.vencimento}: R${self.valor:.2f}>"
+
+
+class SaldoVencimento(db.Model):
+    """Saldo em aberto de todas as dívidas por data de vencimento (soma de agenda_divida)"""
+    __tablename__ = 'saldo_vencimento'
+
+    vencimento = db.Column(db.Date, primary_key=True)
+    valor = db.Column(db.Float, nullable=False, default=0.0)
+
+    def __repr__(self):
+        return f"<SaldoVencimento {self.vencimento}: R${self.valor:.2f}>"
+
+
+class VersaoDado(db.Model):
+    """
+    Carimbo de versão de um conjunto de dados (ex.: 'clientes', 'cliente:12')
+
+    A versão é um instante em milissegundos (UTC), sempre crescente por
+    chave, gravado na mesma transação da escrita (ver web/versoes.py).
+    """
+    __tablename__ = 'versao_dado'
+
+    chave = db.Column(db.String(100), primary_key=True)
+    versao = db.Column(db.BigInteger, nullable=False)
+
+    def __repr__(self):
+        return f"<VersaoDado {self.chave} - {self.versao}>"
+
+
+class ResumoRecebiveis(db.Model):
+    """
+    Resumo global de recebíveis (linha única, id=1)
+
+    Mantido a cada escrita em dívidas/pagamentos para que os dashboards
+    leiam uma linha em vez de varrer as tabelas. Os campos de vencimento
+    são relativos a data_referencia, avançada uma vez por dia na leitura.
+    """
+    __tablename__ = 'resumo_recebiveis'
+
+    id = db.Column(db.Integer, primary_key=True)
+    data_referencia = db.Column(db.Date, nullable=False, default=date.today)  # Dia base dos vencimentos
+    total_a_receber = db.Column(db.Float, default=0.0)  # Saldo das dívidas não pagas
+    total_vencido = db.Column(db.Float, default=0.0)  # Saldo vencido (inclui o dia de referência)
+    total_vencido_anterior = db.Column(db.Float, default=0.0)  # Saldo vencido antes do dia de referência
+    qtd_pagas = db.Column(db.Integer, default=0)
+    qtd_vencidas = db.Column(db.Integer, default=0)  # Vencimento antes do dia de referência
+    qtd_abertas = db.Column(db.Integer, default=0)  # Vencimento a partir do dia de referência
+    # Contagens do gráfico de status
+    pagas_ct = db.Column(db.Integer, default=0)
+    em_dia_ct = db.Column(db.Integer, default=0)
+    renegociadas_ct = db.Column(db.Integer, default=0)
+    vencidas_ct = db.Column(db.Integer, default=0)
+
+    def __repr__(self):
+        return f"<ResumoRecebiveis {self.data_referencia} - A receber: R${self.total_a_receber:.2f}>"
+
+
+class ResumoMeioPagamento(db.Model):
+    """Quantidade de pagamentos por meio de pagamento (mantida a cada escrita)"""
+    __tablename__ = 'resumo_meio_pagamento'
+
+    meio = db.Column(db.String(50), primary_key=True)
+    quantidade = db.Column(db.Integer, nullable=False, default=0)
+    ordem = db.Column(db.Integer, nullable=False, default=0)  # Ordem de primeiro uso
+
+    def __repr__(self):
+        return f"<ResumoMeioPagamento {self.meio}: {self.quantidade}>"
@@ -0,0 +1,280 @@
+"""
+Movimento diário: vendas, pagamentos e renegociações somados por dia
+
+A tabela movimento_diario guarda quantidade e valor por (dia, tipo,
+meio, usuário):
+- venda: dívidas pela data da venda, valor original (sem meio/usuário;
+  a dívida não registra quem a lançou)
+- pagamento: pela data do pagamento, por meio e usuário responsável
+- renegociacao: pela data da renegociação, por usuário, saldo renegociado
+  (saldo da dívida já com os juros; renegociações anteriores à migração
+  v10 não guardam o saldo e contam só na quantidade)
+
+Manutenção:
+- inserções: triggers em divida, pagamento e renegociacao (migrações v8 e v10),
+  na mesma transação de qualquer escrita (ORM, lotes, importação)
+- exclusões (apagar dívida/cliente): removidos() subtrai antes dos
+  DELETEs, como o resumo de recebíveis
+- o arquivo (web/arquivo.py) só move linhas entre tabelas: o movimento
+  continua contando o histórico arquivado
+
+reconstruir() refaz a tabela a partir das tabelas principais e do
+arquivo (CLI: flask --app app movimento-reconstruir).
+
+relatorio() lê só esta tabela: um ano custa o mesmo que um mês
+(no máximo dias × meios × usuários linhas).
+"""
+
+from web.models import (
+    db, MovimentoDiario, Divida, Pagamento, Renegociacao,
+    DividaArquivo, PagamentoArquivo, RenegociacaoArquivo,
+)
+from datetime import date, timedelta
+from sqlalchemy import bindparam, delete, func, literal, select, update
+
+TIPOS = ('venda', 'pagamento', 'renegociacao')
+AGRUPAMENTOS = {
+    'dia': lambda dia: func.strftime('%Y-%m-%d', dia),
+    'semana': lambda dia: func.date(dia, '-6 days', 'weekday 1'),  # Segunda-feira da semana
+    'mes': lambda dia: func.strftime('%Y-%m-01', dia),
+}
+DETALHES = ('meio', 'usuario')
+DIAS_PADRAO = 30
+
+# Tabelas de cada tipo: (principais, arquivo), na ordem de TIPOS
+PRINCIPAIS = (Divida, Pagamento, Renegociacao)
+ARQUIVADAS = (DividaArquivo, PagamentoArquivo, RenegociacaoArquivo)
+
+
+class ParametroInvalido(ValueError):
+    """Parâmetro do relatório mal formado"""
+
+
+def _fatos(tipo, t):
+    """Expressões (dia, meio, usuario, valor) de um tipo na tabela `t`"""
+    c = t.c
+    if tipo == 'venda':
+        return c.data_venda, literal(''), literal(''), c.valor_original
+    if tipo == 'pagamento':
+        return (
+            c.data_pagamento,
+            func.coalesce(func.nullif(c.meio_pagamento, ''), 'Outro'),
+            func.coalesce(c.usuario_responsavel, ''),
+            c.valor,
+        )
+    return (
+        c.data_reneg,
+        literal(''),
+        func.coalesce(c.usuario_responsavel, ''),
+        func.coalesce(c.saldo_renegociado, 0.0),
+    )
+
+
+def _agregado(tipo, modelo, *filtro):
+    """SELECT dia, meio, usuario, quantidade, valor de um tipo, agrupado por dia/meio/usuário"""
+    dia, meio, usuario, valor = _fatos(tipo, modelo.__table__)
+    return select(dia, meio, usuario, func.count(), func.coalesce(func.sum(valor), 0.0))\
+        .where(dia.isnot(None), *filtro)\
+        .group_by(dia, meio, usuario)
+
+
+# ==================== MANUTENÇÃO ====================
+
+def criar_gatilhos(conn, tipos=TIPOS):
+    """Triggers que somam cada dívida, pagamento e renegociação nova ao movimento do dia"""
+    for tipo, modelo in zip(TIPOS, PRINCIPAIS):
+        if tipo not in tipos:
+            continue
+        tabela = modelo.__tablename__
+        novo = modelo.__table__.alias('new')
+        dia, meio, usuario, valor = (
+            str(e.compile(dialect=conn.dialect, compile_kwargs={'literal_binds': True}))
+            for e in _fatos(tipo, novo)
+        )
+        conn.execute(db.text(f"""
+            CREATE TRIGGER IF NOT EXISTS {tabela}_movimento_ai AFTER INSERT ON {tabela}
+            WHEN {dia} IS NOT NULL BEGIN
+                INSERT INTO movimento_diario (dia, tipo, meio, usuario, quantidade, valor)
+                VALUES ({dia}, '{tipo}', {meio}, {usuario}, 1, {valor})
+                ON CONFLICT (dia, tipo, meio, usuario) DO UPDATE SET
+                    quantidade = quantidade + 1, valor = valor + excluded.valor;
+            END
+        """))
+
+
+def removidos(modelos, ids):
+    """
+    Retira do movimento as dívidas `ids` (subconsulta) e seus pagamentos e
+    renegociações, que serão apagados
+
+    Deve ser chamado antes dos DELETEs.
+
+    Args:
+        modelos: PRINCIPAIS ou ARQUIVADAS
+    """
+    linhas = []
+    for tipo, modelo in zip(TIPOS, modelos):
+        chave = modelo.id if tipo == 'venda' else modelo.divida_id
+        for dia, meio, usuario, qtd, valor in db.session.execute(_agregado(tipo, modelo, chave.in_(ids))):
+            linhas.append({'_dia': dia, '_tipo': tipo, '_meio': meio, '_usuario': usuario,
+                           '_qtd': qtd, '_valor': valor})
+    if not linhas:
+        return
+    db.session.execute(
+        update(MovimentoDiario.__table__)
+        .where(
+            MovimentoDiario.dia == bindparam('_dia'), MovimentoDiario.tipo == bindparam('_tipo'),
+            MovimentoDiario.meio == bindparam('_meio'), MovimentoDiario.usuario == bindparam('_usuario'),
+        )
+        .values(
+            quantidade=MovimentoDiario.quantidade - bindparam('_qtd'),
+            valor=MovimentoDiario.valor - bindparam('_valor'),
+        ),
+        linhas,
+    )
+    db.session.execute(delete(MovimentoDiario).where(MovimentoDiario.quantidade <= 0))
+
+
+def calcular(conn=None):
+    """Movimento calculado das tabelas principais e do arquivo: {(dia, tipo, meio, usuario): [qtd, valor]}"""
+    conn = conn or db.session
+    totais = {}
+    for modelos in (PRINCIPAIS, ARQUIVADAS):
+        for tipo, modelo in zip(TIPOS, modelos):
+            for dia, meio, usuario, qtd, valor in conn.execute(_agregado(tipo, modelo)):
+                atual = totais.setdefault((dia, tipo, meio, usuario), [0, 0.0])
+                atual[0] += qtd
+                atual[1] += valor
+    return totais
+
+
+def reconstruir(conn=None, tolerancia=0.005):
+    """
+    Recalcula o movimento do zero e substitui a tabela (sem commit)
+
+    Returns:
+        lista de divergências ((dia, tipo, meio, usuario), mantido, recalculado)
+    """
+    conn = conn or db.session
+    novos = calcular(conn)
+    t = MovimentoDiario.__table__
+    mantidos = {
+        (dia, tipo, meio, usuario): (qtd, valor)
+        for dia, tipo, meio, usuario, qtd, valor in conn.execute(
+            select(t.c.dia, t.c.tipo, t.c.meio, t.c.usuario, t.c.quantidade, t.c.valor))
+    }
+
+    divergencias = []
+    for chave in sorted(set(novos) | set(mantidos), key=str):
+        qtd, valor = mantidos.get(chave, (0, 0.0))
+        nova_qtd, novo_valor = novos.get(chave, (0, 0.0))
+        if qtd != nova_qtd or abs(valor - novo_valor) > tolerancia:
+            divergencias.append((chave, (qtd, valor), (nova_qtd, novo_valor)))
+
+    conn.execute(delete(t))
+    if novos:
+        conn.execute(t.insert(), [
+            {'dia': dia, 'tipo': tipo, 'meio': meio, 'usuario': usuario, 'quantidade': qtd, 'valor': valor}
+            for (dia, tipo, meio, usuario), (qtd, valor) in novos.items()
+        ])
+    return divergencias
+
+
+# ==================== RELATÓRIO ====================
+
+def _data(valor, nome):
+    if not valor:
+        return None
+    try:
+        return date.fromisoformat(valor)
+    except ValueError:
+        raise ParametroInvalido(f'{nome}: data inválida (use AAAA-MM-DD).')
+
+
+def parametros(args, hoje=None):
+    """
+    Lê e valida os parâmetros do relatório (query string)
+
+    - inicio, fim: intervalo (padrão: últimos DIAS_PADRAO dias até hoje)
+    - agrupar: dia, semana ou mes (padrão: dia)
+    - por: meio ou usuario (opcional)
+    """
+    hoje = hoje or date.today()
+    fim = _data(args.get('fim'), 'fim') or hoje
+    inicio = _data(args.get('inicio'), 'inicio') or fim - timedelta(days=DIAS_PADRAO - 1)
+    if inicio > fim:
+        raise ParametroInvalido('inicio deve ser anterior a fim.')
+    agrupar = args.get('agrupar') or 'dia'
+    if agrupar not in AGRUPAMENTOS:
+        raise ParametroInvalido(f"agrupar: use {', '.join(AGRUPAMENTOS)}.")
+    por = args.get('por') or None
+    if por is not None and por not in DETALHES:
+        raise ParametroInvalido(f"por: use {', '.join(DETALHES)}.")
+    return {'inicio': inicio, 'fim': fim, 'agrupar': agrupar, 'por': por}
+
+
+def relatorio(inicio, fim, agrupar='dia', por=None):
+    """
+    Vendido, recebido e renegociado por período entre `inicio` e `fim`
+
+    Returns:
+        dict com os parâmetros e 'periodos': lista (por período, em ordem) de
+        {periodo, vendido, vendas, recebido, pagamentos, renegociado,
+        renegociacoes} e, com `por`, 'detalhe': a mesma divisão por meio ou
+        usuário (pagamentos e renegociações; vendas não têm meio nem usuário)
+    """
+    periodo = AGRUPAMENTOS[agrupar](MovimentoDiario.dia).label('periodo')
+    colunas = [periodo, MovimentoDiario.tipo]
+    if por:
+        colunas.append(getattr(MovimentoDiario, por))
+    rows = db.session.execute(
+        select(*colunas, func.sum(MovimentoDiario.quantidade), func.sum(MovimentoDiario.valor))
+        .where(MovimentoDiario.dia.between(inicio, fim))
+        .group_by(*colunas)
+        .order_by(*colunas)
+    ).all()
+
+    periodos = {}
+    for row in rows:
+        rotulo, tipo = row[0], row[1]
+        qtd, valor = int(row[-2] or 0), round(float(row[-1] or 0), 2)
+        item = periodos.setdefault(rotulo, {
+            'periodo': rotulo, 'vendido': 0.0, 'vendas': 0,
+            'recebido': 0.0, 'pagamentos': 0, 'renegociado': 0.0, 'renegociacoes': 0,
+        })
+        if tipo == 'venda':
+            item['vendido'] = round(item['vendido'] + valor, 2)
+            item['vendas'] += qtd
+        elif tipo == 'pagamento':
+            item['recebido'] = round(item['recebido'] + valor, 2)
+            item['pagamentos'] += qtd
+        else:
+            item['renegociado'] = round(item['renegociado'] + valor, 2)
+            item['renegociacoes'] += qtd
+
+        if por and tipo != 'venda':
+            detalhe = item.setdefault('detalhe', {})
+            nome = row[2] or None
+            parte = detalhe.setdefault(nome, {
+                por: nome, 'recebido': 0.0, 'pagamentos': 0, 'renegociado': 0.0, 'renegociacoes': 0,
+            })
+            if tipo == 'pagamento':
+                parte['recebido'] = round(parte['recebido'] + valor, 2)
+                parte['pagamentos'] += qtd
+            else:
+                parte['renegociado'] = round(parte['renegociado'] + valor, 2)
+                parte['renegociacoes'] += qtd
+
+    for item in periodos.values():
+        if 'detalhe' in item:
+            item['detalhe'] = list(item['detalhe'].values())
+        elif por:
+            item['detalhe'] = []
+
+    return {
+        'inicio': inicio.isoformat(),
+        'fim': fim.isoformat(),
+        'agrupar': agrupar,
+        'por': por,
+        'periodos': list(periodos.values()),
+    }
@@ -0,0 +1,408 @@
+"""
+Pagamentos em lote e por cliente do SGM
+
+Usado no fechamento do caixa para lançar de uma vez os recebimentos do dia
+(Pix, cartão...). O lote inteiro é validado antes de gravar qualquer coisa
+e depois aplicado em uma única transação:
+
+- 1 SELECT para as dívidas e 1 para as parcelas envolvidas
+- UPDATEs em lote por chave primária em divida e parcela
+- 1 INSERT em lote (executemany) na tabela pagamento
+- 1 UPDATE no resumo de recebíveis e 1 por meio de pagamento
+
+A alocação por cliente (alocar) distribui um valor recebido entre as
+dívidas e parcelas abertas do cliente, na ordem de uma política, e grava
+as partes pelo mesmo caminho em lote.
+
+As regras são as mesmas dos formulários de pagamento: a parcela aceita até
+o restante com margem de 1 centavo e é quitada quando falta menos de
+1 centavo; a dívida é quitada quando o saldo chega a zero.
+"""
+
+from web.models import db, Divida, Pagamento, Parcela
+from web import resumo, metricas, cache
+from collections import Counter
+from datetime import date
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import selectinload
+
+LOTE_MAXIMO = 1000
+TOLERANCIA = 0.01  # 1 centavo, como em novo_pagamento
+
+
+class ErroLote(ValueError):
+    """Lote mal formado (não é uma lista ou passa do limite)"""
+
+
+def _numero(valor):
+    """Converte para float positivo (None se inválido)"""
+    try:
+        valor = round(float(valor), 2)
+    except (TypeError, ValueError):
+        return None
+    return valor if valor > 0 else None
+
+
+def _data(valor, hoje):
+    """Data do pagamento: ISO (AAAA-MM-DD), não futura; padrão hoje"""
+    if not valor:
+        return hoje
+    try:
+        data = date.fromisoformat(str(valor))
+    except ValueError:
+        return None
+    return data if data <= hoje else None
+
+
+def _id(valor):
+    try:
+        return int(valor) if valor not in (None, '') else None
+    except (TypeError, ValueError):
+        return None
+
+
+def validar(itens, usuario_padrao, hoje=None):
+    """
+    Valida um lote sem gravar nada
+
+    Valores de vários itens na mesma dívida/parcela são acumulados, então
+    o lote inteiro precisa caber no saldo.
+
+    Args:
+        itens: lista de dicts com divida_id, parcela_id (opcional), valor,
+            meio, usuario (opcional) e data (opcional, ISO)
+        usuario_padrao: usuário dos itens sem 'usuario'
+
+    Returns:
+        (operacoes, resultados): operações válidas prontas para aplicar()
+        e um resultado por item ({'indice', 'ok', 'erro'?})
+    """
+    hoje = hoje or date.today()
+    if not isinstance(itens, list):
+        raise ErroLote('Envie uma lista de pagamentos.')
+    if len(itens) > LOTE_MAXIMO:
+        raise ErroLote(f'Lote com {len(itens)} itens; o máximo é {LOTE_MAXIMO}.')
+
+    itens = [i if isinstance(i, dict) else {} for i in itens]
+    divida_ids = {d for d in (_id(i.get('divida_id')) for i in itens) if d}
+    parcela_ids = {p for p in (_id(i.get('parcela_id')) for i in itens) if p}
+    dividas = {d.id: d for d in Divida.query.filter(Divida.id.in_(divida_ids))} if divida_ids else {}
+    parcelas = {p.id: p for p in Parcela.query.filter(Parcela.id.in_(parcela_ids))} if parcela_ids else {}
+
+    # Saldos restantes considerando os itens anteriores do lote
+    saldo_divida = {d.id: d.saldo_devedor for d in dividas.values()}
+    restante_parcela = {p.id: p.valor_parcela - p.valor_pago for p in parcelas.values()}
+
+    operacoes, resultados = [], []
+    for indice, item in enumerate(itens):
+        divida_id = _id(item.get('divida_id'))
+        parcela_id = _id(item.get('parcela_id'))
+        valor = _numero(item.get('valor'))
+        data = _data(item.get('data'), hoje)
+        divida = dividas.get(divida_id)
+        parcela = parcelas.get(parcela_id) if parcela_id else None
+
+        erro = None
+        if divida is None:
+            erro = 'Dívida não encontrada.'
+        elif valor is None:
+            erro = 'Valor inválido.'
+        elif data is None:
+            erro = 'Data inválida (use AAAA-MM-DD, até hoje).'
+        elif divida.status == 'Paga' or saldo_divida[divida_id] <= 0:
+            erro = 'Dívida já está paga.'
+        elif parcela_id and (parcela is None or parcela.divida_id != divida_id):
+            erro = 'Parcela não pertence à dívida.'
+        elif parcela is not None and parcela.status == 'Paga':
+            erro = 'Parcela já está paga.'
+        elif parcela is not None and valor > restante_parcela[parcela_id] + TOLERANCIA:
+            erro = f'Valor excede o restante da parcela (R$ {restante_parcela[parcela_id]:.2f}).'
+        elif valor > saldo_divida[divida_id] + TOLERANCIA:
+            erro = f'Valor excede o saldo da dívida (R$ {saldo_divida[divida_id]:.2f}).'
+
+        if erro:
+            resultados.append({'indice': indice, 'ok': False, 'erro': erro})
+            continue
+
+        saldo_divida[divida_id] -= valor
+        if parcela is not None:
+            restante_parcela[parcela_id] -= min(valor, restante_parcela[parcela_id])
+        operacoes.append({
+            'indice': indice,
+            'divida': divida,
+            'parcela': parcela,
+            'valor': valor,
+            'meio': (item.get('meio') or '').strip() or None,
+            'usuario': (item.get('usuario') or '').strip() or usuario_padrao,
+            'data': data,
+        })
+        resultados.append({'indice': indice, 'ok': True})
+    return operacoes, resultados
+
+
+def planejar(operacoes):
+    """
+    Calcula em memória o efeito de operações já validadas (não grava nada)
+
+    Usado tanto na simulação quanto por aplicar(), que grava o resultado.
+
+    Args:
+        operacoes: lista de dicts com divida, parcela (ou None), valor,
+            meio, usuario e data
+
+    Returns:
+        (resultado, dividas, parcelas, estados_antes): resultado é um dict
+        indice -> {'divida_id', 'saldo_divida', 'status_divida',
+        'parcela_id'?, 'status_parcela'?}; dividas e parcelas trazem o
+        estado final de cada linha alterada, por id
+    """
+    # Estado de cada dívida/parcela, atualizado item a item
+    dividas, parcelas, estados_antes = {}, {}, {}
+    for op in operacoes:
+        d = op['divida']
+        if d.id not in dividas:
+            estados_antes[d.id] = resumo.estado_divida(d)
+            dividas[d.id] = {'id': d.id, 'saldo_devedor': d.saldo_devedor, 'status': d.status,
+                             'data_vencimento': d.data_vencimento, 'objeto': d}
+        p = op['parcela']
+        if p is not None and p.id not in parcelas:
+            parcelas[p.id] = {'id': p.id, 'valor_pago': p.valor_pago, 'status': p.status,
+                              'valor_parcela': p.valor_parcela, 'objeto': p}
+
+    resultado = {}
+    for op in operacoes:
+        divida = dividas[op['divida'].id]
+        item = {'divida_id': divida['id']}
+        if op['parcela'] is not None:
+            # Mesma regra de novo_pagamento: quita a parcela com margem de 1 centavo
+            parcela = parcelas[op['parcela'].id]
+            restante = parcela['valor_parcela'] - parcela['valor_pago']
+            parcela['valor_pago'] += min(op['valor'], restante)
+            if parcela['valor_pago'] >= parcela['valor_parcela'] - TOLERANCIA:
+                parcela['status'] = 'Paga'
+                parcela['valor_pago'] = parcela['valor_parcela']
+            item.update(parcela_id=parcela['id'], status_parcela=parcela['status'])
+        # Mesma regra de Divida.aplicar_pagamento
+        divida['saldo_devedor'] -= op['valor']
+        if divida['saldo_devedor'] <= 0:
+            divida['saldo_devedor'] = 0.0
+            divida['status'] = 'Paga'
+        item.update(saldo_divida=round(divida['saldo_devedor'], 2), status_divida=divida['status'])
+        resultado[op['indice']] = item
+    return resultado, dividas, parcelas, estados_antes
+
+
+def aplicar(operacoes):
+    """
+    Grava operações já validadas (sem commit)
+
+    Args:
+        operacoes: lista de dicts com divida, parcela (ou None), valor,
+            meio, usuario e data
+
+    Returns:
+        dict indice -> resultado de planejar() mais o 'pagamento_id'
+    """
+    if not operacoes:
+        return {}
+
+    resultado, dividas, parcelas, estados_antes = planejar(operacoes)
+
+    # UPDATE em lote por chave primária (executemany); a partir daqui a
+    # transação tem o lock de escrita do SQLite
+    db.session.execute(update(Divida), [
+        {'id': d['id'], 'saldo_devedor': d['saldo_devedor'], 'status': d['status']}
+        for d in dividas.values()
+    ])
+    if parcelas:
+        db.session.execute(update(Parcela), [
+            {'id': p['id'], 'valor_pago': p['valor_pago'], 'status': p['status']}
+            for p in parcelas.values()
+        ])
+
+    # INSERT em lote (um executemany); com o lock de escrita, os ids novos
+    # são os maiores que o máximo atual, na ordem das linhas
+    linhas = [{
+        'divida_id': op['divida'].id,
+        'valor': op['valor'],
+        'data_pagamento': op['data'],
+        'meio_pagamento': op['meio'],
+        'usuario_responsavel': op['usuario'],
+    } for op in operacoes]
+    ultimo_id = db.session.query(func.coalesce(func.max(Pagamento.id), 0)).scalar()
+    db.session.execute(Pagamento.__table__.insert(), linhas)
+    ids = db.session.scalars(
+        select(Pagamento.id).where(Pagamento.id > ultimo_id).order_by(Pagamento.id)
+    ).all()
+    for op, pagamento_id in zip(operacoes, ids):
+        resultado[op['indice']]['pagamento_id'] = pagamento_id
+
+    resumo.dividas_alteradas([
+        (estados_antes[d['id']], (d['status'] or 'Pendente', d['saldo_devedor'], d['data_vencimento']))
+        for d in dividas.values()
+    ])
+    resumo.meios_alterados(Counter(op['meio'] for op in operacoes))
+    metricas.pagamentos_inseridos(linhas)
+    cache.invalidar('dashboard', *{f"cliente:{d['objeto'].cliente_id}" for d in dividas.values()})
+
+    # Objetos carregados na sessão passam a ler os valores novos do banco
+    for registro in list(dividas.values()) + list(parcelas.values()):
+        db.session.expire(registro['objeto'])
+    return resultado
+
+
+def registrar_lote(itens, usuario_padrao, parcial=False):
+    """
+    Valida e aplica um lote de pagamentos (sem commit)
+
+    Args:
+        itens: lista de pagamentos (ver validar)
+        usuario_padrao: usuário dos itens sem 'usuario'
+        parcial: se True, aplica os itens válidos mesmo com erros em outros;
+            se False (padrão), qualquer erro cancela o lote inteiro
+
+    Returns:
+        (aplicado, resultados) com um resultado por item
+    """
+    operacoes, resultados = validar(itens, usuario_padrao)
+    erros = any(not r['ok'] for r in resultados)
+    if erros and not parcial:
+        for r in resultados:
+            if r['ok']:
+                r['ok'] = False
+                r['erro'] = 'Não aplicado: há erros em outros itens do lote.'
+        return False, resultados
+
+    aplicados = aplicar(operacoes)
+    for r in resultados:
+        if r['indice'] in aplicados:
+            r.update(aplicados[r['indice']])
+    return bool(operacoes), resultados
+
+
+# ==================== ALOCAÇÃO POR CLIENTE ====================
+
+POLITICAS = {
+    'vencimento': 'Vencimento mais antigo primeiro',
+    'juros': 'Maior juros primeiro',
+}
+
+
+def _juros(divida):
+    """Taxa usada na política 'juros': parcelamento ou a maior renegociação"""
+    taxas = [divida.juros_parcelamento or 0.0] + [r.juros_percent or 0.0 for r in divida.renegociacoes]
+    return max(taxas)
+
+
+def _unidades_abertas(cliente_id):
+    """
+    O que pode receber pagamento: cada parcela aberta de dívidas parceladas
+    e cada dívida não parcelada com saldo (2 consultas)
+
+    Em dívidas parceladas, o saldo que as parcelas não cobrem (juros de uma
+    renegociação, por exemplo) vira uma unidade da própria dívida, depois
+    da última parcela.
+    """
+    dividas = Divida.query.options(selectinload(Divida.renegociacoes), selectinload(Divida.parcelas))\
+        .filter(Divida.cliente_id == cliente_id, Divida.status != 'Paga', Divida.saldo_devedor > 0)\
+        .order_by(Divida.id).all()
+
+    unidades = []
+    for d in dividas:
+        parcelas = [p for p in d.parcelas if p.status != 'Paga'] if d.parcelado else []
+        sem_parcela = d.saldo_devedor
+        for p in sorted(parcelas, key=lambda p: p.numero_parcela):
+            restante = round(p.valor_parcela - p.valor_pago, 2)
+            sem_parcela -= restante
+            unidades.append({'divida': d, 'parcela': p, 'vencimento': p.data_vencimento,
+                             'restante': restante})
+        if not parcelas or sem_parcela >= TOLERANCIA:
+            vencimento = max([d.data_vencimento] + [p.data_vencimento for p in parcelas])
+            unidades.append({'divida': d, 'parcela': None, 'vencimento': vencimento,
+                             'restante': round(sem_parcela, 2)})
+    return unidades
+
+
+def alocar(cliente_id, valor, politica='vencimento', meio=None, usuario=None, hoje=None, simular=False):
+    """
+    Distribui um pagamento do cliente entre suas dívidas/parcelas abertas
+
+    A ordem segue a política escolhida; cada dívida ou parcela recebe até
+    o que falta nela (com a margem de 1 centavo de novo_pagamento) antes de
+    passar para a próxima. Cada parte vira um pagamento e tudo é gravado
+    com aplicar() (sem commit); com `simular`, as partes são só calculadas
+    com planejar() e nada é gravado.
+
+    Args:
+        cliente_id: cliente que está pagando
+        valor: valor total recebido
+        politica: 'vencimento' (mais antigo primeiro) ou 'juros' (maior juros primeiro)
+        simular: calcula a distribuição sem gravar
+
+    Returns:
+        dict com 'alocado', 'nao_alocado' (sobra de até 1 centavo) e 'partes':
+        [{'divida_id', 'parcela_id', 'vencimento', 'valor', 'pagamento_id'
+        (sem simular), 'saldo_divida', 'status_divida', 'status_parcela'?}]
+
+    Raises:
+        ErroLote: valor inválido, política desconhecida, valor acima do
+            total em aberto ou que não coube nas dívidas (nada é gravado)
+    """
+    hoje = hoje or date.today()
+    valor = _numero(valor)
+    if valor is None:
+        raise ErroLote('Valor inválido.')
+    if politica not in POLITICAS:
+        raise ErroLote(f"Política desconhecida: {politica} (opções: {', '.join(POLITICAS)}).")
+
+    unidades = _unidades_abertas(cliente_id)
+    if politica == 'juros':
+        unidades.sort(key=lambda u: (-_juros(u['divida']), u['vencimento'], u['divida'].id))
+    else:
+        unidades.sort(key=lambda u: (u['vencimento'], u['divida'].id))
+
+    # Parcelas de uma dívida não podem somar mais que o saldo dela
+    saldo_divida = {u['divida'].id: u['divida'].saldo_devedor for u in unidades}
+    total_aberto = round(sum(saldo_divida.values()), 2)
+    if valor > total_aberto + TOLERANCIA:
+        raise ErroLote(f'Valor excede o total em aberto do cliente (R$ {total_aberto:.2f}).')
+
+    restante = valor
+    operacoes = []
+    for u in unidades:
+        if restante < TOLERANCIA:
+            break
+        divida = u['divida']
+        limite = min(u['restante'], saldo_divida[divida.id])
+        if limite <= 0:
+            continue
+        # Se faltar menos de 1 centavo, aplicar() já marca a parcela como paga
+        parte = round(min(limite, restante), 2)
+        saldo_divida[divida.id] -= parte
+        restante = round(restante - parte, 2)
+        operacoes.append({
+            'indice': len(operacoes),
+            'divida': divida,
+            'parcela': u['parcela'],
+            'valor': parte,
+            'meio': meio,
+            'usuario': usuario,
+            'data': hoje,
+            'vencimento': u['vencimento'],
+        })
+
+    if restante >= TOLERANCIA:
+        raise ErroLote(f'Não foi possível alocar R$ {restante:.2f} nas dívidas do cliente.')
+
+    aplicados = planejar(operacoes)[0] if simular else aplicar(operacoes)
+    partes = []
+    for op in operacoes:
+        parte = {'valor': op['valor'], 'vencimento': op['vencimento'].isoformat(),
+                 'parcela_id': None}
+        parte.update(aplicados[op['indice']])
+        partes.append(parte)
+    return {
+        'partes': partes,
+        'alocado': round(valor - restante, 2),
+        'nao_alocado': restante,
+    }
@@ -0,0 +1,142 @@
+"""
+Paginação por cursor (keyset) do SGM
+
+Em vez de OFFSET, cada página continua a partir dos valores da chave de
+ordenação do último item exibido: WHERE (nome, id) > (:nome, :id).
+Com um índice na chave, o custo de qualquer página é o mesmo, seja a
+primeira ou a milésima.
+
+O cursor é opaco para o cliente: os valores da chave em JSON, codificados
+em base64 para ir na URL.
+"""
+
+from flask import current_app, request
+from sqlalchemy import tuple_
+from datetime import date, datetime
+import base64
+import json
+
+TAMANHO_PADRAO = 50
+TAMANHO_MAXIMO = 200
+
+
+class Pagina:
+    """Uma página de resultados e os cursores para as páginas vizinhas"""
+
+    def __init__(self, itens, proximo=None, anterior=None, tamanho=TAMANHO_PADRAO):
+        self.itens = itens
+        self.proximo = proximo  # Cursor para a próxima página (None se for a última)
+        self.anterior = anterior  # Cursor para a página anterior (None se for a primeira)
+        self.tamanho = tamanho
+
+    def __iter__(self):
+        return iter(self.itens)
+
+    def __len__(self):
+        return len(self.itens)
+
+
+def _para_json(valor):
+    """Converte valores da chave para algo serializável"""
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    return valor
+
+
+def _de_json(valor, coluna):
+    """Converte de volta conforme o tipo da coluna"""
+    if valor is None:
+        return None
+    tipo = coluna.type.python_type
+    if tipo is datetime:
+        return datetime.fromisoformat(valor)
+    if tipo is date:
+        return date.fromisoformat(valor)
+    return tipo(valor)
+
+
+def codificar_cursor(valores):
+    """Codifica os valores da chave de ordenação em um cursor para a URL"""
+    dados = json.dumps([_para_json(v) for v in valores], separators=(',', ':'))
+    return base64.urlsafe_b64encode(dados.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(cursor, chaves):
+    """Decodifica um cursor; retorna None se estiver inválido"""
+    try:
+        dados = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        valores = json.loads(dados.decode('utf-8'))
+        if len(valores) != len(chaves):
+            return None
+        return [_de_json(v, c) for v, c in zip(valores, chaves)]
+    except (ValueError, TypeError, json.JSONDecodeError):
+        return None
+
+
+def tamanho_pagina(valor=None):
+    """Tamanho de página pedido, limitado ao máximo (padrão: ITENS_POR_PAGINA)"""
+    padrao = current_app.config.get('ITENS_POR_PAGINA', TAMANHO_PADRAO)
+    if not valor:
+        return padrao
+    return max(1, min(valor, TAMANHO_MAXIMO))
+
+
+def paginar(consulta, chaves, apos=None, antes=None, tamanho=None, valores_item=None):
+    """
+    Pagina uma consulta por cursor
+
+    Args:
+        consulta: query já filtrada (sem order_by)
+        chaves: colunas da ordenação, crescente; a última deve ser única (ex.: id)
+        apos: cursor para buscar a página seguinte
+        antes: cursor para buscar a página anterior
+        tamanho: itens por página
+        valores_item: função que extrai os valores das chaves de um item
+            (padrão: atributos com o mesmo nome das colunas)
+
+    Returns:
+        Pagina com os itens e os cursores proximo/anterior
+    """
+    tamanho = tamanho or tamanho_pagina()
+    if valores_item is None:
+        valores_item = lambda item: [getattr(item, c.key) for c in chaves]
+
+    chave = tuple_(*chaves)
+    valores_apos = decodificar_cursor(apos, chaves) if apos else None
+    valores_antes = decodificar_cursor(antes, chaves) if antes else None
+
+    if valores_antes is not None:
+        # Página anterior: busca em ordem inversa e desfaz a inversão
+        itens = consulta.filter(chave < tuple_(*valores_antes))\
+                        .order_by(*[c.desc() for c in chaves])\
+                        .limit(tamanho + 1).all()
+        tem_mais = len(itens) > tamanho
+        itens = list(reversed(itens[:tamanho]))
+        anterior = codificar_cursor(valores_item(itens[0])) if tem_mais and itens else None
+        proximo = codificar_cursor(valores_item(itens[-1])) if itens else None
+        return Pagina(itens, proximo, anterior, tamanho)
+
+    if valores_apos is not None:
+        consulta = consulta.filter(chave > tuple_(*valores_apos))
+    itens = consulta.order_by(*chaves).limit(tamanho + 1).all()
+    tem_mais = len(itens) > tamanho
+    itens = itens[:tamanho]
+    proximo = codificar_cursor(valores_item(itens[-1])) if tem_mais and itens else None
+    anterior = codificar_cursor(valores_item(itens[0])) if valores_apos is not None and itens else None
+    return Pagina(itens, proximo, anterior, tamanho)
+
+
+def paginar_request(consulta, chaves, prefixo='', valores_item=None):
+    """
+    Pagina usando os parâmetros da requisição atual
+
+    Lê `<prefixo>apos`, `<prefixo>antes` e `tamanho` da query string.
+    """
+    return paginar(
+        consulta,
+        chaves,
+        apos=request.args.get(f'{prefixo}apos'),
+        antes=request.args.get(f'{prefixo}antes'),
+        tamanho=tamanho_pagina(request.args.get('tamanho', type=int)),
+        valores_item=valores_item,
+    )
@@ -0,0 +1,327 @@
+"""
+Resumo de recebíveis mantido incrementalmente
+
+Cada escrita que altera uma dívida informa o estado anterior e o novo
+(status, saldo, vencimento); a diferença das contribuições é somada à
+linha de ResumoRecebiveis na mesma transação. Assim os dashboards leem
+uma única linha, independente do tamanho do histórico.
+
+Os campos de vencimento dependem do dia: a linha guarda a data de
+referência, e avancar() reavalia só as dívidas abertas com vencimento
+entre a referência antiga e hoje. Quem avança é a tarefa diária de
+vencimentos (web/vencimentos.py) e o preparar-banco; até ela rodar,
+obter() aplica a mesma diferença em memória. As leituras nunca gravam.
+"""
+
+from web.models import db, Divida, DividaArquivo, Pagamento, ResumoRecebiveis, ResumoMeioPagamento
+from datetime import date
+from sqlalchemy import func, update
+
+RESUMO_ID = 1
+
+CONTADORES = (
+    'total_a_receber', 'total_vencido', 'total_vencido_anterior',
+    'qtd_pagas', 'qtd_vencidas', 'qtd_abertas',
+    'pagas_ct', 'em_dia_ct', 'renegociadas_ct', 'vencidas_ct',
+)
+
+
+def estado_divida(divida):
+    """Estado de uma dívida relevante para o resumo: (status, saldo, vencimento)"""
+    return (divida.status or 'Pendente', divida.saldo_devedor or 0.0, divida.data_vencimento)
+
+
+def contribuicao(estado, ref):
+    """Quanto uma dívida soma em cada contador, considerando o dia `ref`"""
+    c = dict.fromkeys(CONTADORES, 0)
+    if estado is None:
+        return c
+    status, saldo, venc = estado
+
+    if status == 'Paga':
+        c['qtd_pagas'] = 1
+    else:
+        c['total_a_receber'] = saldo
+        if venc <= ref:
+            c['total_vencido'] = saldo
+        if venc < ref:
+            c['total_vencido_anterior'] = saldo
+            c['qtd_vencidas'] = 1
+        else:
+            c['qtd_abertas'] = 1
+
+    # Mesma prioridade do gráfico de status: paga > vencida > renegociada > em dia
+    if status == 'Paga' or saldo <= 0:
+        c['pagas_ct'] = 1
+    elif venc <= ref:
+        c['vencidas_ct'] = 1
+    elif status == 'Renegociada':
+        c['renegociadas_ct'] = 1
+    else:
+        c['em_dia_ct'] = 1
+    return c
+
+
+def _somar_deltas(total, antes, depois, ref_antes, ref_depois):
+    """Acumula em `total` a diferença de contribuição entre dois estados"""
+    novo = contribuicao(depois, ref_depois)
+    velho = contribuicao(antes, ref_antes)
+    for k in CONTADORES:
+        total[k] += novo[k] - velho[k]
+
+
+def _incrementos(delta):
+    """Expressões `coluna = coluna + delta` para um UPDATE no resumo"""
+    return {
+        getattr(ResumoRecebiveis, k): getattr(ResumoRecebiveis, k) + v
+        for k, v in delta.items() if v
+    }
+
+
+def _aplicar(delta):
+    """Soma os deltas na linha do resumo com um único UPDATE"""
+    valores = _incrementos(delta)
+    if valores:
+        db.session.execute(
+            update(ResumoRecebiveis).where(ResumoRecebiveis.id == RESUMO_ID).values(valores)
+        )
+
+
+def _referencia():
+    """Data de referência atual do resumo (None se ainda não foi criado)"""
+    return db.session.query(ResumoRecebiveis.data_referencia)\
+        .filter(ResumoRecebiveis.id == RESUMO_ID).scalar()
+
+
+# ==================== ESCRITAS ====================
+
+def divida_alterada(antes, depois):
+    """
+    Registra a mudança de uma dívida no resumo
+
+    Args:
+        antes: estado anterior (None para dívida nova)
+        depois: estado novo (None para dívida removida)
+    """
+    ref = _referencia()
+    if ref is None:
+        # Resumo ainda não existe: será reconstruído na próxima leitura
+        return
+    delta = dict.fromkeys(CONTADORES, 0)
+    _somar_deltas(delta, antes, depois, ref, ref)
+    _aplicar(delta)
+
+
+def dividas_alteradas(mudancas):
+    """
+    Registra várias mudanças de dívidas com um único UPDATE no resumo
+
+    Args:
+        mudancas: lista de (antes, depois), como em divida_alterada
+    """
+    ref = _referencia()
+    if ref is None:
+        return
+    delta = dict.fromkeys(CONTADORES, 0)
+    for antes, depois in mudancas:
+        _somar_deltas(delta, antes, depois, ref, ref)
+    _aplicar(delta)
+
+
+def meios_alterados(contagem):
+    """Soma quantidades de pagamentos por meio ({meio: delta})"""
+    for meio, qtd in contagem.items():
+        meio = meio or 'Outro'
+        if not qtd:
+            continue
+        atualizados = db.session.execute(
+            update(ResumoMeioPagamento)
+            .where(ResumoMeioPagamento.meio == meio)
+            .values(quantidade=ResumoMeioPagamento.quantidade + qtd)
+        ).rowcount
+        if not atualizados and qtd > 0:
+            ordem = db.session.query(func.coalesce(func.max(ResumoMeioPagamento.ordem), 0)).scalar()
+            db.session.add(ResumoMeioPagamento(meio=meio, quantidade=qtd, ordem=ordem + 1))
+            db.session.flush()
+
+
+def pagamento_registrado(pagamento):
+    """Conta um novo pagamento no resumo por meio"""
+    meios_alterados({pagamento.meio_pagamento: 1})
+
+
+def dividas_removidas(dividas):
+    """
+    Retira do resumo as dívidas (e seus pagamentos) que serão apagadas
+
+    Deve ser chamado antes dos DELETEs.
+
+    Args:
+        dividas: query de Divida com as dívidas a remover
+    """
+    ref = _referencia()
+    if ref is not None:
+        delta = dict.fromkeys(CONTADORES, 0)
+        estados = dividas.with_entities(Divida.status, Divida.saldo_devedor, Divida.data_vencimento)
+        for status, saldo, venc in estados:
+            _somar_deltas(delta, (status or 'Pendente', saldo or 0.0, venc), None, ref, ref)
+        _aplicar(delta)
+
+    meio = func.coalesce(func.nullif(Pagamento.meio_pagamento, ''), 'Outro')
+    ids = dividas.with_entities(Divida.id).scalar_subquery()
+    rows = db.session.query(meio, func.count(Pagamento.id))\
+        .filter(Pagamento.divida_id.in_(ids))\
+        .group_by(meio).all()
+    meios_alterados({m: -ct for m, ct in rows})
+
+
+# ==================== LEITURA ====================
+
+def _delta_do_dia(ref, hoje):
+    """Diferença dos contadores de `ref` para `hoje`: só as dívidas abertas com vencimento entre as duas datas"""
+    inicio, fim = min(ref, hoje), max(ref, hoje)
+    estados = db.session.query(Divida.status, Divida.saldo_devedor, Divida.data_vencimento)\
+        .filter(Divida.status != 'Paga')\
+        .filter(Divida.data_vencimento.between(inicio, fim))
+
+    delta = dict.fromkeys(CONTADORES, 0)
+    for status, saldo, venc in estados:
+        estado = (status or 'Pendente', saldo or 0.0, venc)
+        _somar_deltas(delta, estado, estado, ref, hoje)
+    return delta
+
+
+def _avancar_referencia(ref, hoje):
+    """Grava o resumo avançado de `ref` para `hoje` (sem commit)"""
+    valores = _incrementos(_delta_do_dia(ref, hoje))
+    valores[ResumoRecebiveis.data_referencia] = hoje
+    # Só aplica se ninguém avançou a referência no meio tempo
+    db.session.execute(
+        update(ResumoRecebiveis)
+        .where(ResumoRecebiveis.id == RESUMO_ID, ResumoRecebiveis.data_referencia == ref)
+        .values(valores)
+    )
+
+
+def avancar(hoje=None):
+    """
+    Leva o resumo gravado para `hoje` (sem commit)
+
+    Cria o resumo a partir do zero se ele ainda não existir. Chamado pela
+    tarefa diária de vencimentos e pelo preparar-banco.
+
+    Returns:
+        True se o resumo foi criado ou avançado
+    """
+    hoje = hoje or date.today()
+    ref = _referencia()
+    if ref is None:
+        reconstruir(hoje)
+    elif ref != hoje:
+        _avancar_referencia(ref, hoje)
+    else:
+        return False
+    return True
+
+
+def obter(hoje=None):
+    """
+    Retorna o resumo para `hoje` sem gravar nada
+
+    Se a tarefa do dia ainda não avançou a linha gravada, devolve uma cópia
+    fora da sessão com a diferença do dia aplicada (ou calculada do zero,
+    se o resumo ainda não existe).
+    """
+    hoje = hoje or date.today()
+    linha = db.session.get(ResumoRecebiveis, RESUMO_ID, populate_existing=True)
+    if linha is not None and linha.data_referencia == hoje:
+        return linha
+    if linha is None:
+        valores = calcular(hoje)
+    else:
+        delta = _delta_do_dia(linha.data_referencia, hoje)
+        valores = {k: (getattr(linha, k) or 0) + delta[k] for k in CONTADORES}
+    return ResumoRecebiveis(id=RESUMO_ID, data_referencia=hoje, **valores)
+
+
+def meios_pagamento():
+    """Quantidade de pagamentos por meio (labels, valores), na ordem de primeiro uso"""
+    rows = db.session.query(ResumoMeioPagamento.meio, ResumoMeioPagamento.quantidade)\
+        .filter(ResumoMeioPagamento.quantidade > 0)\
+        .order_by(ResumoMeioPagamento.ordem).all()
+    return [m for m, _ in rows], [ct for _, ct in rows]
+
+
+# ==================== RECONSTRUÇÃO ====================
+
+def calcular(hoje):
+    """
+    Calcula todos os contadores a partir das tabelas (consultas agregadas)
+
+    Dívidas arquivadas (web/arquivo.py) são todas pagas e seguem contando
+    como pagas.
+    """
+    from web import analytics
+    kpis = analytics.kpis_recebiveis(hoje)
+    pagas_ct, em_dia_ct, renegociadas_ct, vencidas_ct = analytics.contagem_por_status(hoje)
+    arquivadas = db.session.query(func.count(DividaArquivo.id)).scalar()
+    kpis['qtd_pagas'] += arquivadas
+    return dict(
+        kpis,
+        pagas_ct=pagas_ct + arquivadas,
+        em_dia_ct=em_dia_ct,
+        renegociadas_ct=renegociadas_ct,
+        vencidas_ct=vencidas_ct,
+    )
+
+
+def reconstruir(hoje=None, tolerancia=0.005):
+    """
+    Recalcula o resumo do zero e substitui os valores mantidos
+
+    Não faz commit. Returns:
+        lista de divergências (campo, valor mantido, valor recalculado)
+    """
+    hoje = hoje or date.today()
+    divergencias = []
+
+    resumo = db.session.get(ResumoRecebiveis, RESUMO_ID)
+    if resumo is not None and resumo.data_referencia != hoje:
+        _avancar_referencia(resumo.data_referencia, hoje)
+        resumo = db.session.get(ResumoRecebiveis, RESUMO_ID, populate_existing=True)
+
+    existia = resumo is not None
+    novos = calcular(hoje)
+    if not existia:
+        resumo = ResumoRecebiveis(id=RESUMO_ID)
+        db.session.add(resumo)
+    else:
+        for k in CONTADORES:
+            mantido = getattr(resumo, k) or 0
+            if abs(mantido - novos[k]) > tolerancia:
+                divergencias.append((k, mantido, novos[k]))
+    resumo.data_referencia = hoje
+    for k, v in novos.items():
+        setattr(resumo, k, v)
+
+    # Pagamentos por meio
+    from web import analytics
+    labels, valores = analytics.pagamentos_por_meio()
+    atuais = {m.meio: m for m in ResumoMeioPagamento.query.all()}
+    for ordem, (meio, qtd) in enumerate(zip(labels, valores), start=1):
+        linha = atuais.pop(meio, None)
+        if linha is None:
+            if existia:
+                divergencias.append((f'meio:{meio}', 0, qtd))
+            db.session.add(ResumoMeioPagamento(meio=meio, quantidade=qtd, ordem=ordem))
+            continue
+        if linha.quantidade != qtd:
+            divergencias.append((f'meio:{meio}', linha.quantidade, qtd))
+        linha.quantidade = qtd
+        linha.ordem = ordem
+    for meio, linha in atuais.items():
+        if linha.quantidade:
+            divergencias.append((f'meio:{meio}', linha.quantidade, 0))
+        db.session.delete(linha)
+
+    return divergencias
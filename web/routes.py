@@ -10,15 +10,16 @@ Organização:
 6. CRUD de Usuários (Admin)
 7. Gestão Financeira (Dívidas, Pagamentos, Renegociações)
 8. Relatórios
+9. Métricas (Prometheus)
 """
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify
-from web.models import db, Cliente, Usuario, Divida, Pagamento, Renegociacao, Parcela
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify, current_app, Response, abort, stream_with_context
+from web.models import db, Cliente, Usuario, Divida, Pagamento, Parcela
+from web import analytics, resumo, busca, paginacao, cache, desempenho, metricas, pagamentos, exportacao, importacao, arquivo, snapshot, versoes, saldos, movimento, carteira
 from datetime import datetime, date, timedelta
 from dateutil.relativedelta import relativedelta
 from werkzeug.security import check_password_hash, generate_password_hash
-from collections import defaultdict
-import calendar
+from sqlalchemy.orm import selectinload, joinedload
 
 
 def register_routes(app):
@@ -80,6 +81,11 @@ def register_routes(app):
         return redirect(url_for('main.login'))
 
     # ==================== DASHBOARD PRINCIPAL ====================
+    def _com_snapshot(calcular, hoje):
+        """Executa um relatório com a sessão da cópia somente leitura (web/snapshot.py)"""
+        with snapshot.sessao() as sessao:
+            return calcular(hoje, sessao)
+
     @bp.route('/home')
     @require_login
     def home():
@@ -95,115 +101,17 @@ def register_routes(app):
             return render_template('home.html', dashboard=False, hide_aside=False)
         
         if tipo == 'Administrador':
-            # Carrega todos os dados necessários
-            dividas = Divida.query.all()
-            pagamentos = Pagamento.query.all()
+            # KPIs, ranking e séries calculados por agregação no banco (em cache);
+            # ranking, série e vencidas vêm da cópia dos relatórios, se houver.
+            # A versão 'dashboard' do banco entra na chave: uma escrita em outro
+            # worker também invalida este cache
             hoje = date.today()
-
-            # ===== KPIs (Indicadores) =====
-            total_a_receber = sum(d.saldo_devedor for d in dividas if d.status != 'Paga')
-            total_vencido = sum(
-                d.saldo_devedor for d in dividas 
-                if d.status != 'Paga' and d.data_vencimento <= hoje
-            )
-            qtd_pagas = sum(1 for d in dividas if d.status == 'Paga')
-            qtd_vencidas = sum(1 for d in dividas if d.status != 'Paga' and d.data_vencimento < hoje)
-            qtd_abertas = sum(1 for d in dividas if d.status != 'Paga' and d.data_vencimento >= hoje)
-
-            # ===== Ranking: Top 5 devedores =====
-            ranking = {}
-            for d in dividas:
-                if d.status == 'Paga':
-                    continue
-                nome = d.cliente.nome
-                ranking[nome] = ranking.get(nome, 0) + d.saldo_devedor
-            
-            ranking_ordenado = sorted(ranking.items(), key=lambda x: x[1], reverse=True)[:5]
-            top_labels = [n for n, _ in ranking_ordenado]
-            top_values = [v for _, v in ranking_ordenado]
-
-            # ===== Contagem por Status =====
-            pagas_ct = 0
-            renegociadas_ct = 0
-            vencidas_ct = 0
-            em_dia_ct = 0
-            
-            for d in dividas:
-                if d.status == 'Paga' or d.saldo_devedor <= 0:
-                    pagas_ct += 1
-                elif d.data_vencimento <= hoje and d.saldo_devedor > 0:
-                    # Vencida tem prioridade sobre status (inclui hoje)
-                    vencidas_ct += 1
-                elif d.status == 'Renegociada' and d.saldo_devedor > 0:
-                    renegociadas_ct += 1
-                elif d.saldo_devedor > 0:
-                    em_dia_ct += 1
-
-            # ===== Pagamentos por Meio =====
-            meio_map = {}
-            for p in pagamentos:
-                meio = p.meio_pagamento or 'Outro'
-                meio_map[meio] = meio_map.get(meio, 0) + 1
-            meio_labels = list(meio_map.keys())
-            meio_values = list(meio_map.values())
-
-            # ===== Dívidas por Mês (últimos 6 meses) =====
-            by_month = defaultdict(float)
-            for d in dividas:
-                if d.data_venda:
-                    ano, mes = d.data_venda.year, d.data_venda.month
-                    by_month[(ano, mes)] += float(d.valor_original or 0)
-            
-            # Monta labels e valores dos últimos 6 meses
-            labels_month = []
-            values_month = []
-            ref = date(hoje.year, hoje.month, 1)
-            
-            for i in range(5, -1, -1):
-                ano = ref.year
-                mes = ref.month - i
-                # Ajusta ano se mês for negativo
-                while mes <= 0:
-                    ano -= 1
-                    mes += 12
-                
-                labels_month.append(f"{calendar.month_abbr[mes]}/{str(ano)[-2:]}")
-                values_month.append(round(by_month.get((ano, mes), 0.0), 2))
-
-            # ===== Lista de Dívidas Vencidas =====
-            dividas_vencidas = []
-            for d in dividas:
-                if d.status != 'Paga' and d.saldo_devedor > 0 and d.data_vencimento <= hoje:
-                    dividas_vencidas.append({
-                        'id': d.id,
-                        'cliente_nome': d.cliente.nome,
-                        'descricao': d.descricao or 'Sem descrição',
-                        'saldo': d.saldo_devedor,
-                        'vencimento': d.data_vencimento
-                    })
-            # Ordenar por vencimento (mais antigas primeiro)
-            dividas_vencidas.sort(key=lambda x: x['vencimento'])
-
-            return render_template(
-                'home.html',
-                dashboard=True,
-                total_a_receber=total_a_receber,
-                total_vencido=total_vencido,
-                qtd_pagas=qtd_pagas,
-                qtd_vencidas=qtd_vencidas,
-                qtd_abertas=qtd_abertas,
-                ranking=ranking_ordenado,
-                dividas_vencidas=dividas_vencidas,
-                # dados para gráficos
-                top_labels=top_labels,
-                top_values=top_values,
-                status_labels=['Pagas', 'Em dia', 'Renegociadas', 'Vencidas'],
-                status_values=[pagas_ct, em_dia_ct, renegociadas_ct, vencidas_ct],
-                meio_labels=meio_labels,
-                meio_values=meio_values,
-                month_labels=labels_month,
-                month_values=values_month,
+            etag, _ = versoes.obter('dashboard')
+            dados = cache.obter_ou_calcular(
+                'home', (hoje, etag, snapshot.versao()), ['dashboard'],
+                lambda: _com_snapshot(analytics.dashboard_admin, hoje)
             )
+            return render_template('home.html', dashboard=True, snapshot=snapshot.info(), **dados)
 
         # Caixa: tela simples sem dashboard
         return render_template('home.html', dashboard=False)
@@ -213,93 +121,164 @@ def register_routes(app):
     @bp.route('/api/clientes')
     @require_login
     def api_clientes():
-        """API: Retorna lista de clientes (com busca opcional)"""
+        """
+        API: Retorna lista de clientes (com busca opcional)
+
+        Parâmetros opcionais:
+        - q: texto da busca (prefixo, sem acento, ordenado por relevância)
+        - limit / offset: paginação da busca
+        - apos / antes / tamanho: paginação por cursor da lista completa
+          (cursores no cabeçalho Link, rel="next" / rel="prev")
+
+        Responde 304 (If-None-Match) enquanto nenhum cliente for
+        cadastrado ou removido.
+        """
         q = request.args.get('q', '').strip()
-        
-        if q:
-            # Busca por nome parcial
-            clientes = Cliente.query.filter(Cliente.nome.ilike(f'%{q}%')).all()
-        else:
-            # Retorna todos ordenados
-            clientes = Cliente.query.order_by(Cliente.nome).all()
-        
-        result = [{'id': c.id, 'nome': c.nome} for c in clientes]
-        return jsonify(result)
+        limit = request.args.get('limit', type=int)
+        offset = request.args.get('offset', 0, type=int)
+        apos = request.args.get('apos')
+        antes = request.args.get('antes')
+        tamanho = request.args.get('tamanho', type=int)
+
+        def montar_lista():
+            links = []
+            if q:
+                # Busca no índice de texto completo
+                lim, desloc = busca.limitar(limit, offset)
+                clientes = busca.buscar_clientes(q, lim, desloc)
+                if len(clientes) == lim:
+                    links.append(f'<{url_for("main.api_clientes", q=q, limit=lim, offset=desloc + lim)}>; rel="next"')
+            else:
+                # Lista ordenada por nome, uma página por vez
+                consulta = Cliente.query.with_entities(Cliente.id, Cliente.nome)
+                clientes = paginacao.paginar_request(consulta, [Cliente.nome, Cliente.id])
+                if clientes.proximo:
+                    links.append(f'<{url_for("main.api_clientes", apos=clientes.proximo, tamanho=tamanho)}>; rel="next"')
+                if clientes.anterior:
+                    links.append(f'<{url_for("main.api_clientes", antes=clientes.anterior, tamanho=tamanho)}>; rel="prev"')
+            return [{'id': id_, 'nome': nome} for id_, nome in clientes], links
+
+        # O navegador já tem esta versão da lista: 304 sem montar nada
+        etag, ultima = versoes.obter('clientes')
+        response = versoes.nao_modificado(etag, ultima)
+        if response is not None:
+            return response
+
+        # Lista em cache até o próximo cadastro/remoção de cliente
+        result, links = cache.obter_ou_calcular(
+            'api_clientes', (etag, q, limit, offset, apos, antes, tamanho), ['clientes'], montar_lista
+        )
+        response = jsonify(result)
+        if links:
+            response.headers['Link'] = ', '.join(links)
+        return versoes.carimbar(response, etag, ultima)
 
     @bp.route('/api/cliente/<int:cliente_id>')
     @require_login
     def api_cliente(cliente_id):
-        """API: Retorna dados completos de um cliente (incluindo dívidas)"""
-        c = Cliente.query.get_or_404(cliente_id)
+        """
+        API: Retorna dados completos de um cliente (incluindo dívidas)
+
+        Parâmetros opcionais:
+        - status: 'abertas' (não pagas) ou um status específico (Pendente, Vencida, Paga, Renegociada)
+
+        Responde 304 (If-None-Match) enquanto nenhuma escrita envolver o cliente.
+        """
+        status = request.args.get('status', '').strip()
+        # Antes da ETag: um cliente apagado responde 404, nunca 304
+        c = db.session.get(Cliente, cliente_id) or abort(404)
+
+        def montar_perfil():
+            # Carrega dívidas e filhos com um número fixo de consultas (selectin)
+            consulta = Divida.query.filter_by(cliente_id=c.id).options(
+                selectinload(Divida.pagamentos),
+                selectinload(Divida.renegociacoes),
+                selectinload(Divida.parcelas),
+            )
+            if status == 'abertas':
+                consulta = consulta.filter(Divida.status != 'Paga')
+            elif status:
+                consulta = consulta.filter(Divida.status == status)
         
-        # Monta lista de dívidas com pagamentos e renegociações
-        dividas = []
-        for d in c.dividas:
-            pagamentos = [
-                {
-                    'id': p.id,
-                    'valor': p.valor,
-                    'data': p.data_pagamento.isoformat(),
-                    'meio': p.meio_pagamento
-                }
-                for p in d.pagamentos
-            ]
+            # Monta lista de dívidas com pagamentos e renegociações
+            dividas = []
+            for d in consulta.order_by(Divida.id):
+                pagamentos = [
+                    {
+                        'id': p.id,
+                        'valor': p.valor,
+                        'data': p.data_pagamento.isoformat(),
+                        'meio': p.meio_pagamento
+                    }
+                    for p in d.pagamentos
+                ]
             
-            reneg = [
-                {
-                    'id': r.id,
-                    'nova_data_venc': r.nova_data_venc.isoformat(),
-                    'juros': r.juros_percent,
-                    'data': r.data_reneg.isoformat()
-                }
-                for r in d.renegociacoes
-            ]
+                reneg = [
+                    {
+                        'id': r.id,
+                        'nova_data_venc': r.nova_data_venc.isoformat(),
+                        'juros': r.juros_percent,
+                        'data': r.data_reneg.isoformat()
+                    }
+                    for r in d.renegociacoes
+                ]
             
-            parcelas = [
-                {
-                    'numero': p.numero_parcela,
-                    'valor_parcela': p.valor_parcela,
-                    'data_vencimento': p.data_vencimento.isoformat(),
-                    'status': p.status,
-                    'valor_pago': p.valor_pago
-                }
-                for p in d.parcelas
-            ]
+                parcelas = [
+                    {
+                        'numero': p.numero_parcela,
+                        'valor_parcela': p.valor_parcela,
+                        'data_vencimento': p.data_vencimento.isoformat(),
+                        'status': p.status,
+                        'valor_pago': p.valor_pago
+                    }
+                    for p in d.parcelas
+                ]
             
-            dividas.append({
-                'id': d.id,
-                'valor_original': d.valor_original,
-                'saldo': d.saldo_devedor,
-                'vencimento': d.data_vencimento.isoformat(),
-                'status': d.status,
-                'descricao': d.descricao,
-                'parcelado': d.parcelado,
-                'num_parcelas': d.num_parcelas,
-                'juros_parcelamento': d.juros_parcelamento,
-                'pagamentos': pagamentos,
-                'renegociacoes': reneg,
-                'parcelas': parcelas
-            })
-
-        # Monta resposta completa
-        data = {
-            'id': c.id,
-            'nome': c.nome,
-            'cpf': c.cpf,
-            'celular': c.celular,
-            'endereco': c.endereco,
-            'nivel': c.nivel_confianca,
-            'limite': c.limite_credito,
-            'dividas': dividas
-        }
-        return jsonify(data)
+                dividas.append({
+                    'id': d.id,
+                    'valor_original': d.valor_original,
+                    'saldo': d.saldo_devedor,
+                    'vencimento': d.data_vencimento.isoformat(),
+                    'status': d.status,
+                    'descricao': d.descricao,
+                    'parcelado': d.parcelado,
+                    'num_parcelas': d.num_parcelas,
+                    'juros_parcelamento': d.juros_parcelamento,
+                    'pagamentos': pagamentos,
+                    'renegociacoes': reneg,
+                    'parcelas': parcelas
+                })
+
+            # Monta resposta completa
+            data = {
+                'id': c.id,
+                'nome': c.nome,
+                'cpf': c.cpf,
+                'celular': c.celular,
+                'endereco': c.endereco,
+                'nivel': c.nivel_confianca,
+                'limite': c.limite_credito,
+                'dividas': dividas
+            }
+            return data
+
+        etag, ultima = versoes.obter(f'cliente:{cliente_id}')
+        response = versoes.nao_modificado(etag, ultima)
+        if response is not None:
+            return response
+
+        # Perfil em cache até a próxima escrita que envolva este cliente
+        data = cache.obter_ou_calcular(
+            'api_cliente', (etag, cliente_id, status), [f'cliente:{cliente_id}'], montar_perfil
+        )
+        return versoes.carimbar(jsonify(data), etag, ultima)
 
     # ==================== CRUD - CLIENTES ====================
     @bp.route('/clientes')
     @require_login
     def listar_clientes():
-        """Lista todos os clientes cadastrados"""
-        clientes = Cliente.query.order_by(Cliente.nome).all()
+        """Lista os clientes cadastrados (paginado por nome)"""
+        clientes = paginacao.paginar_request(Cliente.query, [Cliente.nome, Cliente.id])
         return render_template('clientes_list.html', clientes=clientes)
 
     @bp.route('/clientes/novo', methods=['GET', 'POST'])
@@ -329,6 +308,7 @@ def register_routes(app):
                 limite_credito=limite
             )
             db.session.add(cliente)
+            cache.invalidar('clientes')
             db.session.commit()
             
             flash('Cliente cadastrado com sucesso.')
@@ -342,15 +322,14 @@ def register_routes(app):
         """Apaga cliente e todos os dados associados (apenas admin)"""
         cliente = Cliente.query.get_or_404(cliente_id)
         
-        # Cascade delete já configurado no modelo, mas fazendo manualmente por garantia
-        dividas = Divida.query.filter_by(cliente_id=cliente.id).all()
-        for d in dividas:
-            Pagamento.query.filter_by(divida_id=d.id).delete()
-            Renegociacao.query.filter_by(divida_id=d.id).delete()
-        Divida.query.filter_by(cliente_id=cliente.id).delete()
-        
-        # Remove cliente
-        db.session.delete(cliente)
+        # Dívidas, pagamentos, renegociações e parcelas: um DELETE por tabela
+        # (o resumo de recebíveis é atualizado antes)
+        Divida.apagar_todas(Divida.cliente_id == cliente.id)
+        arquivo.apagar_do_cliente(cliente.id)
+
+        # Remove cliente (as dívidas já foram apagadas acima)
+        Cliente.query.filter_by(id=cliente.id).delete(synchronize_session=False)
+        cache.invalidar('clientes', 'dashboard', f'cliente:{cliente.id}')
         db.session.commit()
         
         return '', 200
@@ -359,23 +338,85 @@ def register_routes(app):
     @bp.route('/admin/usuarios')
     @require_admin
     def admin_usuarios():
-        """Lista todos os usuários do sistema"""
-        usuarios = Usuario.query.order_by(Usuario.nome).all()
+        """Lista os usuários do sistema (paginado por nome)"""
+        usuarios = paginacao.paginar_request(Usuario.query, [Usuario.nome, Usuario.id])
         return render_template('usuarios_list.html', usuarios=usuarios)
 
     @bp.route('/admin/config')
     @require_admin
     def admin_config():
         """Página de configurações administrativas"""
-        clientes = Cliente.query.order_by(Cliente.nome).all()
-        usuarios = Usuario.query.order_by(Usuario.nome).all()
+        # Cada lista tem seu próprio cursor (clientes_apos, usuarios_apos...)
+        clientes = paginacao.paginar_request(Cliente.query, [Cliente.nome, Cliente.id], prefixo='clientes_')
+        usuarios = paginacao.paginar_request(Usuario.query, [Usuario.nome, Usuario.id], prefixo='usuarios_')
         return render_template(
             'admin_config.html',
             clientes=clientes,
             usuarios=usuarios,
+            secao=request.args.get('secao', 'clientes'),
             hide_aside=True  # Oculta a sidebar de clientes nesta página
         )
 
+    @bp.route('/admin/cache')
+    @require_admin
+    def admin_cache():
+        """Estatísticas do cache de relatórios e APIs (acertos/falhas por rota)"""
+        return jsonify(cache.estatisticas())
+
+    @bp.route('/admin/desempenho', methods=['GET', 'POST'])
+    @require_admin
+    def admin_desempenho():
+        """Percentis de tempo, SQL e templates por rota (POST zera as medições)"""
+        if request.method == 'POST':
+            desempenho.limpar()
+            flash('Medições de desempenho zeradas.')
+            return redirect(url_for('main.admin_desempenho'))
+
+        rotas = desempenho.resumo()
+        if request.args.get('formato') == 'json':
+            return jsonify(rotas)
+        return render_template(
+            'admin_desempenho.html',
+            rotas=rotas,
+            req_lenta_ms=current_app.config.get('DESEMPENHO_REQ_LENTA_MS'),
+            sql_lento_ms=current_app.config.get('DESEMPENHO_SQL_LENTO_MS'),
+            hide_aside=True
+        )
+
+    @bp.route('/admin/importar', methods=['GET', 'POST'])
+    @require_admin
+    def admin_importar():
+        """Importação em lote de clientes e saldos iniciais (CSV ou JSON)"""
+        relatorio = None
+        if request.method == 'POST':
+            enviado = request.files.get('arquivo')
+            if not enviado or not enviado.filename:
+                flash('Selecione um arquivo CSV ou JSON.')
+                return redirect(url_for('main.admin_importar'))
+            extensao = enviado.filename.rsplit('.', 1)[-1].lower()
+            formato = 'json' if extensao in ('json', 'jsonl') else extensao
+            try:
+                codificacao = request.form.get('codificacao') or None
+                relatorio = importacao.importar(
+                    importacao.ler(enviado.stream, formato, codificacao)
+                ).como_dict()
+            except importacao.ArquivoInvalido as e:
+                # Partes anteriores ao erro já foram gravadas
+                db.session.rollback()
+                if request.args.get('formato') == 'json':
+                    return jsonify({'erro': str(e)}), 400
+                flash(f'Erro: {e}')
+                return redirect(url_for('main.admin_importar'))
+            if request.args.get('formato') == 'json':
+                return jsonify(relatorio)
+
+        return render_template(
+            'admin_importar.html',
+            relatorio=relatorio,
+            por_parte=importacao.LINHAS_POR_PARTE,
+            hide_aside=True
+        )
+
     @bp.route('/admin/usuarios/novo', methods=['GET', 'POST'])
     @require_admin
     def admin_novo_usuario():
@@ -427,9 +468,14 @@ def register_routes(app):
     @bp.route('/dividas')
     @require_login
     def listar_dividas():
-        """Lista todas as dívidas do sistema"""
-        dividas = Divida.query.order_by(Divida.data_vencimento).all()
-        return render_template('dividas_list.html', dividas=dividas)
+        """Lista as dívidas do sistema (paginado por vencimento, filtro opcional por status)"""
+        status = request.args.get('status', '').strip()
+        consulta = Divida.query.options(joinedload(Divida.cliente))
+        if status:
+            # Usa o índice (status, data_vencimento)
+            consulta = consulta.filter(Divida.status == status)
+        dividas = paginacao.paginar_request(consulta, [Divida.data_vencimento, Divida.id])
+        return render_template('dividas_list.html', dividas=dividas, status=status)
 
     @bp.route('/dividas/novo', methods=['GET', 'POST'])
     @require_login
@@ -458,12 +504,8 @@ def register_routes(app):
                 flash('Cliente não encontrado.')
                 return redirect(url_for('main.novo_divida'))
 
-            # COMPORTAMENTO ACUMULATIVO:
-            # Atualiza prazo de todas as dívidas pendentes para o mesmo prazo da nova
             usuario_nome = session.get('user_nome', 'Sistema')
-            pendentes = Divida.query.filter_by(cliente_id=cliente.id)\
-                                    .filter(Divida.status != 'Paga').all()
-            
+
             # Calcula valor total com juros (se parcelado)
             valor_total = valor
             if num_parcelas > 1 and juros_parcelamento > 0:
@@ -482,6 +524,15 @@ def register_routes(app):
             )
             db.session.add(divida)
             db.session.flush()  # Garante que divida.id está disponível
+
+            # Limite de crédito: o flush já somou a dívida ao saldo aberto do
+            # cliente (triggers) e a transação segura o banco até o commit
+            if saldos.excede_limite(cliente.id):
+                db.session.rollback()
+                disponivel = max((cliente.limite_credito or 0) - (cliente.saldo_aberto or 0), 0)
+                flash(f'Limite de crédito excedido: disponível R$ {disponivel:.2f} '
+                      f'(limite R$ {cliente.limite_credito:.2f}).')
+                return redirect(url_for('main.novo_divida', cliente_id=cliente.id))
             
             # Se parcelado, cria as parcelas
             if num_parcelas > 1:
@@ -502,11 +553,16 @@ def register_routes(app):
                 
                 # Atualiza data de vencimento da dívida para a última parcela
                 divida.data_vencimento = date.today() + relativedelta(months=num_parcelas)
+
+            # Inclui a nova dívida no resumo de recebíveis
+            resumo.divida_alterada(None, resumo.estado_divida(divida))
             
-            # Renegocia dívidas pendentes (após criar a nova)
-            for d in pendentes:
-                d.renegociar(divida.data_vencimento, 0.0, usuario_nome)
+            # COMPORTAMENTO ACUMULATIVO:
+            # Atualiza prazo de todas as dívidas pendentes para o mesmo prazo da nova
+            # (em lote, sem carregar as dívidas)
+            Divida.renegociar_pendentes(cliente.id, divida.data_vencimento, usuario_nome, exceto_id=divida.id)
             
+            cache.invalidar('dashboard', f'cliente:{cliente.id}')
             db.session.commit()
             
             if num_parcelas > 1:
@@ -573,6 +629,7 @@ def register_routes(app):
                 usuario_responsavel=usuario
             )
             divida.registrar_pagamento(pagamento)
+            cache.invalidar('dashboard', f'cliente:{divida.cliente_id}')
             db.session.commit()
             
             flash('Pagamento registrado com sucesso.')
@@ -622,6 +679,7 @@ def register_routes(app):
                 usuario_responsavel=usuario
             )
             divida.registrar_pagamento(pagamento)
+            cache.invalidar('dashboard', f'cliente:{divida.cliente_id}')
             db.session.commit()
             
             flash('Pagamento registrado com sucesso.')
@@ -629,6 +687,82 @@ def register_routes(app):
 
         return render_template('pagar_form.html', divida=divida)
 
+    @bp.route('/api/pagamentos/lote', methods=['POST'])
+    @require_login
+    def api_pagamentos_lote():
+        """
+        Registra vários pagamentos de uma vez (fechamento do caixa)
+
+        Corpo JSON: {"pagamentos": [{"divida_id", "parcela_id"?, "valor",
+        "meio", "usuario"?, "data"?}, ...], "parcial": false}
+
+        Todos os itens são validados antes de gravar. Sem "parcial", um item
+        inválido cancela o lote inteiro (status 422); com "parcial": true,
+        os válidos são aplicados. A resposta traz um resultado por item.
+        """
+        dados = request.get_json(silent=True)
+        if isinstance(dados, dict):
+            itens, parcial = dados.get('pagamentos'), bool(dados.get('parcial'))
+        else:
+            itens, parcial = dados, False
+
+        try:
+            aplicado, resultados = pagamentos.registrar_lote(
+                itens, session.get('user_nome', 'Operador'), parcial
+            )
+        except pagamentos.ErroLote as e:
+            return jsonify({'erro': str(e)}), 400
+
+        if aplicado:
+            db.session.commit()
+        else:
+            db.session.rollback()
+
+        registrados = [r for r in resultados if r.get('pagamento_id')]
+        return jsonify({
+            'aplicado': aplicado,
+            'itens': len(resultados),
+            'registrados': len(registrados),
+            'erros': sum(1 for r in resultados if not r['ok']),
+            'resultados': resultados,
+        }), 200 if aplicado or not resultados else 422
+
+    @bp.route('/api/clientes/<int:cliente_id>/pagamento', methods=['POST'])
+    @require_login
+    def api_pagamento_cliente(cliente_id):
+        """
+        Pagamento do cliente distribuído entre suas dívidas/parcelas abertas
+
+        Corpo JSON (ou formulário): {"valor", "politica": "vencimento"|"juros",
+        "meio", "usuario"?, "simular"?}. Com "simular": true, devolve a
+        distribuição sem gravar.
+        """
+        cliente = Cliente.query.get_or_404(cliente_id)
+        dados = request.get_json(silent=True) or request.form
+        simular = str(dados.get('simular', '')).lower() in ('1', 'true', 'sim')
+
+        try:
+            alocacao = pagamentos.alocar(
+                cliente.id,
+                dados.get('valor'),
+                politica=dados.get('politica') or 'vencimento',
+                meio=(dados.get('meio') or '').strip() or None,
+                usuario=dados.get('usuario') or session.get('user_nome', 'Operador'),
+                simular=simular,
+            )
+        except pagamentos.ErroLote as e:
+            return jsonify({'erro': str(e)}), 400
+
+        if not simular:
+            db.session.commit()
+
+        return jsonify({
+            'cliente_id': cliente.id,
+            'politica': dados.get('politica') or 'vencimento',
+            'simulado': simular,
+            **alocacao,
+        })
+
     @bp.route('/dividas/<int:divida_id>/renegociar', methods=['GET', 'POST'])
     @require_login
     def renegociar_divida(divida_id):
@@ -643,6 +777,7 @@ def register_routes(app):
             # Aplica renegociação
             nova_data = date.today() + timedelta(days=prazo_dias)
             divida.renegociar(nova_data, juros, usuario)
+            cache.invalidar('dashboard', f'cliente:{divida.cliente_id}')
             db.session.commit()
             
             flash('Dívida renegociada com sucesso.')
@@ -678,12 +813,10 @@ def register_routes(app):
                not check_password_hash(admin.senha_hash, senha):
                 return 'Usuário/senha inválidos ou não é administrador', 403
         
-        # Remove pagamentos e renegociações associados
-        Pagamento.query.filter_by(divida_id=divida.id).delete()
-        Renegociacao.query.filter_by(divida_id=divida.id).delete()
-        
-        # Remove a dívida
-        db.session.delete(divida)
+        # Remove a dívida com pagamentos, renegociações e parcelas
+        # (o resumo de recebíveis é atualizado antes)
+        Divida.apagar_todas(Divida.id == divida.id)
+        cache.invalidar('dashboard', f'cliente:{divida.cliente_id}')
         db.session.commit()
         
         return '', 200
@@ -693,34 +826,13 @@ def register_routes(app):
     @require_login
     def relatorio_dashboard():
         """Relatório: Dashboard consolidado (versão simplificada)"""
-        dividas = Divida.query.all()
         hoje = date.today()
-        
-        # KPIs básicos
-        total_a_receber = sum(d.saldo_devedor for d in dividas if d.status != 'Paga')
-        total_vencido = sum(
-            d.saldo_devedor for d in dividas
-            if d.status != 'Paga' and d.data_vencimento < hoje
-        )
-        qtd_pagas = sum(1 for d in dividas if d.status == 'Paga')
-
-        # Ranking de devedores
-        ranking = {}
-        for d in dividas:
-            if d.status == 'Paga':
-                continue
-            nome = d.cliente.nome
-            ranking[nome] = ranking.get(nome, 0) + d.saldo_devedor
-
-        ranking_ordenado = sorted(ranking.items(), key=lambda x: x[1], reverse=True)
-
-        return render_template(
-            'relatorios_dashboard.html',
-            total_a_receber=total_a_receber,
-            total_vencido=total_vencido,
-            qtd_pagas=qtd_pagas,
-            ranking=ranking_ordenado[:5]
+        etag, _ = versoes.obter('dashboard')
+        dados = cache.obter_ou_calcular(
+            'relatorio_dashboard', (hoje, etag, snapshot.versao()), ['dashboard'],
+            lambda: _com_snapshot(analytics.relatorio_resumo, hoje)
         )
+        return render_template('relatorios_dashboard.html', snapshot=snapshot.info(), **dados)
 
     @bp.route('/relatorios/extrato', methods=['GET', 'POST'])
     @require_login
@@ -751,5 +863,109 @@ def register_routes(app):
             total=total
         )
 
+    @bp.route('/api/relatorios/movimento')
+    @require_admin
+    def api_relatorio_movimento():
+        """
+        Vendido, recebido e renegociado por dia, semana ou mês (JSON)
+
+        Query string: inicio, fim (AAAA-MM-DD), agrupar (dia|semana|mes) e
+        por (meio|usuario). Lê o movimento diário, não as dívidas.
+        """
+        try:
+            p = movimento.parametros(request.args)
+        except movimento.ParametroInvalido as e:
+            return jsonify({'erro': str(e)}), 400
+        return jsonify(movimento.relatorio(**p))
+
+    @bp.route('/api/relatorios/aging')
+    @require_admin
+    def api_relatorio_aging():
+        """
+        Saldo em aberto por faixa de atraso: total geral e os maiores
+        devedores, com mais saldo vencido primeiro (JSON)
+
+        Query string: cliente_id (um cliente) e limite (padrão 20, até 500).
+        A lista completa sai em /exportar/aging.csv.
+        """
+        try:
+            f = exportacao.filtros(request.args)
+        except exportacao.FiltroInvalido as e:
+            return jsonify({'erro': str(e)}), 400
+        limite = min(max(request.args.get('limite', 20, type=int), 1), 500)
+        hoje = date.today()
+        maiores = None if f['cliente_id'] else carteira.maiores_devedores(limite, hoje)
+        consulta = carteira.consulta_aging(f, hoje, clientes=maiores)
+        clientes = db.session.execute(consulta).mappings().all()
+        return jsonify({
+            'hoje': hoje.isoformat(),
+            'total': carteira.aging_total(hoje),
+            'clientes': [dict(c) for c in clientes],
+        })
+
+    @bp.route('/api/relatorios/previsao')
+    @require_admin
+    def api_relatorio_previsao():
+        """
+        Recebimentos previstos por semana, pelos vencimentos das dívidas e
+        parcelas em aberto (JSON)
+
+        Query string: inicio, fim (padrão: as próximas 12 semanas) e cliente_id.
+        """
+        try:
+            f = exportacao.filtros(request.args)
+        except exportacao.FiltroInvalido as e:
+            return jsonify({'erro': str(e)}), 400
+        return jsonify(carteira.previsao(f))
+
+    def _exportar(consulta, formato, nome):
+        """Resposta em streaming (CSV ou JSON) com a consulta lida em partes"""
+        return Response(
+            stream_with_context(exportacao.gerar(consulta, formato)),
+            content_type=exportacao.FORMATOS[formato],
+            headers={'Content-Disposition': f'attachment; filename={nome}.{formato}'}
+        )
+
+    @bp.route('/exportar/<tipo>.<formato>')
+    @require_login
+    def exportar(tipo, formato):
+        """Exporta dívidas, pagamentos, aging ou previsão de recebimentos (filtros na query string)"""
+        consultas = {
+            'dividas': exportacao.consulta_dividas,
+            'pagamentos': exportacao.consulta_pagamentos,
+            'aging': carteira.consulta_aging,
+            'previsao': carteira.consulta_previsao,
+        }
+        if tipo not in consultas or formato not in exportacao.FORMATOS:
+            abort(404)
+        try:
+            f = exportacao.filtros(request.args)
+        except exportacao.FiltroInvalido as e:
+            return jsonify({'erro': str(e)}), 400
+        return _exportar(consultas[tipo](f), formato, f'{tipo}_{date.today():%Y%m%d}')
+
+    @bp.route('/exportar/extrato/<int:cliente_id>.<formato>')
+    @require_login
+    def exportar_extrato(cliente_id, formato):
+        """Exporta o extrato cronológico de um cliente"""
+        if formato not in exportacao.FORMATOS:
+            abort(404)
+        cliente = Cliente.query.get_or_404(cliente_id)
+        try:
+            f = exportacao.filtros(request.args)
+        except exportacao.FiltroInvalido as e:
+            return jsonify({'erro': str(e)}), 400
+        return _exportar(exportacao.consulta_extrato(cliente.id, f), formato, f'extrato_{cliente.id}')
+
+    # ==================== MÉTRICAS (PROMETHEUS) ====================
+    @bp.route('/metrics')
+    def metrics():
+        """Métricas em texto para o Prometheus (admin logado, token ou endereço liberado)"""
+        if not metricas.acesso_permitido(
+            request.remote_addr, session.get('user_tipo'), request.headers.get('Authorization')
+        ):
+            abort(403)
+        return Response(metricas.exportar(), content_type=metricas.TIPO_CONTEUDO)
+
     # Registra todas as rotas no Flask
     app.register_blueprint(bp)
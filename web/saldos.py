@@ -0,0 +1,159 @@
+"""
+Saldos por cliente (colunas desnormalizadas em `cliente`)
+
+- saldo_aberto: soma do saldo das dívidas não pagas
+- saldo_vencido: parte do saldo aberto com vencimento anterior a hoje
+- qtd_dividas_abertas: quantidade de dívidas não pagas
+- vencimento_mais_antigo: menor vencimento entre as dívidas não pagas
+
+São mantidas por triggers do SQLite em `divida` (criados na migração
+v7, refeitos na v11), na mesma transação de qualquer escrita — pelo ORM,
+UPDATE em lote, INSERT ... SELECT ou DELETE. Os triggers só somam e
+subtraem: a contribuição antiga da dívida (OLD) sai da linha do cliente
+antigo e a nova (NEW) entra na do cliente novo. Só o vencimento mais
+antigo, que não se desfaz por subtração, é consultado de novo nas dívidas
+abertas do cliente, e apenas quando a dívida que saiu era a mais antiga.
+Quando o cliente fica sem dívidas abertas os saldos voltam a zero exato.
+
+saldo_vencido depende do dia: os triggers usam a data local do SQLite, e
+a tarefa diária de vencimentos (web/vencimentos.py) recalcula os
+clientes com dívidas que venceram desde a execução anterior.
+
+Usos: ranking de devedores (índice ix_cliente_saldo_aberto) e limite de
+crédito ao lançar uma dívida.
+"""
+
+from web.models import db, Cliente
+from datetime import date
+from sqlalchemy import text
+
+def _totais(cliente, hoje):
+    """Subconsultas que recalculam cada coluna para a linha `cliente` (nome ou alias)"""
+    aberta = f"d.cliente_id = {cliente}.id AND d.status != 'Paga'"
+    return {
+        'saldo_aberto': f"(SELECT COALESCE(SUM(d.saldo_devedor), 0) FROM divida d WHERE {aberta})",
+        'saldo_vencido': f"(SELECT COALESCE(SUM(d.saldo_devedor), 0) FROM divida d "
+                         f"WHERE {aberta} AND d.data_vencimento < {hoje})",
+        'qtd_dividas_abertas': f"(SELECT COUNT(*) FROM divida d WHERE {aberta})",
+        'vencimento_mais_antigo': f"(SELECT MIN(d.data_vencimento) FROM divida d WHERE {aberta})",
+    }
+
+
+def _atribuicoes(hoje):
+    """SET do UPDATE em cliente: as colunas recalculadas das dívidas abertas"""
+    return ', '.join(f'{coluna} = {expr}' for coluna, expr in _totais('cliente', hoje).items())
+
+
+def _retirar(linha, hoje):
+    """UPDATE (para um trigger) que retira a dívida `linha` (old) dos saldos do cliente dela"""
+    mais_antigo = _totais('cliente', hoje)['vencimento_mais_antigo']
+    return f"""
+        UPDATE cliente SET
+            saldo_aberto = CASE WHEN qtd_dividas_abertas <= 1 THEN 0
+                ELSE saldo_aberto - {linha}.saldo_devedor END,
+            saldo_vencido = CASE WHEN qtd_dividas_abertas <= 1 THEN 0
+                ELSE saldo_vencido
+                    - CASE WHEN {linha}.data_vencimento < {hoje} THEN {linha}.saldo_devedor ELSE 0 END END,
+            qtd_dividas_abertas = MAX(qtd_dividas_abertas - 1, 0),
+            vencimento_mais_antigo = CASE
+                WHEN {linha}.data_vencimento > vencimento_mais_antigo THEN vencimento_mais_antigo
+                ELSE {mais_antigo} END
+        WHERE id = {linha}.cliente_id AND {linha}.status != 'Paga';
+    """
+
+
+def _somar(linha, hoje):
+    """UPDATE (para um trigger) que soma a dívida `linha` (new) aos saldos do cliente dela"""
+    return f"""
+        UPDATE cliente SET
+            saldo_aberto = saldo_aberto + {linha}.saldo_devedor,
+            saldo_vencido = saldo_vencido
+                + CASE WHEN {linha}.data_vencimento < {hoje} THEN {linha}.saldo_devedor ELSE 0 END,
+            qtd_dividas_abertas = qtd_dividas_abertas + 1,
+            vencimento_mais_antigo = CASE
+                WHEN vencimento_mais_antigo IS NULL OR {linha}.data_vencimento < vencimento_mais_antigo
+                THEN {linha}.data_vencimento ELSE vencimento_mais_antigo END
+        WHERE id = {linha}.cliente_id AND {linha}.status != 'Paga';
+    """
+
+
+def criar_gatilhos(conn):
+    """Cria os triggers que mantêm os saldos a cada escrita em `divida`"""
+    hoje = "date('now', 'localtime')"
+    # Dívida nova: só soma (importações e cargas inserem milhares por vez)
+    conn.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS divida_saldos_ai AFTER INSERT ON divida
+        WHEN new.status != 'Paga' BEGIN {_somar('new', hoje)} END
+    """))
+    # Alteração: retira a dívida como era e soma como ficou. A marcação
+    # diária (Pendente -> Vencida) não muda nenhum saldo e é ignorada
+    conn.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS divida_saldos_au
+        AFTER UPDATE OF cliente_id, status, saldo_devedor, data_vencimento ON divida
+        WHEN old.cliente_id IS NOT new.cliente_id OR old.saldo_devedor IS NOT new.saldo_devedor
+          OR old.data_vencimento IS NOT new.data_vencimento
+          OR (old.status = 'Paga') IS NOT (new.status = 'Paga')
+        BEGIN {_retirar('old', hoje)} {_somar('new', hoje)} END
+    """))
+    conn.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS divida_saldos_ad AFTER DELETE ON divida
+        WHEN old.status != 'Paga' BEGIN {_retirar('old', hoje)} END
+    """))
+
+
+def recalcular(conn=None, hoje=None):
+    """
+    Recalcula os saldos de todos os clientes (um UPDATE)
+
+    Returns:
+        quantidade de clientes atualizados
+    """
+    conn = conn or db.session
+    hoje = hoje or date.today()
+    return conn.execute(
+        text(f'UPDATE cliente SET {_atribuicoes(":hoje")}'), {'hoje': hoje.isoformat()}
+    ).rowcount
+
+
+def atualizar_vencidos(desde, hoje):
+    """
+    Recalcula só os clientes com dívidas abertas que venceram em [desde, hoje)
+
+    Usado uma vez por dia pela tarefa de vencimentos (sem commit).
+    """
+    return db.session.execute(text(f"""
+        UPDATE cliente SET {_atribuicoes(':hoje')}
+        WHERE id IN (
+            SELECT cliente_id FROM divida
+            WHERE status != 'Paga' AND data_vencimento >= :desde AND data_vencimento < :hoje
+        )
+    """), {'desde': desde.isoformat(), 'hoje': hoje.isoformat()}).rowcount
+
+
+def divergentes(hoje=None, tolerancia=0.005):
+    """Ids dos clientes cujos saldos mantidos diferem do recálculo"""
+    hoje = hoje or date.today()
+    novos = _totais('c', ':hoje')
+    return db.session.execute(text(f"""
+        SELECT id FROM (
+            SELECT c.*, {', '.join(f'{expr} AS novo_{coluna}' for coluna, expr in novos.items())}
+            FROM cliente c
+        )
+        WHERE ABS(saldo_aberto - novo_saldo_aberto) > :tol
+           OR ABS(saldo_vencido - novo_saldo_vencido) > :tol
+           OR qtd_dividas_abertas != novo_qtd_dividas_abertas
+           OR vencimento_mais_antigo IS NOT novo_vencimento_mais_antigo
+        ORDER BY id
+    """), {'hoje': hoje.isoformat(), 'tol': tolerancia}).scalars().all()
+
+
+def excede_limite(cliente_id):
+    """
+    Indica se o saldo aberto do cliente passou do limite de crédito
+
+    Chamar depois do flush da nova dívida: os triggers já somaram o valor.
+    Clientes sem limite (NULL) nunca excedem.
+    """
+    saldo, limite = db.session.query(Cliente.saldo_aberto, Cliente.limite_credito)\
+        .filter(Cliente.id == cliente_id).one()
+    return limite is not None and saldo > limite + 0.005
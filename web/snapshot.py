@@ -0,0 +1,218 @@
+"""
+Cópia somente leitura do banco para os relatórios pesados
+
+Com SNAPSHOT_RELATORIOS ativo, os gráficos e listas dos dashboards
+(ranking, série mensal, vencidas) são consultados em uma cópia do
+sgm.db, aberta em modo somente leitura pelo bind 'relatorios' do
+SQLAlchemy. Assim um administrador atualizando gráficos nunca segura o
+banco usado pelos caixas. Os KPIs continuam vindo do resumo de
+recebíveis do banco principal (uma linha).
+
+A cópia é feita com a API de backup online do SQLite em um único passo,
+dentro de uma transação de leitura: com o banco em WAL (perfil de
+produção) os caixas continuam gravando durante a cópia. Em passos
+menores ela recomeçaria a cada gravação de outra conexão e, com o caixa
+movimentado, não terminaria. O arquivo novo substitui o anterior de uma
+vez (os.replace).
+
+Atualização:
+- automática, em segundo plano, quando a cópia passa de
+  SNAPSHOT_INTERVALO segundos (nenhuma requisição espera por ela). Com
+  vários workers, só o que reservar a tarefa na linha 'snapshot' de
+  tarefa_execucao (um UPDATE condicional) faz a cópia
+- pela CLI: flask --app app snapshot-atualizar
+
+O bind 'relatorios' não guarda conexões (NullPool): cada sessão abre o
+arquivo atual, então todos os workers passam a ler a cópia nova assim
+que ela substitui a anterior, sem conexões presas ao arquivo antigo.
+
+Sem cópia (desativado ou ainda não criada), os relatórios leem o banco
+principal, como antes.
+"""
+
+from flask import current_app
+from web.models import db, TarefaExecucao
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy import update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+import os
+import sqlite3
+import threading
+import time
+
+BIND = 'relatorios'
+TAREFA = 'snapshot'
+
+_lock = threading.Lock()
+
+
+def arquivo_padrao(app):
+    return app.config.get('SNAPSHOT_ARQUIVO') or os.path.join(app.instance_path, 'sgm_relatorios.db')
+
+
+def configurar(app):
+    """
+    Registra o bind somente leitura dos relatórios (antes do db.init_app)
+    """
+    if not app.config.get('SNAPSHOT_RELATORIOS'):
+        return
+    caminho = os.path.abspath(arquivo_padrao(app))
+    binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+    binds[BIND] = {
+        'url': f'sqlite:///file:{caminho}?mode=ro&uri=true',
+        # Abrir o SQLite custa pouco; uma conexão guardada leria o arquivo substituído
+        'poolclass': NullPool,
+    }
+    app.config['SQLALCHEMY_BINDS'] = binds
+
+
+def ativo():
+    return bool(current_app.config.get('SNAPSHOT_RELATORIOS'))
+
+
+def _caminho():
+    return os.path.abspath(arquivo_padrao(current_app))
+
+
+def atualizar():
+    """
+    Copia o banco principal para o arquivo da cópia (backup online do SQLite)
+
+    Returns:
+        segundos gastos na cópia
+    """
+    inicio = time.perf_counter()
+    caminho = _caminho()
+    # Um temporário por processo: com vários workers, duas cópias podem
+    # começar juntas; a última a terminar fica (os.replace é atômico)
+    temporario = f'{caminho}.{os.getpid()}.tmp'
+    if os.path.exists(temporario):
+        os.remove(temporario)
+
+    fonte = db.engine.raw_connection()
+    try:
+        destino = sqlite3.connect(temporario)
+        try:
+            fonte.driver_connection.backup(destino)
+            # A cópia é só lida: sem WAL, um único arquivo
+            destino.execute('PRAGMA journal_mode = DELETE')
+        finally:
+            destino.close()
+    finally:
+        fonte.close()
+
+    os.replace(temporario, caminho)
+
+    segundos = time.perf_counter() - inicio
+    execucao = db.session.get(TarefaExecucao, TAREFA)
+    if execucao is None:
+        execucao = TarefaExecucao(nome=TAREFA)
+        db.session.add(execucao)
+    execucao.ultima_execucao = datetime.now()
+    db.session.commit()
+    return segundos
+
+
+def reservar(intervalo):
+    """
+    Reserva a atualização automática para este processo
+
+    Marca a tarefa como executada agora se a última execução (ou reserva)
+    tem mais de `intervalo` segundos. Entre vários workers, só um UPDATE
+    encontra a linha ainda antiga.
+
+    Returns:
+        True se este processo deve fazer a cópia
+    """
+    agora = datetime.now()
+    tabela = TarefaExecucao.__table__
+    db.session.execute(
+        insert(tabela).values(nome=TAREFA, ultima_execucao=datetime.min).on_conflict_do_nothing()
+    )
+    reservada = db.session.execute(
+        update(tabela)
+        .where(tabela.c.nome == TAREFA, tabela.c.ultima_execucao < agora - timedelta(seconds=intervalo))
+        .values(ultima_execucao=agora)
+    ).rowcount == 1
+    db.session.commit()
+    return reservada
+
+
+def gerado_em():
+    """Momento da última cópia (None se não há cópia)"""
+    if not ativo() or not os.path.exists(_caminho()):
+        return None
+    return datetime.fromtimestamp(os.path.getmtime(_caminho()))
+
+
+def idade():
+    """Segundos desde a última cópia (None se não há cópia)"""
+    momento = gerado_em()
+    return None if momento is None else (datetime.now() - momento).total_seconds()
+
+
+def info():
+    """Momento e idade (minutos) da cópia, para exibir nas telas; None sem cópia"""
+    momento = gerado_em()
+    if momento is None:
+        return None
+    return {'gerado_em': momento, 'minutos': int((datetime.now() - momento).total_seconds() // 60)}
+
+
+def versao():
+    """Identifica a cópia atual (para chaves de cache); None sem cópia"""
+    momento = gerado_em()
+    return momento.isoformat() if momento else None
+
+
+@contextmanager
+def sessao():
+    """
+    Sessão para as consultas dos relatórios: a cópia somente leitura, se
+    existir, ou a sessão do banco principal
+    """
+    if gerado_em() is None:
+        yield db.session
+        return
+    s = Session(bind=db.engines[BIND])
+    try:
+        yield s
+    finally:
+        s.close()
+
+
+def init_app(app):
+    """Atualiza a cópia em segundo plano quando ela passa de SNAPSHOT_INTERVALO"""
+    if not app.config.get('SNAPSHOT_RELATORIOS'):
+        return
+    intervalo = app.config.get('SNAPSHOT_INTERVALO', 300)
+    # proxima: não tenta de novo antes disso (outro worker reservou a cópia)
+    estado = {'rodando': False, 'proxima': 0.0}
+
+    def _atualizar_em_segundo_plano():
+        try:
+            with app.app_context():
+                if reservar(intervalo):
+                    atualizar()
+                else:
+                    estado['proxima'] = time.monotonic() + min(intervalo, 30)
+        except Exception:
+            app.logger.exception('Falha ao atualizar a cópia dos relatórios')
+        finally:
+            estado['rodando'] = False
+
+    @app.before_request
+    def _verificar_snapshot():
+        if estado['rodando'] or time.monotonic() < estado['proxima']:
+            return
+        atual = idade()
+        if atual is not None and atual < intervalo:
+            return
+        with _lock:
+            if estado['rodando']:
+                return
+            estado['rodando'] = True
+        threading.Thread(target=_atualizar_em_segundo_plano, name='sgm-snapshot', daemon=True).start()
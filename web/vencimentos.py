@@ -0,0 +1,127 @@
+"""
+Atualização em lote do status de dívidas e parcelas vencidas
+
+Uma vez por dia, dívidas 'Pendente' e parcelas 'Pendente' com vencimento
+anterior ao dia passam para 'Vencida' com um UPDATE cada (sem carregar
+linhas no Python). Dívidas 'Renegociada' mantêm o status: a
+renegociação continua visível e o vencimento delas segue sendo avaliado
+pela data. As leituras (web/analytics.py) filtram pelo status, com a
+data só para renegociadas e pendentes ainda não marcadas.
+
+A tarefa roda:
+- pela CLI: flask --app app vencimentos-atualizar (ex.: cron logo após a
+  meia-noite)
+- automaticamente (VENCIMENTOS_AUTOMATICO) em uma thread de segundo plano,
+  disparada pela primeira requisição de cada dia, que não espera por ela
+
+Execuções simultâneas em vários workers são inofensivas: os UPDATEs só
+alteram linhas ainda 'Pendente' e o saldo vencido dos clientes é
+recalculado, não somado.
+
+A última execução fica na tabela tarefa_execucao. A tarefa também leva
+o resumo dos dashboards para o dia (resumo.avancar; 'Pendente' e
+'Vencida' contribuem igual, só a data de referência conta). O saldo
+vencido por cliente
+(web/saldos.py) é recalculado para os clientes com dívidas que venceram
+desde a execução anterior.
+"""
+
+from web.models import db, Divida, Parcela, TarefaExecucao
+from web import cache, versoes, saldos, resumo
+from datetime import date, datetime
+from sqlalchemy import update
+import threading
+import time
+
+TAREFA = 'vencimentos'
+ESPERA_APOS_FALHA = 60  # Segundos até tentar de novo a execução automática
+
+_lock = threading.Lock()
+
+
+def ultima_execucao():
+    """Registro da última execução (None se nunca rodou)"""
+    return db.session.get(TarefaExecucao, TAREFA)
+
+
+def atualizar(hoje=None):
+    """
+    Marca como 'Vencida' as dívidas e parcelas pendentes vencidas antes de `hoje`
+
+    Returns:
+        (dividas_atualizadas, parcelas_atualizadas)
+    """
+    hoje = hoje or date.today()
+
+    dividas = db.session.execute(
+        update(Divida)
+        .where(Divida.status == 'Pendente', Divida.data_vencimento < hoje)
+        .values(status='Vencida')
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+    parcelas = db.session.execute(
+        update(Parcela)
+        .where(Parcela.status == 'Pendente', Parcela.data_vencimento < hoje)
+        .values(status='Vencida')
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+    execucao = ultima_execucao()
+    anterior = execucao.data_referencia if execucao is not None else None
+    if anterior is None:
+        saldos.recalcular(hoje=hoje)
+    elif anterior < hoje:
+        saldos.atualizar_vencidos(anterior, hoje)
+
+    resumo.avancar(hoje)
+
+    if execucao is None:
+        execucao = TarefaExecucao(nome=TAREFA)
+        db.session.add(execucao)
+    execucao.ultima_execucao = datetime.now()
+    execucao.data_referencia = hoje
+    execucao.registros = dividas + parcelas
+    if dividas or parcelas:
+        # Status mudam em muitos clientes: todas as ETags mudam
+        versoes.marcar(versoes.TODOS)
+    db.session.commit()
+
+    if dividas or parcelas:
+        # Status aparecem nas APIs e listas em cache
+        cache.limpar()
+    return dividas, parcelas
+
+
+def init_app(app):
+    """Roda a tarefa em segundo plano uma vez por dia (se VENCIMENTOS_AUTOMATICO)"""
+    if not app.config.get('VENCIMENTOS_AUTOMATICO', True):
+        return
+    # dia: última data já verificada por este processo; proxima: nova tentativa depois de uma falha
+    estado = {'dia': None, 'rodando': False, 'proxima': 0.0}
+
+    def _atualizar_em_segundo_plano(hoje):
+        try:
+            with app.app_context():
+                execucao = ultima_execucao()
+                if execucao is None or execucao.data_referencia != hoje:
+                    atualizar(hoje)
+                estado['dia'] = hoje
+        except Exception:
+            estado['proxima'] = time.monotonic() + ESPERA_APOS_FALHA
+            app.logger.exception('Falha ao atualizar os vencimentos')
+        finally:
+            estado['rodando'] = False
+
+    @app.before_request
+    def _verificar_vencimentos():
+        hoje = date.today()
+        if estado['dia'] == hoje or estado['rodando'] or time.monotonic() < estado['proxima']:
+            return
+        with _lock:
+            if estado['rodando']:
+                return
+            estado['rodando'] = True
+        threading.Thread(
+            target=_atualizar_em_segundo_plano, args=(hoje,), name='sgm-vencimentos', daemon=True
+        ).start()
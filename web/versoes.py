@@ -0,0 +1,100 @@
+"""
+Carimbos de versão para GET condicional (ETag / Last-Modified / 304)
+
+Cada etiqueta de dados ('clientes', 'cliente:<id>', 'dashboard'...) tem
+uma versão na tabela versao_dado. As escritas que invalidam o cache
+(cache.invalidar) marcam as mesmas etiquetas aqui, e as versões são
+gravadas antes do commit, na mesma transação: um carimbo novo nunca
+aparece sem a escrita, nem a escrita sem o carimbo. Como ficam no banco,
+valem para todos os workers.
+
+A versão é o instante da escrita em milissegundos (UTC), sempre maior
+que a anterior da mesma chave. Ela serve de ETag e também de
+Last-Modified.
+
+TODOS é marcado por tarefas que alteram muitos clientes de uma vez
+(vencimentos, arquivo) e entra em todas as ETags.
+"""
+
+from flask import request, Response
+from web.models import db, VersaoDado
+from sqlalchemy import event, func
+from sqlalchemy.dialects.sqlite import insert
+from werkzeug.http import is_resource_modified
+from datetime import datetime, timezone
+import time
+
+TODOS = '*'
+
+
+def _agora_ms():
+    return int(time.time() * 1000)
+
+
+def marcar(*chaves):
+    """
+    Marca chaves para ganhar nova versão quando a transação atual fizer commit
+
+    Se a transação for desfeita, nada muda.
+    """
+    pendentes = db.session.info.setdefault('versoes_marcar', set())
+    pendentes.update(chaves)
+
+
+def obter(*chaves):
+    """
+    Versões atuais das chaves (sempre com TODOS)
+
+    Returns:
+        (etag, ultima_modificacao): etag combinando as versões e o instante
+        (datetime UTC) da escrita mais recente, ou None se nunca houve
+    """
+    chaves = (TODOS,) + tuple(c for c in chaves if c != TODOS)
+    versoes = dict(db.session.query(VersaoDado.chave, VersaoDado.versao)
+                   .filter(VersaoDado.chave.in_(chaves)).all())
+    etag = '-'.join(str(versoes.get(c, 0)) for c in chaves)
+    ultima = max(versoes.values(), default=None)
+    if ultima is None:
+        return etag, None
+    return etag, datetime.fromtimestamp(ultima / 1000, tz=timezone.utc)
+
+
+def nao_modificado(etag, ultima):
+    """
+    Resposta 304 se o cliente já tem esta versão (If-None-Match /
+    If-Modified-Since), senão None
+    """
+    if is_resource_modified(request.environ, etag=etag, last_modified=ultima):
+        return None
+    return carimbar(Response(status=304), etag, ultima)
+
+
+def carimbar(response, etag, ultima):
+    """ETag, Last-Modified e Cache-Control (sempre revalidar) na resposta"""
+    response.set_etag(etag)
+    if ultima is not None:
+        response.last_modified = ultima
+    # O navegador guarda a resposta, mas pergunta ao servidor antes de reusá-la
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+@event.listens_for(db.session, 'before_commit')
+def _gravar_versoes(session):
+    chaves = session.info.pop('versoes_marcar', None)
+    if not chaves:
+        return
+    agora = _agora_ms()
+    stmt = insert(VersaoDado.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['chave'],
+        # Sempre crescente, mesmo com duas escritas no mesmo milissegundo
+        set_={'versao': func.max(stmt.excluded.versao, VersaoDado.__table__.c.versao + 1)},
+    )
+    session.execute(stmt, [{'chave': c, 'versao': agora} for c in sorted(chaves)])
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _descartar_versoes(session):
+    session.info.pop('versoes_marcar', None)
@@ -0,0 +1,34 @@
+"""
+Ponto de entrada WSGI do SGM para produção
+
+Uso (banco já preparado com `flask --app app preparar-banco`):
+
+    SGM_SECRET_KEY=... gunicorn wsgi:app
+
+As opções do gunicorn (workers, threads, preload) ficam em
+gunicorn.conf.py. O perfil padrão aqui é 'producao' (SGM_PERFIL muda).
+
+Criar o app não acessa o banco: com preload_app, o processo principal
+cria o app uma vez e cada worker nasce dele por fork, já pronto. Depois
+do fork o worker descarta (sem fechar) as conexões herdadas do pool, que
+pertencem ao processo principal.
+"""
+
+import os
+
+os.environ.setdefault('SGM_PERFIL', 'producao')
+
+from app import create_app  # noqa: E402
+from web.models import db  # noqa: E402
+
+app = create_app()
+
+
+def _descartar_conexoes_herdadas():
+    """Em um processo filho, abandona as conexões abertas antes do fork"""
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+
+os.register_at_fork(after_in_child=_descartar_conexoes_herdadas)